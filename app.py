@@ -1,21 +1,30 @@
+import streamlit as st
 from controllers.emission_controller import EmissionController
 from views.main_view import MainView
 
-def main():
-    # Initialize controller
+DATA_PATH = 'co2 Emissions.csv'
+
+@st.cache_resource(show_spinner=False)
+def load_controller(data_path):
+    """Create the controller and its model once per server process, shared by every session"""
     controller = EmissionController()
-    
-    # Train the model
+    controller.use_tuned_params(data_path)
+    test_score = controller.initialize_model(data_path)
+    source = "loaded from cache" if controller.loaded_from_cache else "trained successfully"
+    print(f"Model {source}. Test score: {test_score:.3f}")
+    return controller
+
+def main():
+    # Initialize controller, training or loading the model on the first run only
     try:
-        test_score = controller.initialize_model('co2 Emissions.csv')
-        print(f"Model trained successfully. Test score: {test_score:.3f}")
+        controller = load_controller(DATA_PATH)
     except Exception as e:
         print(f"Error training model: {str(e)}")
         return
 
     # Initialize and show view
-    view = MainView(controller)
+    view = MainView(controller, DATA_PATH)
     view.show()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
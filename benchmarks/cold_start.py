@@ -0,0 +1,125 @@
+"""Import-time and cold-start report for the app and the model path
+
+Every measurement runs in a fresh interpreter, so nothing is imported yet.
+Import times are the median of several runs, and `python -X importtime`
+attributes them to the heavy packages loaded. Cold start times a new
+process from import to the first prediction, loading the stored model.
+
+Run from the project root:
+    python -m benchmarks.cold_start --repeats 5 --json startup.json
+
+Exits with status 1 if an entry point loads a package it must not, e.g. the
+model path loading streamlit or matplotlib.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from benchmarks.load_test import DEFAULT_FEATURES
+
+# Entry points and the packages importing them must not load
+ENTRY_POINTS = {
+    'app': ('matplotlib', 'seaborn'),
+    'views.main_view': ('matplotlib', 'seaborn'),
+    'utils.visualization': ('streamlit', 'matplotlib', 'seaborn'),
+    'utils.benchmark_utils': ('streamlit', 'matplotlib', 'seaborn'),
+    'controllers.emission_controller': ('streamlit', 'matplotlib', 'seaborn'),
+    'utils.fleet_scorer': ('streamlit', 'matplotlib', 'seaborn'),
+    'serve': ('streamlit', 'matplotlib', 'seaborn'),
+}
+HEAVY_PACKAGES = ('streamlit', 'pandas', 'sklearn', 'scipy', 'joblib', 'matplotlib', 'seaborn')
+
+COLD_START = """
+import json, time
+start = time.perf_counter()
+from controllers.emission_controller import EmissionController
+imported = time.perf_counter()
+controller = EmissionController()
+controller.initialize_model({data_path!r})
+initialized = time.perf_counter()
+controller.predict_emission({features!r})
+predicted = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - start) * 1000, 'initialize_ms': (initialized - imported) * 1000,
+                  'first_prediction_ms': (predicted - initialized) * 1000,
+                  'loaded_from_cache': controller.loaded_from_cache}}))
+"""
+
+
+def run_python(*args):
+    """Run a fresh interpreter from the project root, returning its stdout and stderr"""
+    result = subprocess.run([sys.executable, *args], capture_output=True, text=True, check=True)
+    return result.stdout, result.stderr
+
+
+def import_time(module):
+    """Time importing module in a fresh interpreter, in ms"""
+    stdout, _ = run_python('-c', f"import time; start = time.perf_counter(); import {module}; "
+                                 f"print((time.perf_counter() - start) * 1000)")
+    return float(stdout)
+
+
+def import_profile(module):
+    """Get the cumulative import time in ms of each heavy package module loads, from -X importtime"""
+    _, stderr = run_python('-X', 'importtime', '-c', f"import {module}")
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        if cumulative.strip().isdigit() and name in HEAVY_PACKAGES:
+            # The first line of a package is the outermost import, which includes its submodules
+            packages.setdefault(name, int(cumulative) / 1000)
+    return packages
+
+
+def cold_start(data_path):
+    """Time a new process from importing the controller to its first prediction"""
+    stdout, _ = run_python('-c', COLD_START.format(data_path=data_path, features=DEFAULT_FEATURES))
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='co2 Emissions.csv')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--json', default=None, help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = {'imports': {}, 'cold_start': None, 'violations': []}
+    for module, forbidden in ENTRY_POINTS.items():
+        median_ms = statistics.median(import_time(module) for _ in range(args.repeats))
+        packages = import_profile(module)
+        violations = [package for package in forbidden if package in packages]
+        report['imports'][module] = {'median_ms': median_ms, 'packages_ms': packages}
+        report['violations'] += [f"{module} loads {package}" for package in violations]
+        loaded = ', '.join(f"{name} {ms:.0f}" for name, ms in packages.items()) or '-'
+        print(f"{module:>32}: {median_ms:8.1f} ms  ({loaded})" + ('  UNWANTED: ' + ', '.join(violations)
+                                                                  if violations else ''))
+
+    # The first run may train and store the model, the measured ones load it like a restarted app
+    cold_start(args.data)
+    runs = [cold_start(args.data) for _ in range(args.repeats)]
+    report['cold_start'] = {key: statistics.median(run[key] for run in runs)
+                            for key in ('import_ms', 'initialize_ms', 'first_prediction_ms')}
+    report['cold_start']['loaded_from_cache'] = all(run['loaded_from_cache'] for run in runs)
+    print(f"\nCold start, model loaded from the artifact store (median of {args.repeats}):")
+    for key, value in report['cold_start'].items():
+        if key != 'loaded_from_cache':
+            print(f"{key:>32}: {value:8.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if report['violations']:
+        print(f"\n{len(report['violations'])} unwanted import(s): {'; '.join(report['violations'])}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,150 @@
+"""Accuracy, latency, throughput and size of compacted forests
+
+Trains the full forest once, then compacts a copy of it per variant with
+EmissionModel.compact and measures every variant on both inference engines:
+R² on the holdout half of the test split (which compaction never sees),
+p50/p99 latency of single predictions, batch throughput and serialized
+size (the joblib artifact's forest for sklearn, the node arrays for flat).
+A gradient-boosted model distilled from the forest is listed for reference;
+it can't be served, as the fast path, the flat forest and TreeSHAP all
+expect an averaged forest.
+
+Run from the project root:
+    python -m benchmarks.compaction --json compaction.json
+
+Serve a variant with e.g. `python serve.py --engine flat --compact-trees 20 --compact-depth 12 --float32`.
+"""
+import argparse
+import io
+import json
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from benchmarks.flat_forest_throughput import best_time, random_batch
+from models.compaction import distillation_rows, node_count
+from models.emission_model import EmissionModel
+from models.explanations import r2_score
+
+# Variant name -> EmissionModel.compact arguments
+VARIANTS = {
+    'full': {},
+    'select 25': {'n_trees': 25},
+    'select 10': {'n_trees': 10},
+    'depth 12': {'max_depth': 12},
+    'depth 8': {'max_depth': 8},
+    'select 20, depth 12': {'n_trees': 20, 'max_depth': 12},
+    'distill 20, depth 12': {'distill_trees': 20, 'max_depth': 12},
+    'distill 10, depth 10': {'distill_trees': 10, 'max_depth': 10},
+}
+
+
+def single_latency(predict, rows, repeats):
+    """p50 and p99 latency of single predictions in µs"""
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        row = rows[i % len(rows)]
+        start = time.perf_counter()
+        predict(row)
+        timings[i] = time.perf_counter() - start
+    return np.percentile(timings, 50) * 1e6, np.percentile(timings, 99) * 1e6
+
+
+def serialized_megabytes(obj):
+    """Size of an object dumped with joblib, like the model store does"""
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return buffer.tell() / 1e6
+
+
+def measure(name, model, X_holdout, y_holdout, rows, batch, args):
+    """One row of the report"""
+    p50, p99 = single_latency(model.predict, rows, args.repeats)
+    batch_time = best_time(lambda: model.predict_batch(batch), 3)
+    size = model.flat_forest.nbytes / 1e6 if model.engine == 'flat' else serialized_megabytes(model.model)
+    return {
+        'variant': name,
+        'engine': model.engine + (' f32' if model.compaction and model.compaction['float32'] else ''),
+        'trees': len(model.model.estimators_),
+        'nodes': node_count(model.model),
+        'r2': r2_score(y_holdout, model.predict_batch(X_holdout)),
+        'p50_us': p50,
+        'p99_us': p99,
+        'rows_per_second': len(batch) / batch_time,
+        'megabytes': size
+    }
+
+
+def gbm_reference(model, X_train, X_holdout, y_holdout, rows, batch, args):
+    """Gradient-boosted model distilled from the full forest, measured on scaled inputs"""
+    X_student = distillation_rows(model.scaler.transform(X_train))
+    gbm = HistGradientBoostingRegressor(max_iter=200, random_state=0)
+    gbm.fit(X_student, model.model.predict(X_student))
+
+    def predict(row):
+        return gbm.predict(model.scaler.transform(model._to_feature_frame([row])))[0]
+
+    p50, p99 = single_latency(predict, rows, args.repeats)
+    batch_frame = model._to_feature_frame(batch)
+    batch_time = best_time(lambda: gbm.predict(model.scaler.transform(batch_frame)), 3)
+    return {
+        'variant': 'distill gbm (reference)',
+        'engine': 'sklearn',
+        'trees': gbm.n_iter_,
+        'nodes': None,
+        'r2': r2_score(y_holdout, gbm.predict(model.scaler.transform(X_holdout))),
+        'p50_us': p50,
+        'p99_us': p99,
+        'rows_per_second': len(batch) / batch_time,
+        'megabytes': serialized_megabytes(gbm)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='co2 Emissions.csv')
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument('--repeats', type=int, default=2000, help="Single predictions timed per variant")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--json', default=None, help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    full = EmissionModel()
+    full.train(args.data)
+    artifact = full.to_artifact()
+    X_train, _, X_holdout, _, _, y_holdout = full.split_validation(args.data)
+    y_holdout = y_holdout.to_numpy(dtype=np.float64)
+    batch = random_batch(args.batch_size, seed=1)
+    rows = [dict(zip(full.features, row)) for row in random_batch(1000, seed=0)]
+
+    print(f"{'variant':>24} {'engine':>9} {'trees':>5} {'nodes':>7} {'R²':>7} {'p50 µs':>8} {'p99 µs':>8}"
+          f" {'rows/s':>10} {'MB':>7}")
+    report = []
+
+    def add(row):
+        report.append(row)
+        nodes = f"{row['nodes']:7d}" if row['nodes'] is not None else f"{'-':>7}"
+        print(f"{row['variant']:>24} {row['engine']:>9} {row['trees']:5d} {nodes} {row['r2']:7.4f}"
+              f" {row['p50_us']:8.1f} {row['p99_us']:8.1f} {row['rows_per_second']:10,.0f}"
+              f" {row['megabytes']:7.2f}", flush=True)
+
+    for name in args.variants:
+        spec = VARIANTS[name]
+        for engine, float32 in (('sklearn', False), ('flat', False), ('flat', True)):
+            model = EmissionModel(engine=engine)
+            model.load_artifact(artifact)
+            if spec or float32:
+                model.compact(args.data, float32=float32, **spec)
+            add(measure(name, model, X_holdout, y_holdout, rows, batch, args))
+    add(gbm_reference(full, X_train, X_holdout, y_holdout, rows, batch, args))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+"""Parity check and batch throughput of the flat-array forest against scikit-learn
+
+Run from the project root:
+    python -m benchmarks.flat_forest_throughput
+"""
+import argparse
+import time
+
+import numpy as np
+
+from controllers.emission_controller import EmissionController
+from models.flat_forest import FlatForest
+
+
+def random_batch(n_rows, seed=0):
+    """Generate a random feature matrix within the Prediction page ranges"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        np.round(rng.uniform(1.0, 8.0, n_rows), 1),
+        rng.integers(3, 12, n_rows),
+        np.round(rng.uniform(4.0, 20.0, n_rows), 1),
+        rng.uniform(100, 800, n_rows),
+        rng.uniform(1000, 4000, n_rows),
+        rng.integers(2015, 2024, n_rows)
+    ]).astype(np.float64)
+
+
+def best_time(func, repeats):
+    """Return the best wall-clock time of several runs"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='co2 Emissions.csv')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    controller = EmissionController()
+    controller.initialize_model(args.data)
+    model = controller.model
+
+    # Parity on the held-out distribution plus random inputs
+    X = random_batch(20000)
+    X_scaled = model.scaler.transform(model._to_feature_frame(X))
+    expected = model.model.predict(X_scaled)
+
+    exact = FlatForest.from_estimator(model.model).predict(X_scaled)
+    folded = model.flat_forest.predict(X)
+    print(f"Unfolded parity: {np.count_nonzero(exact != expected)} mismatches over {len(X)} rows")
+    print(f"Folded parity:   {np.count_nonzero(~np.isclose(folded, expected))} rows off, "
+          f"max abs diff {np.max(np.abs(folded - expected)):.3g} g/km")
+
+    print(f"{'rows':>8}{'sklearn rows/s':>18}{'flat rows/s':>16}{'speedup':>10}")
+    for n_rows in args.sizes:
+        X = random_batch(n_rows, seed=n_rows)
+        sklearn_time = best_time(lambda: model.model.predict(model.scaler.transform(model._to_feature_frame(X))),
+                                 args.repeats)
+        flat_time = best_time(lambda: model.flat_forest.predict(X), args.repeats)
+        print(f"{n_rows:>8}{n_rows / sklearn_time:>18,.0f}{n_rows / flat_time:>16,.0f}"
+              f"{sklearn_time / flat_time:>9.1f}x")
+
+    return 1 if np.any(exact != expected) or not np.allclose(folded, expected) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
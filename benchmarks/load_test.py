@@ -0,0 +1,111 @@
+"""Headless load test of the prediction path
+
+Run from the project root, e.g.:
+    python -m benchmarks.load_test --backend thread --concurrency 8 --requests 5000
+    python -m benchmarks.load_test --mode open --rps 500 --requests 5000
+    python -m benchmarks.load_test --client http --concurrency 8
+    python -m benchmarks.load_test --concurrency 32 --micro-batch --max-wait-ms 2
+
+With --client http the requests go through the HTTP prediction service
+over pooled keep-alive connections, started on a free localhost port
+unless --url points at a running one (see serve.py).
+"""
+import argparse
+
+from controllers.emission_controller import EmissionController
+from controllers.micro_batcher import MicroBatcher
+from controllers.scoring_pool import predict_one, worker_setup
+from utils.benchmark_utils import BenchmarkUtils
+from utils.load_generator import BACKENDS, MODES, LoadGenerator, fixed_request, random_request
+from utils.prediction_client import PredictionClient
+from utils.prediction_server import PredictionServer
+
+DEFAULT_FEATURES = {
+    'Engine Size(L)': 2.0,
+    'Cylinders': 4,
+    'Fuel Consumption Comb (L/100 km)': 9.0,
+    'Horsepower': 200,
+    'Weight (kg)': 1500,
+    'Year': 2023
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='co2 Emissions.csv')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--backend', choices=BACKENDS, default='thread')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--mode', choices=MODES, default='closed')
+    parser.add_argument('--rps', type=float, default=None, help="Target requests/second in open-loop mode")
+    parser.add_argument('--fixed', action='store_true', help="Send the same features on every request")
+    parser.add_argument('--client', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--url', default=None, help="Running prediction service for --client http")
+    parser.add_argument('--micro-batch', action='store_true',
+                        help="Coalesce concurrent single predictions into batches")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--json', default=None, help="Write the JSON report of the run to this file")
+    args = parser.parse_args()
+    if args.client == 'http' and args.backend == 'process':
+        parser.error("--client http drives the service from threads or asyncio, not processes")
+    if args.micro_batch and (args.backend == 'process' or args.url):
+        parser.error("--micro-batch batches in this process, so it needs the thread or asyncio backend "
+                     "and a local service")
+
+    controller = EmissionController()
+    controller.initialize_model(args.data)
+
+    if args.fixed:
+        request_factory = fixed_request(DEFAULT_FEATURES)
+    else:
+        request_factory = random_request(controller.model.features, seed=0)
+
+    server = client = batcher = None
+    predict_fn, initializer, initargs = controller.predict_emission, None, ()
+    if args.micro_batch:
+        batcher = MicroBatcher(controller, max_wait_ms=args.max_wait_ms, max_batch_size=args.max_batch_size)
+        predict_fn = batcher.predict
+    if args.client == 'http':
+        if args.url is None:
+            server = PredictionServer(controller, port=0, batcher=batcher).start()
+        client = PredictionClient(args.url or server.url, pool_size=args.concurrency)
+        predict_fn = client.predict
+    elif args.backend == 'process':
+        predict_fn = predict_one
+        initializer, initargs = worker_setup(controller, engine=controller.model.engine)
+
+    benchmark_utils = BenchmarkUtils()
+    generator = LoadGenerator(predict_fn, request_factory, benchmark_utils, backend=args.backend,
+                              concurrency=args.concurrency, mode=args.mode, target_rps=args.rps,
+                              warmup=args.warmup, initializer=initializer, initargs=initargs,
+                              timed=client is not None,
+                              after_warmup=batcher.reset_metrics if batcher is not None else None)
+    try:
+        stats = generator.run(args.requests)
+    finally:
+        if client is not None:
+            client.close()
+        if server is not None:
+            server.stop()
+        if batcher is not None:
+            batcher.close()
+
+    print(f"{args.requests} requests, client={args.client}, backend={args.backend}, "
+          f"concurrency={args.concurrency}, mode={args.mode}")
+    for name, value in stats.items():
+        print(f"{name:>30}: {value:.3f}" if isinstance(value, float) else f"{name:>30}: {value}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(benchmark_utils.get_report_json(**{name: value for name, value in vars(args).items()
+                                                      if name != 'json'}))
+    if batcher is not None:
+        print("Micro-batching:")
+        for name, value in batcher.metrics().items():
+            print(f"{name:>30}: {value:.3f}" if isinstance(value, float) else f"{name:>30}: {value}")
+    return 0 if stats['successful_requests'] == stats['total_requests'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
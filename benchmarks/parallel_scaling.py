@@ -0,0 +1,55 @@
+"""Scaling efficiency of the multi-process scoring pool from 1 to N workers
+
+Run from the project root:
+    python -m benchmarks.parallel_scaling
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks.flat_forest_throughput import random_batch
+from controllers.emission_controller import EmissionController
+from controllers.scoring_pool import ScoringPool
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='co2 Emissions.csv')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--engine', choices=['flat', 'sklearn'], default='flat',
+                        help="flat shares one memory-mapped forest, sklearn loads a copy per worker")
+    args = parser.parse_args()
+
+    controller = EmissionController(engine=args.engine)
+    controller.initialize_model(args.data)
+    X = random_batch(args.rows)
+    expected = controller.predict_batch(X[:args.chunk_size * 2])
+
+    print(f"{args.rows:,} rows, engine={args.engine}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'seconds':>10}{'rows/s':>12}{'speedup':>10}{'efficiency':>12}")
+    baseline = None
+    for n_workers in range(1, args.max_workers + 1):
+        with ScoringPool(controller, n_workers=n_workers, chunk_size=args.chunk_size,
+                         engine=args.engine) as pool:
+            # Warm the workers up and check that order is preserved
+            if not np.array_equal(pool.predict_batch(X[:args.chunk_size * 2]), expected):
+                print("Pool predictions differ from the in-process predictions!")
+                return 1
+
+            start = time.perf_counter()
+            pool.predict_batch(X)
+            elapsed = time.perf_counter() - start
+
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(f"{n_workers:>8}{elapsed:>10.2f}{args.rows / elapsed:>12,.0f}"
+              f"{speedup:>9.2f}x{speedup / n_workers:>11.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
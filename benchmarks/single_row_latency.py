@@ -0,0 +1,76 @@
+"""Microbenchmark for single-row predictions: pandas path vs NumPy fast path
+
+Run from the project root:
+    python -m benchmarks.single_row_latency
+"""
+import argparse
+import time
+
+import numpy as np
+
+from controllers.emission_controller import EmissionController
+
+
+def random_features(model, n_rows, seed=0):
+    """Generate random feature dicts within the Prediction page ranges"""
+    rng = np.random.default_rng(seed)
+    columns = [
+        rng.uniform(1.0, 8.0, n_rows),
+        rng.integers(3, 12, n_rows),
+        rng.uniform(4.0, 20.0, n_rows),
+        rng.uniform(100, 800, n_rows),
+        rng.uniform(1000, 4000, n_rows),
+        rng.integers(2015, 2024, n_rows)
+    ]
+    return [dict(zip(model.features, values)) for values in zip(*columns)]
+
+
+def time_calls(predict, rows, warmup):
+    """Time each call in nanoseconds after a warmup"""
+    for features in rows[:warmup]:
+        predict(features)
+
+    timings = np.empty(len(rows), dtype=np.int64)
+    for i, features in enumerate(rows):
+        start = time.perf_counter_ns()
+        predict(features)
+        timings[i] = time.perf_counter_ns() - start
+    return timings / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='co2 Emissions.csv')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    args = parser.parse_args()
+
+    controller = EmissionController()
+    controller.initialize_model(args.data)
+    model = controller.model
+    rows = random_features(model, args.requests)
+
+    # The fast path must reproduce the pandas path bit-for-bit
+    mismatches = sum(
+        model.predict(features, fast=True) != model.predict(features, fast=False)
+        for features in rows[:500]
+    )
+    print(f"Parity: {mismatches} mismatches over {min(len(rows), 500)} rows")
+
+    results = {
+        'pandas': time_calls(lambda f: model.predict(f, fast=False), rows, args.warmup),
+        'fast': time_calls(lambda f: model.predict(f, fast=True), rows, args.warmup)
+    }
+
+    print(f"{'path':<8}{'p50 (us)':>12}{'p90 (us)':>12}{'p99 (us)':>12}")
+    for name, timings in results.items():
+        p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+        print(f"{name:<8}{p50:>12.1f}{p90:>12.1f}{p99:>12.1f}")
+
+    speedup = np.median(results['pandas']) / np.median(results['fast'])
+    print(f"p50 speedup: {speedup:.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
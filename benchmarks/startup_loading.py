@@ -0,0 +1,91 @@
+"""Startup data-loading time: double parse vs single parse vs columnar binary cache
+
+The dataset is replicated to make parsing cost visible. The old startup
+parsed and preprocessed the full CSV once for training and a second time
+for the average emission. The single parse reads only the needed columns
+with explicit dtypes, once. The binary cache memory-maps the preprocessed
+columns written by an earlier run.
+
+Run from the project root:
+    python -m benchmarks.startup_loading --replicate 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from models.emission_model import EmissionModel
+
+
+def legacy_load(data_path):
+    """The original preprocessing: full parse with type inference"""
+    df = pd.read_csv(data_path)
+    np.random.seed(42)
+    df['Horsepower'] = df['Engine Size(L)'] * 100 + np.random.normal(0, 10, len(df))
+    df['Weight (kg)'] = df['Engine Size(L)'] * 500 + np.random.normal(0, 50, len(df))
+    df['Year'] = np.random.randint(2015, 2024, len(df))
+    df["Fuel Type"] = df["Fuel Type"].map({
+        "Z": "Premium Gasoline", "X": "Regular Gasoline", "D": "Diesel",
+        "E": "Ethanol(E85)", "N": "Natural Gas"
+    })
+    return df[~df["Fuel Type"].str.contains("Natural Gas")].reset_index(drop=True)
+
+
+def legacy_startup(data_path):
+    """Load for training, then load again for the average emission"""
+    legacy_load(data_path)
+    return legacy_load(data_path)['CO2 Emissions(g/km)'].mean()
+
+
+def cached_startup(data_path):
+    """Load once and reuse the processed frame for training and the average emission"""
+    model = EmissionModel()
+    model.load_and_preprocess_data(data_path)
+    return model.load_and_preprocess_data(data_path)['CO2 Emissions(g/km)'].mean()
+
+
+def binary_cache_startup(data_path):
+    """Memory-map the preprocessed columns cached next to the data file"""
+    model = EmissionModel(data_cache_dir=os.path.join(os.path.dirname(data_path), 'cache'))
+    return model.load_and_preprocess_data(data_path)['CO2 Emissions(g/km)'].mean()
+
+
+def best_time(func, data_path, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(data_path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='co2 Emissions.csv')
+    parser.add_argument('--replicate', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, 'replicated.csv')
+        pd.concat([pd.read_csv(args.data)] * args.replicate).to_csv(data_path, index=False)
+
+        legacy_time, legacy_avg = best_time(legacy_startup, data_path, args.repeats)
+        cached_time, cached_avg = best_time(cached_startup, data_path, args.repeats)
+        binary_cache_startup(data_path)
+        binary_time, binary_avg = best_time(binary_cache_startup, data_path, args.repeats)
+
+    print(f"Dataset replicated {args.replicate}x")
+    print(f"Double parse:  {legacy_time * 1000:8.1f} ms  (avg emission {legacy_avg:.3f})")
+    print(f"Single parse:  {cached_time * 1000:8.1f} ms  (avg emission {cached_avg:.3f})")
+    print(f"Binary cache:  {binary_time * 1000:8.1f} ms  (avg emission {binary_avg:.3f})")
+    print(f"Reduction:     {(1 - cached_time / legacy_time) * 100:8.1f} % single parse, "
+          f"{(1 - binary_time / legacy_time) * 100:.1f} % binary cache")
+    return 0 if np.isclose(legacy_avg, cached_avg) and np.isclose(legacy_avg, binary_avg) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
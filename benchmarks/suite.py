@@ -0,0 +1,203 @@
+"""Headless benchmark suite with JSON results and regression checks against a baseline
+
+Times importing the app and the model path, data loading, training,
+single-row and batch prediction, feature importance, what-if curves and
+the visualization functions. Each case's calls are aggregated with
+BenchmarkUtils.
+
+Run from the project root, e.g.:
+    python -m benchmarks.suite --output results.json --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 0.25
+
+Exits with status 1 if a case's metric is slower than the baseline by more
+than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.cold_start import run_python
+from benchmarks.flat_forest_throughput import random_batch
+from models.emission_model import EmissionModel
+from models.explanations import TreeShap
+from models.what_if import WhatIfEngine
+from utils.benchmark_utils import BenchmarkUtils
+from utils.visualization import (create_gauge_chart, figure_to_png, plot_emission_comparison,
+                                 plot_feature_importance, render_emission_comparison, render_gauge_chart)
+
+BATCH_SIZES = (1, 100, 1000, 10000)
+METRICS = ('p50_response_time', 'avg_total_time', 'p95_response_time', 'p99_response_time')
+RESULT_KEYS = ('total_requests', 'avg_total_time', 'std_response_time', 'min_response_time',
+               'p50_response_time', 'p95_response_time', 'p99_response_time', 'max_response_time')
+
+
+def environment():
+    """Describe the machine and library versions the results were measured with"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().astimezone().isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scikit-learn': sklearn.__version__,
+        'matplotlib': matplotlib.__version__
+    }
+
+
+def run_case(func, repeats, warmup=1, rows_per_call=1):
+    """Time repeated calls of func, returning the BenchmarkUtils statistics of the measured ones"""
+    for _ in range(warmup):
+        func()
+
+    benchmark_utils = BenchmarkUtils()
+    benchmark_utils.start_benchmark()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        benchmark_utils.record_prediction({'total_time': elapsed, 'processing_time': elapsed,
+                                           'status': 'success'})
+    benchmark_utils.end_benchmark()
+
+    stats = benchmark_utils.get_statistics()
+    result = {key: stats[key] for key in RESULT_KEYS}
+    result['rows_per_second'] = rows_per_call * 1000 / stats['avg_total_time'] if stats['avg_total_time'] else 0
+    return result
+
+
+def render(fig):
+    """Render a figure to PNG the way Streamlit would"""
+    figure_to_png(fig)
+
+def build_cases(data_path, scale):
+    """Get (name, func, repeats, rows_per_call) for every case; scale multiplies the repeat counts"""
+    def repeats(n):
+        return max(1, int(n * scale))
+
+    model = EmissionModel()
+    model.train(data_path)
+    features = model.features
+    rows = [dict(zip(features, row)) for row in random_batch(1000, seed=0)]
+    row_iter = iter(rows * (repeats(2000) // len(rows) + 2))
+    importance = model.get_feature_importance()
+    what_if = WhatIfEngine(model.predict_batch, model.load_and_preprocess_data(data_path)[features].to_numpy(),
+                           features)
+    prediction = model.predict(rows[0])
+
+    cases = [
+        # A fresh interpreter importing the entry point, so a new eager heavy import shows up here
+        ('import_app', lambda: run_python('-c', 'import app'), repeats(3), 1),
+        ('import_model_path', lambda: run_python('-c', 'import controllers.emission_controller'), repeats(3), 1),
+        ('load_and_preprocess_data', lambda: EmissionModel().load_and_preprocess_data(data_path), repeats(10), 1),
+        ('train', lambda: EmissionModel().train(data_path), repeats(3), 1),
+        ('predict_single_fast', lambda: model.predict(next(row_iter)), repeats(2000), 1),
+        ('predict_single_pandas', lambda: model.predict(rows[0], fast=False), repeats(200), 1),
+    ]
+    for size in BATCH_SIZES:
+        batch = random_batch(size, seed=size)
+        cases.append((f'predict_batch_{size}', lambda batch=batch: model.predict_batch(batch),
+                      repeats(max(5, 2000 // size)), size))
+    cases += [
+        ('get_feature_importance', model.get_feature_importance, repeats(1000), 1),
+        ('what_if_all_curves', what_if.all_curves, repeats(5), 1),
+        ('what_if_interaction', lambda: what_if.interaction(features[0], features[2]), repeats(5), 1),
+        ('permutation_importance', lambda: model.get_permutation_importance(data_path, n_repeats=5), repeats(3), 1),
+        ('tree_shap_build', lambda: TreeShap.from_forest(model.model), repeats(1), 1),
+        ('explain_batch_10', lambda: model.explain_batch(rows[:10]), repeats(3), 10),
+        ('plot_feature_importance', lambda: render(plot_feature_importance(importance)), repeats(20), 1),
+        ('plot_emission_comparison',
+         lambda: render(plot_emission_comparison(prediction, model.avg_emission)), repeats(20), 1),
+        ('create_gauge_chart', lambda: render(create_gauge_chart(prediction, 0, 300, "Emission Meter")),
+         repeats(20), 1),
+        ('render_comparison_reused',
+         lambda: render_emission_comparison(prediction, model.avg_emission, use_cache=False), repeats(20), 1),
+        ('render_gauge_chart_reused',
+         lambda: render_gauge_chart(prediction, 0, 300, "Emission Meter", use_cache=False), repeats(20), 1),
+    ]
+    return cases
+
+
+def compare(results, baseline, metric, threshold):
+    """Compare each case against the baseline, returning a list of (name, baseline, current, change, status)"""
+    rows = []
+    for name, result in results['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None or not base.get(metric):
+            rows.append((name, None, result[metric], None, 'new'))
+            continue
+        change = result[metric] / base[metric] - 1
+        status = 'REGRESSION' if change > threshold else ('improved' if change < -threshold else 'ok')
+        rows.append((name, base[metric], result[metric], change, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='co2 Emissions.csv')
+    parser.add_argument('--output', default=None, help="Write the results JSON to this file")
+    parser.add_argument('--baseline', default=None, help="Baseline results JSON to compare against")
+    parser.add_argument('--save-baseline', default=None, help="Also write the results as a new baseline")
+    parser.add_argument('--metric', choices=METRICS, default='p50_response_time',
+                        help="Per-case statistic compared with the baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Allowed slowdown as a fraction, e.g. 0.2 for 20%%")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Multiply every case's repeat count, e.g. 0.2 for a quick run")
+    parser.add_argument('--cases', nargs='*', default=None, help="Only run cases whose name starts with these")
+    args = parser.parse_args()
+
+    results = {'environment': environment(), 'metric': args.metric, 'cases': {}}
+    for name, func, repeats, rows_per_call in build_cases(args.data, args.scale):
+        if args.cases and not any(name.startswith(prefix) for prefix in args.cases):
+            continue
+        result = run_case(func, repeats, rows_per_call=rows_per_call)
+        results['cases'][name] = result
+        print(f"{name:>26}: p50 {result['p50_response_time']:10.3f} ms  p95 {result['p95_response_time']:10.3f} ms"
+              f"  ({result['total_requests']} calls)", flush=True)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline is None:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.metric, args.threshold)
+    print(f"\nCompared with {args.baseline} on {args.metric}, threshold {args.threshold:.0%}:")
+    for name, base, current, change, status in rows:
+        base_text = f"{base:10.3f}" if base is not None else f"{'-':>10}"
+        change_text = f"{change:+8.1%}" if change is not None else f"{'':>8}"
+        print(f"{name:>26}: {base_text} -> {current:10.3f} ms {change_text}  {status}")
+
+    regressions = [row[0] for row in rows if row[4] == 'REGRESSION']
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1 @@
+# Puts the project root on sys.path so tests import models, controllers and utils as the app does
@@ -1,29 +1,241 @@
 from models.emission_model import EmissionModel
+from models.model_store import ModelStore, DEFAULT_ARTIFACT_DIR
+from models.model_selection import HyperparameterSearch
+from models.what_if import WhatIfEngine
+from controllers.prediction_cache import PredictionCache
+from utils.instrumentation import span
 import pandas as pd
+import numpy as np
+
+# Upper bounds (g/km) of ratings A to E, anything above is F
+RATING_BOUNDS = [100, 120, 140, 160, 180]
+RATING_LETTERS = np.array(['A', 'B', 'C', 'D', 'E', 'F'])
 
 class EmissionController:
-    def __init__(self):
-        self.model = EmissionModel()
+    def __init__(self, artifact_dir=DEFAULT_ARTIFACT_DIR, prediction_cache=True, compaction=None,
+                 **model_params):
+        self.model = EmissionModel(data_cache_dir=artifact_dir, **model_params)
+        # A PredictionCache instance, True for the default one, or None/False for no cache
+        if prediction_cache is True:
+            prediction_cache = PredictionCache()
+        self.prediction_cache = prediction_cache or None
+        # EmissionModel.compact arguments, to serve a compacted variant of the trained forest
+        self.compaction = compaction
+        self._tree_shap_version = None
+        self.store = ModelStore(artifact_dir) if artifact_dir else None
         self.trained = False
         self.avg_emission = None
+        self.model_version = None
+        # Version of the full forest, differs from model_version when serving a compacted one
+        self.full_version = None
+        self.loaded_from_cache = False
+
+    def initialize_model(self, data_path, incremental=False):
+        """Initialize the model, loading a stored artifact or training a new one
+
+        With incremental=True a cache miss first looks for the last artifact
+        trained on this file and, if rows were only appended since, updates
+        it with refresh_model instead of training from scratch.
+        """
+        key = None
+        if self.store is not None:
+            key = self.store.artifact_key(data_path, self.model.params, self.model.features)
+            artifact = self.store.load(key)
+            if artifact is not None:
+                self._apply_artifact(key, artifact)
+                self.loaded_from_cache = True
+                self.store.record_latest(data_path, self.model.params, key)
+                self._apply_compaction(data_path)
+                return self.model.test_score
+
+            if incremental:
+                base_key = self.store.latest_key(data_path, self.model.params)
+                base_artifact = self.store.load(base_key) if base_key else None
+                if base_artifact is not None:
+                    self._apply_artifact(base_key, base_artifact)
+                    if self.model.find_appended_rows(data_path) is not None:
+                        return self.refresh_model(data_path)
 
-    def initialize_model(self, data_path):
-        """Initialize and train the model"""
-        test_score = self.model.train(data_path)
+        # Training parses the dataset once and computes the average emission on the same frame
+        self.model.train(data_path)
         self.trained = True
+        self.loaded_from_cache = False
+        self.avg_emission = self.model.avg_emission
+
+        if self.store is not None:
+            self.store.save(key, self.model.to_artifact(training_mode='full'))
+            self.store.record_latest(data_path, self.model.params, key)
+        self.model_version = key
+        self._invalidate_predictions()
+        self._apply_compaction(data_path)
         
-        # Calculate average emission
-        df = self.model.load_and_preprocess_data(data_path)
-        self.avg_emission = df['CO2 Emissions(g/km)'].mean()
-        
-        return test_score
+        return self.model.test_score
+
+    def refresh_model(self, data_path, new_trees=10, max_trees=200):
+        """Update the model with rows appended to the data file
+
+        Any other change to the file falls back to a full initialize_model.
+        """
+        if self.model.compaction is not None:
+            # Appended rows update the full forest, which is then compacted again
+            artifact = self.store.load(self.full_version) if self.store is not None else None
+            if artifact is None:
+                return self.initialize_model(data_path)
+            self._apply_artifact(self.full_version, artifact)
+
+        if not self.trained or self.model.find_appended_rows(data_path) is None:
+            return self.initialize_model(data_path)
+
+        base_version = self.model_version
+        self.model.train_incremental(data_path, new_trees=new_trees, max_trees=max_trees)
+        self.avg_emission = self.model.avg_emission
+        self.loaded_from_cache = False
+
+        key = None
+        if self.store is not None:
+            key = self.store.artifact_key(data_path, self.model.params, self.model.features)
+            if key != base_version:
+                self.store.save(key, self.model.to_artifact(training_mode='incremental',
+                                                            base_version=base_version))
+                self.store.record_latest(data_path, self.model.params, key)
+        self.model_version = key
+        self._invalidate_predictions()
+        self._apply_compaction(data_path)
+
+        return self.model.test_score
+
+    def tune_model(self, data_path, search=None):
+        """Search forest hyperparameters, then train and store the best configuration
+
+        The search only sees the training split, so the test score stays
+        comparable. Its results are kept in the stored artifact, and the
+        winning parameters are recorded for use_tuned_params.
+        """
+        search = search or HyperparameterSearch()
+        X_train, _, y_train, _ = self.model.split_data(data_path)
+        result = search.run(X_train, y_train)
+
+        # Parameters the search didn't cover keep their current values
+        self._replace_model(dict(self.model.params, **result['best_params']))
+        test_score = self.initialize_model(data_path)
+        if self.store is not None:
+            # The search results belong to the full forest, which compacted variants derive from
+            artifact = self.store.load(self.full_version)
+            self.store.save(self.full_version, dict(artifact, search=result))
+            self.store.record_tuned_params(data_path, self.model.params)
+
+        return test_score, result
+
+    def use_tuned_params(self, data_path):
+        """Switch to the hyperparameters tune_model last recorded for a data file, before initialize_model
+
+        Returns whether the parameters changed.
+        """
+        tuned = self.store.tuned_params(data_path) if self.store is not None else None
+        if not tuned:
+            return False
+
+        params = dict(self.model.params, **tuned)
+        if params == self.model.params:
+            return False
+        self._replace_model(params)
+        return True
+
+    def _replace_model(self, params):
+        """Start over with an untrained model of other hyperparameters, same engine and dataset cache"""
+        data_cache_dir = self.model.dataset_cache.cache_dir if self.model.dataset_cache else None
+        self.model = EmissionModel(engine=self.model.engine, data_cache_dir=data_cache_dir, **params)
+        self.trained = False
+
+    def _invalidate_predictions(self):
+        """Drop cached predictions of a model that was just retrained
+
+        A version change alone invalidates the cache, this also covers
+        retraining without a model store, where the version stays None.
+        """
+        if self.prediction_cache is not None:
+            self.prediction_cache.clear()
+
+    def _apply_compaction(self, data_path):
+        """Swap the full forest for its compacted variant, loading it from the store or building it"""
+        self.full_version = self.model_version
+        if not self.compaction:
+            return
+
+        key = None
+        if self.store is not None and self.model_version is not None:
+            key = self.store.compact_key(self.model_version, self.compaction)
+            artifact = self.store.load(key)
+            if artifact is not None:
+                self._apply_artifact(key, artifact)
+                self._invalidate_predictions()
+                return
+
+        with span('train.compact'):
+            self.model.compact(data_path, **self.compaction)
+        if key is not None:
+            self.store.save(key, self.model.to_artifact(training_mode='compact', base_version=self.model_version))
+        self.model_version = key
+        self._invalidate_predictions()
+
+    def _apply_artifact(self, key, artifact):
+        """Take over the fitted state of a stored artifact"""
+        self.model.load_artifact(artifact)
+        self.avg_emission = self.model.avg_emission
+        self.model_version = key
+        self.trained = True
+
+    def export_flat_forest(self):
+        """Store the flat forest next to the model artifact so other processes can map it"""
+        if self.store is None or self.model_version is None:
+            raise ValueError("Sharing the model needs a model store and an initialized model!")
+
+        return self.store.save_flat_forest(self.model_version, self.model.flat_forest,
+                                           avg_emission=float(self.avg_emission))
+
+    def attach_model(self, model_version):
+        """Attach to a stored model without training
 
-    def predict_emission(self, features):
-        """Make prediction using the model"""
+        With engine='flat' only the memory-mapped flat forest is loaded, so
+        any number of processes share one copy of the node arrays.
+        """
+        if self.store is None:
+            raise ValueError("Attaching a stored model needs a model store!")
+
+        if self.model.engine == 'flat':
+            flat_forest, metadata = self.store.load_flat_forest(model_version)
+            if flat_forest is None:
+                raise ValueError(f"No flat forest stored for model {model_version[:16]}!")
+            self.model.attach_flat_forest(flat_forest)
+            self.avg_emission = metadata['avg_emission']
+            self.model_version = model_version
+            self.trained = True
+        else:
+            artifact = self.store.load(model_version)
+            if artifact is None:
+                raise ValueError(f"No artifact stored for model {model_version[:16]}!")
+            self._apply_artifact(model_version, artifact)
+        self.loaded_from_cache = True
+
+    def predict_emission(self, features, use_cache=True):
+        """Make prediction using the model, served from the prediction cache when possible
+
+        use_cache=False always runs the model.
+        """
         if not self.trained:
             raise ValueError("Model needs to be trained first!")
-        
-        return self.model.predict(features)
+
+        with span('predict.total'):
+            if use_cache and self.prediction_cache is not None:
+                return self.prediction_cache.get_or_predict(features, self.model_version, self.model.predict)
+            return self.model.predict(features)
+
+    def predict_batch(self, features, chunk_size=None):
+        """Make predictions for a batch of vehicles"""
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+
+        return self.model.predict_batch(features, chunk_size=chunk_size)
 
     def get_feature_importance(self):
         """Get feature importance scores"""
@@ -32,6 +244,81 @@ class EmissionController:
         
         return self.model.get_feature_importance()
 
+    def get_training_data(self, data_path):
+        """Get the preprocessed dataset, parsed at most once while the file is unchanged"""
+        return self.model.load_and_preprocess_data(data_path)
+
+    def get_dataset_summary(self, data_path):
+        """Get the number of vehicles and average emissions, overall and per fuel type"""
+        df = self.get_training_data(data_path)
+        target = self.model.target
+        return {
+            'rows': len(df),
+            'avg_emission': float(df[target].mean()),
+            'by_fuel_type': df.groupby('Fuel Type', observed=True)[target].agg(['count', 'mean'])
+        }
+
+    def get_what_if_engine(self, data_path):
+        """Get a what-if engine for the current model, sampling background rows from the dataset"""
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+
+        samples = self.get_training_data(data_path)[self.model.features].to_numpy(dtype=np.float64)
+        return WhatIfEngine(self.model.predict_batch, samples, self.model.features)
+
+    def get_partial_dependence(self, data_path):
+        """Get partial dependence and ICE curves of every feature"""
+        return self.get_what_if_engine(data_path).all_curves()
+
+    def get_interaction(self, data_path, feature_a, feature_b):
+        """Get the joint partial dependence of two features"""
+        return self.get_what_if_engine(data_path).interaction(feature_a, feature_b)
+
+    def get_permutation_importance(self, data_path, n_repeats=10):
+        """Get permutation importance on the test split, stored with the model artifact"""
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+
+        result = None
+        if self.store is not None and self.model_version is not None:
+            result = self.store.load_permutation_importance(self.model_version, n_repeats)
+        if result is None:
+            with span('explain.permutation'):
+                result = self.model.get_permutation_importance(data_path, n_repeats=n_repeats)
+            if self.store is not None and self.model_version is not None:
+                self.store.save_permutation_importance(self.model_version, result)
+        return result
+
+    def _prepare_tree_shap(self):
+        """Attach the stored TreeSHAP paths of the current model, building and storing them once"""
+        if self.store is None or self.model_version is None or self._tree_shap_version == self.model_version:
+            return
+
+        tree_shap, _ = self.store.load_tree_shap(self.model_version)
+        if tree_shap is None:
+            with span('explain.tree_shap'):
+                self.store.save_tree_shap(self.model_version, self.model.tree_shap)
+            tree_shap, _ = self.store.load_tree_shap(self.model_version)
+        self.model.attach_tree_shap(tree_shap)
+        self._tree_shap_version = self.model_version
+
+    def explain_batch(self, features):
+        """Get the base value and per-feature SHAP values of a batch of vehicles"""
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+
+        self._prepare_tree_shap()
+        return self.model.explain_batch(features)
+
+    def explain_prediction(self, features):
+        """Break one prediction down into the average prediction plus a contribution per feature"""
+        base_value, shap_values = self.explain_batch([features])
+        return {
+            'base_value': base_value,
+            'contributions': dict(zip(self.model.features, shap_values[0].tolist())),
+            'prediction': base_value + float(shap_values[0].sum())
+        }
+
     def get_average_emission(self):
         """Get average emission value"""
         return self.avg_emission
@@ -51,6 +338,10 @@ class EmissionController:
         else:
             return 'F'
 
+    def get_emission_ratings(self, emission_values):
+        """Get emission ratings (A to F) for an array of emission values"""
+        return RATING_LETTERS[np.searchsorted(RATING_BOUNDS, emission_values, side='right')]
+
     def get_eco_tips(self, emission_value):
         """Get eco-friendly tips based on emission value"""
         tips = []
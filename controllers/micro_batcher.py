@@ -0,0 +1,176 @@
+import asyncio
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesce concurrent single predictions into small vectorized batches
+
+    Callers put their feature dict on a queue and wait. A dispatcher thread
+    takes the first waiting request, gathers more until max_batch_size are
+    waiting or max_wait_ms has passed since the first arrived, scores them
+    with one EmissionModel.predict_rows call and hands each caller its own
+    result. Like EmissionController.predict_emission, requests are answered
+    from the controller's prediction cache when it holds them, without
+    queueing, and batched predictions are stored in the cache, so
+    both return the same values. use_cache=False always runs the model.
+
+    metrics() reports the batch size distribution, the time requests spent
+    queued before their batch started and how many were answered directly.
+    """
+
+    def __init__(self, controller, max_wait_ms=2.0, max_batch_size=64, history=10000, use_cache=True):
+        if not controller.trained:
+            raise ValueError("Model needs to be trained first!")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1!")
+
+        self.controller = controller
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.use_cache = use_cache
+        self._features = controller.model.features
+        self._queue = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes = collections.Counter()
+        self._queue_times = collections.deque(maxlen=history)
+        self._n_requests = 0
+        self._n_cached = 0
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    def submit(self, features):
+        """Queue one prediction, returning a Future of (prediction, queue ms, batch ms)
+
+        Requests answered by the cache get a resolved Future
+        with zero queue and batch times.
+        """
+        key, model_version = None, self.controller.model_version
+        cache = self.controller.prediction_cache
+        if self.use_cache and cache is not None:
+            key, prediction, features = cache.lookup(features, model_version)
+            if prediction is not None:
+                return self._resolved(prediction)
+
+        try:
+            row = [float(features[feature]) for feature in self._features]
+        except KeyError as e:
+            raise ValueError(f"Missing feature: {e.args[0]}")
+
+        future = Future()
+        self._queue.put((row, future, time.perf_counter(), key, model_version))
+        return future
+
+    def _resolved(self, prediction):
+        with self._metrics_lock:
+            self._n_cached += 1
+        future = Future()
+        future.set_result((prediction, 0.0, 0.0))
+        return future
+
+    def predict(self, features):
+        """Predict one vehicle, blocking until its batch has been scored"""
+        return self.submit(features).result()[0]
+
+    async def predict_async(self, features):
+        """Predict one vehicle from a coroutine without blocking the event loop"""
+        return (await asyncio.wrap_future(self.submit(features)))[0]
+
+    def _collect(self):
+        """Wait for a first request, then gather more until the batch is full or the wait is over"""
+        batch = [self._queue.get()]
+        if batch[0] is None:
+            return None
+
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            start = time.perf_counter()
+            queue_times = [(start - item[2]) * 1000 for item in batch]
+            try:
+                rows = np.array([item[0] for item in batch], dtype=np.float64)
+                predictions = self.controller.model.predict_rows(rows)
+            except Exception as e:
+                for item in batch:
+                    item[1].set_exception(e)
+                continue
+            batch_time = (time.perf_counter() - start) * 1000
+
+            cache = self.controller.prediction_cache
+            for (_, _, _, key, model_version), prediction in zip(batch, predictions):
+                if key is not None and cache is not None:
+                    cache.put(key, model_version, prediction)
+
+            with self._metrics_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._queue_times.extend(queue_times)
+                self._n_requests += len(batch)
+
+            for (_, future, _, _, _), prediction, queue_time in zip(batch, predictions, queue_times):
+                future.set_result((prediction, queue_time, batch_time))
+
+    def metrics(self):
+        """Get the batch size distribution and the queueing latency added by batching"""
+        with self._metrics_lock:
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            queue_times = np.array(self._queue_times, dtype=np.float64)
+            n_requests = self._n_requests
+            n_cached = self._n_cached
+
+        n_batches = sum(batch_sizes.values())
+        metrics = {
+            'requests': n_requests,
+            'cached_requests': n_cached,
+            'batches': n_batches,
+            'mean_batch_size': n_requests / n_batches if n_batches else 0,
+            'batch_size_distribution': batch_sizes,
+            'max_wait_ms': self.max_wait * 1000,
+            'max_batch_size': self.max_batch_size
+        }
+        for name, q in (('p50', 50), ('p95', 95), ('p99', 99)):
+            metrics[f'queue_time_{name}'] = float(np.percentile(queue_times, q)) if len(queue_times) else 0
+        metrics['queue_time_mean'] = float(queue_times.mean()) if len(queue_times) else 0
+        metrics['queue_time_max'] = float(queue_times.max()) if len(queue_times) else 0
+        return metrics
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self._batch_sizes.clear()
+            self._queue_times.clear()
+            self._n_requests = 0
+            self._n_cached = 0
+
+    def close(self):
+        """Score what's queued, then stop the dispatcher thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
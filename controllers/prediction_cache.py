@@ -0,0 +1,152 @@
+import collections
+import math
+import threading
+import time
+
+# Step sizes of the prediction page inputs
+UI_STEPS = {
+    'Engine Size(L)': 0.1,
+    'Cylinders': 1,
+    'Fuel Consumption Comb (L/100 km)': 0.1,
+    'Horsepower': 10,
+    'Weight (kg)': 100,
+    'Year': 1
+}
+
+# How far from a grid point, in steps, an input may be and still count as on the grid
+GRID_TOLERANCE = 1e-6
+
+
+class PredictionCache:
+    """Bounded LRU cache of predictions keyed on the inputs quantized to a grid
+
+    Each feature is divided by its step size and rounded, so inputs that
+    differ only by float noise, like 2.0000000000000004 from a 0.1-step UI
+    input, share one entry. By default only inputs on the grid are cached
+    and anything else is predicted directly and counted as bypassed. With
+    snap=True every input is snapped to the nearest grid point, and the
+    prediction for that point is returned, so answers may differ from the
+    model by up to half a step in each feature.
+
+    Entries expire ttl seconds after they were stored, the least recently
+    used entry is evicted beyond max_size, and the whole cache is dropped
+    when the model version changes.
+    """
+
+    def __init__(self, steps=None, max_size=4096, ttl=300.0, snap=False):
+        self.steps = dict(steps or UI_STEPS)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.snap = snap
+        self.model_version = None
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = collections.Counter()
+
+    def key(self, features):
+        """Get the grid key of a feature dict, or None if it is off the grid and not snapped
+
+        Inputs with a missing (NaN) or infinite value have no grid point and
+        get None too, leaving the model to handle or reject them.
+        """
+        key = []
+        for feature, step in self.steps.items():
+            try:
+                steps = features[feature] / step
+            except KeyError as e:
+                raise ValueError(f"Missing feature: {e.args[0]}")
+            if not math.isfinite(steps):
+                return None
+            index = round(steps)
+            if not self.snap and abs(steps - index) > GRID_TOLERANCE:
+                return None
+            key.append(index)
+        return tuple(key)
+
+    def _check_version(self, model_version):
+        if model_version != self.model_version:
+            if self._entries:
+                self._counters['invalidations'] += 1
+            self._entries.clear()
+            self.model_version = model_version
+
+    def get(self, key, model_version):
+        """Get a cached prediction, or None"""
+        with self._lock:
+            self._check_version(model_version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+
+            prediction, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return prediction
+
+    def put(self, key, model_version, prediction):
+        with self._lock:
+            self._check_version(model_version)
+            self._entries[key] = (prediction, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def lookup(self, features, model_version):
+        """Get the grid key, the cached prediction or None, and the features to predict on a miss
+
+        The key is None for inputs that bypass the cache.
+        """
+        key = self.key(features)
+        if key is None:
+            with self._lock:
+                self._counters['bypassed'] += 1
+            return None, None, features
+
+        prediction = self.get(key, model_version)
+        if prediction is None and self.snap:
+            # The entry stands for the whole cell, so predict its grid point
+            features = dict(features, **{feature: index * step for (feature, step), index
+                                         in zip(self.steps.items(), key)})
+        return key, prediction, features
+
+    def get_or_predict(self, features, model_version, predict_fn):
+        """Get the prediction for a feature dict from the cache or from predict_fn"""
+        key, prediction, features = self.lookup(features, model_version)
+        if prediction is None:
+            prediction = predict_fn(features)
+            if key is not None:
+                self.put(key, model_version, prediction)
+        return prediction
+
+    def clear(self):
+        """Drop every entry, e.g. after the model was retrained in place"""
+        with self._lock:
+            if self._entries:
+                self._counters['invalidations'] += 1
+            self._entries.clear()
+
+    def stats(self, since=None):
+        """Get the hit, miss, eviction, expiration, bypass and invalidation counts
+
+        Given an earlier stats() result, counts only what happened since,
+        so one run can be measured without resetting a shared cache.
+        """
+        with self._lock:
+            stats = {name: self._counters[name] - (since[name] if since else 0) for name in
+                     ('hits', 'misses', 'evictions', 'expirations', 'bypassed', 'invalidations')}
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._counters.clear()
@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+
+import numpy as np
+
+from controllers.emission_controller import EmissionController
+
+# Controller of the current worker process, set up once by _init_worker
+_worker_controller = None
+
+
+def _init_worker(artifact_dir, model_version, engine):
+    """Attach the worker to the stored model instead of receiving it through a pipe"""
+    global _worker_controller
+    _worker_controller = EmissionController(artifact_dir=artifact_dir, engine=engine)
+    _worker_controller.attach_model(model_version)
+
+
+def _score_chunk(features):
+    return _worker_controller.predict_batch(features)
+
+
+def predict_one(features):
+    """Predict one feature dict in a worker process attached by worker_setup"""
+    return _worker_controller.predict_emission(features)
+
+
+def worker_setup(controller, engine='flat'):
+    """Get the process initializer and arguments that attach workers to the controller's stored model
+
+    With engine='flat' the workers share the memory-mapped flat forest.
+    Any other engine makes every worker unpickle its own copy of the forest.
+    """
+    if not controller.trained or controller.store is None:
+        raise ValueError("The controller needs an initialized model and a model store!")
+
+    if engine == 'flat':
+        controller.export_flat_forest()
+    return _init_worker, (controller.store.artifact_dir, controller.model_version, engine)
+
+
+class ScoringPool:
+    """Process pool that scores batches on every core with one shared model
+
+    Workers attach to the model stored by the parent's controller. With the
+    'flat' engine they memory-map the exported flat forest, so all processes
+    read the same physical pages. With 'sklearn' each worker loads the joblib
+    artifact and rebuilds its own forest, as sklearn copies the tree arrays
+    when unpickling, so memory grows with every worker; it is only there to
+    compare against. Chunks are dispatched with imap, which keeps output order.
+    """
+
+    def __init__(self, controller, n_workers=None, chunk_size=20000, engine='flat'):
+        initializer, initargs = worker_setup(controller, engine)
+        self.controller = controller
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.engine = engine
+        self._pool = multiprocessing.get_context().Pool(self.n_workers, initializer=initializer,
+                                                        initargs=initargs)
+
+    def predict_batch(self, features):
+        """Predict a batch across the workers, returning predictions in input order"""
+        matrix = self.controller.model._to_feature_frame(features).to_numpy(dtype=np.float64)
+        if len(matrix) == 0:
+            return np.empty(0, dtype=np.float64)
+
+        chunks = (matrix[start:start + self.chunk_size] for start in range(0, len(matrix), self.chunk_size))
+        return np.concatenate(list(self._pool.imap(_score_chunk, chunks)))
+
+    def close(self):
+        """Stop the worker processes"""
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
@@ -0,0 +1,116 @@
+import copy
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+
+def _with_estimators(forest, estimators):
+    """Shallow copy of a fitted forest serving the given trees"""
+    compact = copy.copy(forest)
+    compact.estimators_ = list(estimators)
+    compact.set_params(n_estimators=len(estimators))
+    return compact
+
+
+def select_trees(forest, X_val, y_val, n_trees):
+    """Keep the n_trees trees whose average has the lowest validation error, chosen greedily
+
+    Trees are added one at a time, each time the one that lowers the mean
+    squared error of the running average the most. X_val is scaled like the
+    forest's training inputs.
+    """
+    if not 0 < n_trees <= len(forest.estimators_):
+        raise ValueError(f"n_trees must be between 1 and {len(forest.estimators_)}!")
+
+    X_val = np.asarray(X_val, dtype=np.float32)
+    y_val = np.asarray(y_val, dtype=np.float64)
+    tree_predictions = np.array([estimator.predict(X_val) for estimator in forest.estimators_])
+
+    selected = []
+    remaining = list(range(len(tree_predictions)))
+    total = np.zeros(len(y_val))
+    for k in range(1, n_trees + 1):
+        errors = (((total + tree_predictions[remaining]) / k - y_val) ** 2).mean(axis=1)
+        best = remaining.pop(int(np.argmin(errors)))
+        selected.append(best)
+        total += tree_predictions[best]
+    return _with_estimators(forest, [forest.estimators_[i] for i in selected])
+
+
+def _truncate_tree(tree, max_depth):
+    """Copy of a fitted Tree cut at max_depth, the cut nodes becoming leaves
+
+    Internal nodes of a regression tree hold the mean target of their
+    samples, so a cut node predicts what a tree grown to max_depth would.
+    """
+    state = tree.__getstate__()
+    nodes, values = state['nodes'], state['values']
+    left, right = nodes['left_child'], nodes['right_child']
+
+    # Nodes are stored in depth-first order, parents before children
+    depth = np.zeros(len(nodes), dtype=np.int64)
+    internal = np.flatnonzero(left != TREE_LEAF)
+    for node in internal:
+        depth[left[node]] = depth[right[node]] = depth[node] + 1
+
+    keep = depth <= max_depth
+    new_index = np.cumsum(keep) - 1
+    nodes = nodes[keep].copy()
+    cut = (depth[keep] == max_depth) & (nodes['left_child'] != TREE_LEAF)
+    branch = ~cut & (nodes['left_child'] != TREE_LEAF)
+    nodes['left_child'][branch] = new_index[nodes['left_child'][branch]]
+    nodes['right_child'][branch] = new_index[nodes['right_child'][branch]]
+    nodes['left_child'][cut] = nodes['right_child'][cut] = TREE_LEAF
+    nodes['feature'][cut] = TREE_UNDEFINED
+    nodes['threshold'][cut] = TREE_UNDEFINED
+
+    truncated = type(tree)(tree.n_features, tree.n_classes, tree.n_outputs)
+    truncated.__setstate__({'max_depth': int(min(state['max_depth'], max_depth)), 'node_count': len(nodes),
+                            'nodes': nodes, 'values': np.ascontiguousarray(values[keep])})
+    return truncated
+
+
+def cap_depth(forest, max_depth):
+    """Cut every tree of a fitted forest at max_depth"""
+    if max_depth < 1:
+        raise ValueError("max_depth must be at least 1!")
+
+    estimators = []
+    for estimator in forest.estimators_:
+        capped = copy.copy(estimator)
+        capped.tree_ = _truncate_tree(estimator.tree_, max_depth)
+        capped.set_params(max_depth=max_depth)
+        estimators.append(capped)
+    return _with_estimators(forest, estimators)
+
+
+def distillation_rows(X, n_synthetic=20000, noise=0.1, random_state=0):
+    """X plus n_synthetic rows drawn from X with Gaussian noise added to every feature
+
+    X is scaled, so `noise` is in standard deviations of each feature.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    rng = np.random.default_rng(random_state)
+    synthetic = X[rng.integers(0, len(X), n_synthetic)] + rng.normal(0, noise, (n_synthetic, X.shape[1]))
+    return np.vstack([X, synthetic])
+
+
+def distill(forest, X, n_estimators=20, max_depth=None, n_synthetic=20000, noise=0.1, random_state=0,
+            **student_params):
+    """Train a smaller forest to reproduce a fitted forest's predictions
+
+    The student learns the teacher's predictions on distillation_rows(X),
+    which gives it smooth targets and points between the training rows.
+    """
+    X_student = distillation_rows(X, n_synthetic, noise, random_state)
+    student = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=random_state,
+                                    **student_params)
+    return student.fit(X_student, forest.predict(X_student))
+
+
+def node_count(forest):
+    """Total number of nodes over all trees of a fitted forest"""
+    return sum(estimator.tree_.node_count for estimator in forest.estimators_)
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from models.model_store import DEFAULT_ARTIFACT_DIR, file_digest
+
+# Bump whenever the preprocessing or the cache layout changes
+DATASET_CACHE_VERSION = 2
+CURRENT_FILE = 'CURRENT'
+
+
+class DatasetCache:
+    """Columnar binary cache of the preprocessed dataset
+
+    Each column is stored as a .npy file, with categorical columns stored
+    as integer codes plus their categories. The files are opened
+    memory-mapped, which saves parsing, but building the DataFrame copies
+    them into its blocks, so the frame doesn't share memory with the cache.
+    A cache entry is valid while the source file keeps the same mtime and
+    size; when only the mtime changed, the content hash decides.
+
+    Every save writes a new version directory and then atomically replaces
+    the entry's CURRENT file, which names the version to read. Readers see
+    either the old or the new version, never a partial one, and a version
+    removed while being read counts as a cache miss.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_ARTIFACT_DIR):
+        self.cache_dir = cache_dir
+
+    def cache_path(self, data_path):
+        """Get the cache directory for a source file"""
+        name = hashlib.sha256(os.path.abspath(data_path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"dataset-{name}")
+
+    def _current_version(self, path):
+        """Get the directory of the version the entry's CURRENT file names, or None"""
+        try:
+            with open(os.path.join(path, CURRENT_FILE)) as f:
+                return os.path.join(path, f.read().strip())
+        except OSError:
+            return None
+
+    def _read_manifest(self, path):
+        try:
+            with open(os.path.join(path, 'manifest.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, data_path, mmap_mode='r'):
+        """Load the cached frame for a source file, or None when it is missing or stale"""
+        version_path = self._current_version(self.cache_path(data_path))
+        manifest = self._read_manifest(version_path) if version_path else None
+        if manifest is None or manifest['version'] != DATASET_CACHE_VERSION:
+            return None
+
+        stat = os.stat(data_path)
+        if stat.st_size != manifest['source_size']:
+            return None
+        if stat.st_mtime_ns != manifest['source_mtime_ns']:
+            # Touched but possibly unchanged, let the content decide
+            if file_digest(data_path) != manifest['source_digest']:
+                return None
+
+        columns = {}
+        try:
+            for i, column in enumerate(manifest['columns']):
+                values = np.load(os.path.join(version_path, f"col{i}.npy"), mmap_mode=mmap_mode)
+                if column['categories'] is not None:
+                    values = pd.Categorical.from_codes(values, categories=column['categories'])
+                columns[column['name']] = values
+        except OSError:
+            # A concurrent save replaced and removed this version
+            return None
+        return pd.DataFrame(columns, copy=False)
+
+    def save(self, data_path, df):
+        """Write a preprocessed frame to the cache as a new version and make it the current one"""
+        stat = os.stat(data_path)
+        manifest = {
+            'version': DATASET_CACHE_VERSION,
+            'source_path': os.path.abspath(data_path),
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'source_digest': file_digest(data_path),
+            'columns': []
+        }
+
+        path = self.cache_path(data_path)
+        os.makedirs(path, exist_ok=True)
+        version_path = tempfile.mkdtemp(dir=path, prefix='v-')
+        try:
+            for i, name in enumerate(df.columns):
+                series = df[name]
+                categories = None
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    categories = [str(c) for c in series.cat.categories]
+                    values = series.cat.codes.to_numpy()
+                else:
+                    values = series.to_numpy()
+                np.save(os.path.join(version_path, f"col{i}.npy"), values)
+                manifest['columns'].append({'name': name, 'categories': categories})
+
+            with open(os.path.join(version_path, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+
+            # Point CURRENT at the complete version in one rename
+            fd, tmp_current = tempfile.mkstemp(dir=path, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(os.path.basename(version_path))
+            os.replace(tmp_current, os.path.join(path, CURRENT_FILE))
+        except BaseException:
+            shutil.rmtree(version_path, ignore_errors=True)
+            raise
+
+        self._prune(path, version_path)
+        return version_path
+
+    def _prune(self, path, version_path):
+        """Remove the complete versions written before version_path
+
+        Versions still being written have no manifest yet, and ones completed
+        later belong to a concurrent save, so both are left alone. Readers of
+        a removed version get a cache miss.
+        """
+        try:
+            published = os.stat(os.path.join(version_path, 'manifest.json')).st_mtime_ns
+            names = os.listdir(path)
+        except OSError:
+            return
+        for name in names:
+            other = os.path.join(path, name)
+            if not name.startswith('v-') or other == version_path:
+                continue
+            try:
+                written = os.stat(os.path.join(other, 'manifest.json')).st_mtime_ns
+            except OSError:
+                continue
+            if written < published:
+                shutil.rmtree(other, ignore_errors=True)
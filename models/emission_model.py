@@ -1,12 +1,37 @@
+import os
+import threading
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
+from models.flat_forest import FlatForest
+from models.compaction import cap_depth, distill, select_trees
+from models.dataset_cache import DatasetCache
+from models.explanations import TreeShap, permutation_importance, r2_score
+from models.model_store import file_digest
+from utils.instrumentation import span
+
+INFERENCE_ENGINES = ('sklearn', 'flat')
+
+# Columns read from the raw CSV and their dtypes, everything else is skipped
+RAW_COLUMN_DTYPES = {
+    'Engine Size(L)': np.float64,
+    'Cylinders': np.int64,
+    'Fuel Type': 'category',
+    'Fuel Consumption Comb (L/100 km)': np.float64,
+    'CO2 Emissions(g/km)': np.int64
+}
 
 class EmissionModel:
-    def __init__(self):
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
+    def __init__(self, n_estimators=100, random_state=42, engine='sklearn', data_cache_dir=None,
+                 **forest_params):
+        if engine not in INFERENCE_ENGINES:
+            raise ValueError(f"Unknown inference engine: {engine}")
+
+        self.engine = engine
+        self.params = dict(n_estimators=n_estimators, random_state=random_state, **forest_params)
+        self.model = RandomForestRegressor(**self.params)
         self.scaler = StandardScaler()
         self.features = [
             'Engine Size(L)', 
@@ -18,11 +43,54 @@ class EmissionModel:
         ]
         self.target = 'CO2 Emissions(g/km)'
         self.trained = False
+        self.test_score = None
+        # R² of the last train_incremental on its held-out new rows
+        self.incremental_score = None
+        self.avg_emission = None
+        self.source = None
+        self.data = None
+        self._data_key = None
+        self.dataset_cache = DatasetCache(data_cache_dir) if data_cache_dir else None
+        self._fast_trees = None
+        self._fast_local = threading.local()
+        self._flat_forest = None
+        self._tree_shap = None
+        # Steps compact() applied to the trained forest, None for the full forest
+        self.compaction = None
 
     def load_and_preprocess_data(self, data_path):
-        """Load and preprocess the dataset"""
-        df = pd.read_csv(data_path)
-        
+        """Load and preprocess the dataset, reusing the processed frame while the file is unchanged
+
+        The returned frame is shared, callers must copy it before modifying it.
+        """
+        stat = os.stat(data_path)
+        data_key = (os.path.abspath(data_path), stat.st_mtime_ns, stat.st_size)
+        if self.data is not None and self._data_key == data_key:
+            return self.data
+
+        # Other processes and earlier runs may have left a memory-mappable copy on disk
+        with span('load.dataset_cache'):
+            df = self.dataset_cache.load(data_path) if self.dataset_cache is not None else None
+        if df is None:
+            df = self._read_and_preprocess(data_path)
+            if self.dataset_cache is not None:
+                with span('load.cache_save'):
+                    self.dataset_cache.save(data_path, df)
+
+        self.data = df
+        self._data_key = data_key
+        return self.data
+
+    def _read_and_preprocess(self, data_path):
+        """Parse the CSV once and derive the model columns"""
+        with span('load.read_csv'):
+            df = pd.read_csv(data_path, usecols=list(RAW_COLUMN_DTYPES), dtype=RAW_COLUMN_DTYPES)
+
+        with span('load.preprocess'):
+            return self._preprocess(df)
+
+    def _preprocess(self, df):
+        """Add the synthetic features and drop the fuel types the model doesn't cover"""
         # Add synthetic features for demonstration
         np.random.seed(42)
         df['Horsepower'] = df['Engine Size(L)'] * 100 + np.random.normal(0, 10, len(df))
@@ -41,6 +109,7 @@ class EmissionModel:
         
         # Remove natural gas vehicles (too few samples)
         df = df[~df["Fuel Type"].str.contains("Natural Gas")].reset_index(drop=True)
+        df["Fuel Type"] = df["Fuel Type"].cat.remove_unused_categories()
         
         return df
 
@@ -53,46 +122,428 @@ class EmissionModel:
             y = None
         return X, y
 
-    def train(self, data_path):
-        """Train the model"""
+    def split_data(self, data_path):
+        """Split the preprocessed dataset into the train and test parts used by train"""
         df = self.load_and_preprocess_data(data_path)
         X, y = self.prepare_features(df)
+        return train_test_split(X, y, test_size=0.2, random_state=42)
+
+    def split_validation(self, data_path):
+        """Split the test part of split_data in half, into a validation and a holdout part
+
+        Returns X_train, X_val, X_holdout, y_train, y_val, y_holdout.
+        """
+        X_train, X_test, y_train, y_test = self.split_data(data_path)
+        X_val, X_holdout, y_val, y_holdout = train_test_split(X_test, y_test, test_size=0.5, random_state=42)
+        return X_train, X_val, X_holdout, y_train, y_val, y_holdout
+
+    def train(self, data_path):
+        """Train the model"""
+        with span('train.load'):
+            df = self.load_and_preprocess_data(data_path)
+        y = df[self.target]
         
         # Split the data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        with span('train.split'):
+            X_train, X_test, y_train, y_test = self.split_data(data_path)
         
         # Scale the features
-        X_train_scaled = self.scaler.fit_transform(X_train)
+        with span('train.scale'):
+            X_train_scaled = self.scaler.fit_transform(X_train)
         
         # Train the model
-        self.model.fit(X_train_scaled, y_train)
+        # Start from the configured forest, a compacted one has other trees and parameters
+        with span('train.fit'):
+            self.model = RandomForestRegressor(**self.params)
+            self.model.fit(X_train_scaled, y_train)
         self.trained = True
+        self.compaction = None
+        self._fast_trees = None
+        self._flat_forest = None
+        self._tree_shap = None
         
         # Calculate and return metrics
-        X_test_scaled = self.scaler.transform(X_test)
-        test_score = self.model.score(X_test_scaled, y_test)
+        with span('train.score'):
+            X_test_scaled = self.scaler.transform(X_test)
+            test_score = self.model.score(X_test_scaled, y_test)
+        self.test_score = test_score
+        self.incremental_score = None
+        self.avg_emission = y.mean()
+        self._record_source(data_path, len(df))
         return test_score
 
-    def predict(self, features_dict):
+    def _record_source(self, data_path, n_rows):
+        """Remember which part of the data file the model has been trained on"""
+        size = os.path.getsize(data_path)
+        self.source = {'rows': n_rows, 'bytes': size, 'prefix_digest': file_digest(data_path, length=size)}
+
+    def find_appended_rows(self, data_path):
+        """Get the preprocessed rows added since training, or None if the file changed otherwise"""
+        if self.source is None or os.path.getsize(data_path) < self.source['bytes']:
+            return None
+        if file_digest(data_path, length=self.source['bytes']) != self.source['prefix_digest']:
+            return None
+
+        df = self.load_and_preprocess_data(data_path)
+        return df.iloc[self.source['rows']:]
+
+    def _rebase_thresholds(self, old_mean, old_scale, X):
+        """Move the split thresholds of the fitted trees from the old to the current scaling
+
+        Trees compare float32 inputs, and a threshold can sit within half a
+        float32 step of a training value, so rescaling it alone can move that
+        value across the split. Each threshold is instead placed halfway
+        between the new float32 images of the nearest values of X on either
+        side, as the splitter places them, so rows of X keep their branch.
+        """
+        new_mean, new_scale = self.scaler.mean_, self.scaler.scale_
+        X = np.asarray(X, dtype=np.float64)
+        columns = []
+        for j in range(X.shape[1]):
+            values = np.unique(X[:, j])
+            columns.append((((values - old_mean[j]) / old_scale[j]).astype(np.float32),
+                            ((values - new_mean[j]) / new_scale[j]).astype(np.float32).astype(np.float64)))
+
+        for estimator in self.model.estimators_:
+            tree = estimator.tree_
+            internal = tree.children_left != -1
+            for j, (old_values, new_values) in enumerate(columns):
+                nodes = np.flatnonzero(internal & (tree.feature == j))
+                thresholds = tree.threshold[nodes]
+                # Beyond every known value, only the raw threshold matters
+                rebased = (thresholds * old_scale[j] + old_mean[j] - new_mean[j]) / new_scale[j]
+                k = np.searchsorted(old_values, thresholds, side='right')
+                between = (k > 0) & (k < len(old_values))
+                low, high = new_values[k[between] - 1], new_values[k[between]]
+                rebased[between] = np.where(high > low, low / 2.0 + high / 2.0, low)
+                tree.threshold[nodes] = rebased
+
+    def train_incremental(self, data_path, new_trees=10, max_trees=200, recent_rows=2000):
+        """Update the model with rows appended to the data file since training
+
+        The scaler is updated with partial_fit and the existing trees are
+        rebased onto the new scaling. new_trees trees are then added with
+        warm_start, fitted on the most recent recent_rows rows. Past max_trees
+        the oldest trees are dropped. When there are enough new rows, a fifth
+        of them is held out and scored as incremental_score. test_score stays
+        the score on the full test split, comparable with train's.
+        """
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+        if self.compaction is not None:
+            raise ValueError("A compacted model can't be updated, update the full model!")
+
+        new_rows = self.find_appended_rows(data_path)
+        if new_rows is None:
+            raise ValueError("The data file changed beyond appended rows, retrain from scratch!")
+        if new_rows.empty:
+            return self.test_score
+
+        df = self.load_and_preprocess_data(data_path)
+        X_new, y_new = self.prepare_features(new_rows)
+
+        # Update the scaling and keep the existing trees consistent with it
+        old_mean, old_scale = self.scaler.mean_.copy(), self.scaler.scale_.copy()
+        self.scaler.partial_fit(X_new)
+        self._rebase_thresholds(old_mean, old_scale, self.prepare_features(df)[0])
+
+        test_index = []
+        if len(new_rows) >= 10:
+            _, X_test, _, y_test = train_test_split(X_new, y_new, test_size=0.2, random_state=42)
+            test_index = X_test.index
+
+        # Fit the extra trees on recent rows only
+        # Held-out rows older than the recent window aren't in it to begin with
+        recent = df.iloc[max(len(df) - recent_rows, 0):].drop(index=test_index, errors='ignore')
+        X_recent, y_recent = self.prepare_features(recent)
+        self.model.set_params(warm_start=True, n_estimators=len(self.model.estimators_) + new_trees)
+        self.model.fit(self.scaler.transform(X_recent), y_recent)
+        self.model.set_params(warm_start=False)
+
+        # Retention policy: keep the newest max_trees trees
+        if len(self.model.estimators_) > max_trees:
+            self.model.estimators_ = self.model.estimators_[-max_trees:]
+        self.model.set_params(n_estimators=len(self.model.estimators_))
+        self._fast_trees = None
+        self._flat_forest = None
+        self._tree_shap = None
+
+        if len(test_index):
+            self.incremental_score = self.model.score(self.scaler.transform(X_test), y_test)
+
+        n_seen = self.source['rows']
+        self.avg_emission = (self.avg_emission * n_seen + y_new.sum()) / (n_seen + len(new_rows))
+        self._record_source(data_path, len(df))
+        return self.test_score
+
+    def compact(self, data_path, n_trees=None, max_depth=None, distill_trees=None, float32=False):
+        """Replace the trained forest with a smaller, faster one
+
+        The steps run in this order, each one optional:
+
+        - distill_trees: train a forest of that many trees, grown to at most
+          max_depth, on the current forest's predictions
+        - n_trees: keep the trees whose average scores best on the
+          validation part of split_validation, chosen greedily
+        - max_depth: cut every tree at that depth
+        - float32: store the flat forest's thresholds and leaf values as
+          float32, needs engine='flat'
+
+        The test score is recomputed on the holdout part, which none of the
+        steps looks at.
+        """
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+        if self.compaction is not None:
+            raise ValueError("Model is already compacted, compact the full model!")
+        if float32 and self.engine != 'flat':
+            raise ValueError("float32 nodes need engine='flat'!")
+
+        X_train, X_val, X_holdout, y_train, y_val, y_holdout = self.split_validation(data_path)
+        forest = self.model
+        with span('compact.distill'):
+            if distill_trees:
+                forest = distill(forest, self.scaler.transform(X_train), n_estimators=distill_trees,
+                                 max_depth=max_depth, random_state=self.params.get('random_state'))
+        with span('compact.select'):
+            if n_trees:
+                forest = select_trees(forest, self.scaler.transform(X_val), y_val, n_trees)
+        if max_depth:
+            forest = cap_depth(forest, max_depth)
+
+        self.model = forest
+        self.compaction = {'n_trees': n_trees, 'max_depth': max_depth, 'distill_trees': distill_trees,
+                           'float32': bool(float32)}
+        self._fast_trees = None
+        self._flat_forest = None
+        self._tree_shap = None
+        self.test_score = r2_score(np.asarray(y_holdout, dtype=np.float64), self.predict_batch(X_holdout))
+        return self.test_score
+
+    def to_artifact(self, **extra):
+        """Export the fitted state for the model store"""
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+
+        artifact = {
+            'params': self.params,
+            'features': self.features,
+            'target': self.target,
+            'model': self.model,
+            'scaler': self.scaler,
+            'test_score': self.test_score,
+            'incremental_score': self.incremental_score,
+            'avg_emission': self.avg_emission,
+            'source': self.source,
+            'compaction': self.compaction
+        }
+        artifact.update(extra)
+        return artifact
+
+    def load_artifact(self, artifact):
+        """Restore the fitted state from a model store artifact"""
+        if artifact['features'] != self.features:
+            raise ValueError("Artifact was trained on a different feature set!")
+
+        self.params = artifact['params']
+        self.model = artifact['model']
+        self.scaler = artifact['scaler']
+        self.test_score = artifact['test_score']
+        self.incremental_score = artifact.get('incremental_score')
+        self.avg_emission = artifact['avg_emission']
+        self.source = artifact.get('source')
+        self.compaction = artifact.get('compaction')
+        self.trained = True
+        self._fast_trees = None
+        self._flat_forest = None
+        self._tree_shap = None
+
+    def predict(self, features_dict, fast=True):
         """Make predictions"""
         if not self.trained:
             raise ValueError("Model needs to be trained first!")
+
+        if fast:
+            return self._predict_fast(features_dict)
             
         # Convert input dictionary to DataFrame
-        features_df = pd.DataFrame([features_dict])
+        with span('predict.to_dataframe'):
+            features_df = pd.DataFrame([features_dict])
         
         # Scale the features
-        features_scaled = self.scaler.transform(features_df)
+        with span('predict.scale'):
+            features_scaled = self.scaler.transform(features_df)
         
         # Make prediction
-        prediction = self.model.predict(features_scaled)[0]
+        with span('predict.forest'):
+            predictions = self.model.predict(features_scaled)
+
+        with span('predict.extract'):
+            prediction = predictions[0]
         
         return prediction
 
+    def _build_fast_path(self):
+        """Collect the fitted trees and their leaf values for the fast path"""
+        self._fast_trees = [
+            (estimator.tree_, estimator.tree_.value[:, 0, 0])
+            for estimator in self.model.estimators_
+        ]
+
+    @property
+    def flat_forest(self):
+        """Flat-array copy of the forest with the scaler folded into its thresholds"""
+        if self._flat_forest is None:
+            flat_forest = FlatForest.from_estimator(self.model, self.scaler)
+            if self.compaction and self.compaction.get('float32'):
+                flat_forest = flat_forest.astype(np.float32)
+            self._flat_forest = flat_forest
+        return self._flat_forest
+
+    def attach_flat_forest(self, flat_forest):
+        """Serve predictions from an already exported flat forest, e.g. a memory-mapped one"""
+        if self.engine != 'flat':
+            raise ValueError("Attaching a flat forest needs engine='flat'!")
+
+        self._flat_forest = flat_forest
+        self.trained = True
+
+    def _fill_row(self, features_dict):
+        """Copy a feature dict into this thread's preallocated row"""
+        # One preallocated row per thread so concurrent callers don't share buffers
+        row = getattr(self._fast_local, 'row', None)
+        if row is None or row.shape[1] != len(self.features):
+            row = self._fast_local.row = np.empty((1, len(self.features)), dtype=np.float64)
+
+        try:
+            for i, feature in enumerate(self.features):
+                row[0, i] = features_dict[feature]
+        except KeyError as e:
+            raise ValueError(f"Missing feature: {e.args[0]}")
+        return row
+
+    def _predict_fast(self, features_dict):
+        """Predict a single row with NumPy only, matching predict(fast=False) exactly"""
+        with span('predict.to_row'):
+            row = self._fill_row(features_dict)
+        predictions = self.predict_rows(row)
+        with span('predict.extract'):
+            return predictions[0]
+
+    def predict_rows(self, rows):
+        """Predict a 2-D float64 array of raw features in feature order without pandas
+
+        Meant for single rows and small batches: the forest is walked tree by
+        tree in the same order as RandomForestRegressor.predict, so results
+        match predict and predict_batch exactly. rows is scaled in place.
+        """
+        if self.engine == 'flat':
+            # Scaling is folded into the flat forest's thresholds
+            with span('predict.forest'):
+                return self.flat_forest.predict(rows)
+
+        # Like RandomForestRegressor.predict; missing values (NaN) are routed by the trees
+        if np.isinf(rows).any():
+            raise ValueError("Input contains infinity!")
+
+        if self._fast_trees is None:
+            self._build_fast_path()
+
+        # Same operations, in the same order, as StandardScaler.transform
+        with span('predict.scale'):
+            rows -= self.scaler.mean_
+            rows /= self.scaler.scale_
+
+        # The forest evaluates float32 inputs and averages the float64 tree outputs
+        with span('predict.forest'):
+            rows32 = rows.astype(np.float32)
+            predictions = np.zeros(len(rows), dtype=np.float64)
+            for tree, leaf_values in self._fast_trees:
+                predictions += leaf_values[tree.apply(rows32)]
+            predictions /= len(self._fast_trees)
+
+        return predictions
+
+    def _to_feature_frame(self, X):
+        """Convert batch input into a DataFrame ordered by the model features"""
+        if isinstance(X, pd.DataFrame):
+            return X[self.features]
+        if isinstance(X, np.ndarray):
+            if X.ndim != 2 or X.shape[1] != len(self.features):
+                raise ValueError(f"Expected a 2-D array with {len(self.features)} feature columns!")
+            return pd.DataFrame(X, columns=self.features)
+        return pd.DataFrame.from_records(list(X), columns=self.features)
+
+    def predict_batch(self, X, chunk_size=None):
+        """Make predictions for many vehicles at once
+
+        X can be a DataFrame, a 2-D array with columns in feature order or an
+        iterable of feature dicts. Each chunk is scaled and run through the
+        forest in a single call.
+        """
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+
+        features_df = self._to_feature_frame(X)
+        n_rows = len(features_df)
+        predictions = np.empty(n_rows, dtype=np.float64)
+        step = chunk_size or max(n_rows, 1)
+
+        if self.engine == 'flat':
+            # Raw features go straight to the forest, scaling is folded into its thresholds
+            features = features_df.to_numpy(dtype=np.float64)
+            for start in range(0, n_rows, step):
+                predictions[start:start + step] = self.flat_forest.predict(features[start:start + step])
+            return predictions
+
+        for start in range(0, n_rows, step):
+            chunk = features_df.iloc[start:start + step]
+            predictions[start:start + step] = self.model.predict(self.scaler.transform(chunk))
+
+        return predictions
+
     def get_feature_importance(self):
         """Get feature importance scores"""
         if not self.trained:
             raise ValueError("Model needs to be trained first!")
             
         importance_dict = dict(zip(self.features, self.model.feature_importances_))
-        return importance_dict 
\ No newline at end of file
+        return importance_dict
+
+    def get_permutation_importance(self, data_path, n_repeats=10, n_jobs=None, confidence=0.95):
+        """Get the drop in test R² when each feature is shuffled, with confidence intervals
+
+        Scored on the held-out test split of split_data, with every
+        permutation run in parallel on a thread pool.
+        """
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+
+        _, X_test, _, y_test = self.split_data(data_path)
+        return permutation_importance(self.predict_batch, X_test.to_numpy(dtype=np.float64), y_test, self.features,
+                                      n_repeats=n_repeats, n_jobs=n_jobs, confidence=confidence)
+
+    @property
+    def tree_shap(self):
+        """Path decomposition of the forest for TreeSHAP, built on first use"""
+        if self._tree_shap is None:
+            if not hasattr(self.model, 'estimators_'):
+                raise ValueError("Explanations need the fitted forest, not only a flat forest!")
+            self._tree_shap = TreeShap.from_forest(self.model)
+        return self._tree_shap
+
+    def attach_tree_shap(self, tree_shap):
+        """Explain predictions with an already built TreeSHAP decomposition, e.g. a memory-mapped one"""
+        self._tree_shap = tree_shap
+
+    def explain_batch(self, X):
+        """Get the base value and the per-feature SHAP values of many vehicles
+
+        X is accepted in any form predict_batch takes. For every row, the
+        base value plus the row's SHAP values is its predict_batch prediction.
+        """
+        if not self.trained:
+            raise ValueError("Model needs to be trained first!")
+
+        features_scaled = self.scaler.transform(self._to_feature_frame(X))
+        return self.tree_shap.base_value, self.tree_shap.shap_values(features_scaled)
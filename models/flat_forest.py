@@ -0,0 +1,186 @@
+import json
+import os
+
+import numpy as np
+
+TREE_LEAF = -1
+FLAT_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots', 'is_leaf', 'missing_left')
+
+
+def fold_thresholds(threshold, mean, scale):
+    """Rewrite split thresholds on float32-rounded scaled inputs into raw feature space
+
+    scikit-learn sends a row left when float32((x - mean) / scale) <= threshold.
+    Float32 rounding is monotonic, so that holds exactly when the scaled value
+    lies below the rounding boundary just above the largest float32 that does
+    not exceed the threshold. Mapping that boundary back through the scaler
+    keeps inputs that sit exactly on a split value on the same side.
+    """
+    floor32 = threshold.astype(np.float32)
+    above = floor32.astype(np.float64) > threshold
+    floor32[above] = np.nextafter(floor32[above], np.float32(-np.inf))
+    upper32 = np.nextafter(floor32, np.float32(np.inf))
+    boundary = (floor32.astype(np.float64) + upper32.astype(np.float64)) / 2
+    return boundary * scale + mean
+
+
+class FlatForest:
+    """Fitted random forest flattened into contiguous NumPy arrays
+
+    All trees share one set of node arrays (feature, threshold, children,
+    value), with `roots` holding the index of each tree's root node. The
+    children of node i are stored at 2 * i (left) and 2 * i + 1 (right).
+    Batches are evaluated level by level over every (tree, row) pair at once.
+
+    When built with a scaler, the thresholds are rewritten into raw feature
+    space so inputs can be passed unscaled. Without one, inputs must already
+    be scaled and are rounded to float32 like scikit-learn does, which gives
+    bit-identical predictions.
+
+    Missing (NaN) inputs follow each node's `missing_left` flag, the branch
+    scikit-learn sends them down.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, n_features, float32_inputs, is_leaf=None,
+                 missing_left=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.n_features = n_features
+        self.float32_inputs = float32_inputs
+        self.is_leaf = children[0::2] == TREE_LEAF if is_leaf is None else is_leaf
+        # None for forests saved before missing values were routed, they reject NaN inputs
+        self.missing_left = missing_left
+
+    @classmethod
+    def from_estimator(cls, forest, scaler=None):
+        """Export a fitted RandomForestRegressor, optionally folding in a StandardScaler"""
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+        feature = np.concatenate([tree.feature for tree in trees]).astype(np.int32)
+        threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+        value = np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(np.float64)
+        missing_left = np.concatenate([tree.missing_go_to_left for tree in trees]).astype(bool)
+
+        # Child indices are local to each tree, shift them to global positions
+        children = np.empty(2 * sizes.sum(), dtype=np.int32)
+        children[0::2] = np.concatenate([
+            np.where(tree.children_left == TREE_LEAF, TREE_LEAF, tree.children_left + offset)
+            for tree, offset in zip(trees, offsets)
+        ])
+        children[1::2] = np.concatenate([
+            np.where(tree.children_right == TREE_LEAF, TREE_LEAF, tree.children_right + offset)
+            for tree, offset in zip(trees, offsets)
+        ])
+
+        # Leaves never get compared, give them a valid feature index
+        leaves = children[0::2] == TREE_LEAF
+        feature[leaves] = 0
+        threshold[leaves] = 0.0
+
+        if scaler is not None:
+            internal = ~leaves
+            threshold[internal] = fold_thresholds(threshold[internal], scaler.mean_[feature[internal]],
+                                                  scaler.scale_[feature[internal]])
+
+        return cls(feature, threshold, children, value, offsets.astype(np.int32),
+                   n_features=forest.n_features_in_, float32_inputs=scaler is None, missing_left=missing_left)
+
+    def save(self, path, **metadata):
+        """Write the node arrays as .npy files plus a JSON manifest into a directory"""
+        os.makedirs(path, exist_ok=True)
+        for name in FLAT_ARRAYS:
+            if getattr(self, name) is None:
+                continue
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+        manifest = dict(metadata, n_features=int(self.n_features), float32_inputs=bool(self.float32_inputs))
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a saved forest, memory-mapping its arrays by default
+
+        Returns the forest and the extra metadata stored with it. With
+        mmap_mode='r' every process loading the same directory shares the
+        node arrays through the page cache instead of holding its own copy.
+        """
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in FLAT_ARRAYS if os.path.exists(os.path.join(path, f"{name}.npy"))}
+        forest = cls(n_features=manifest.pop('n_features'),
+                     float32_inputs=manifest.pop('float32_inputs'), **arrays)
+        return forest, manifest
+
+    def astype(self, dtype):
+        """Copy with thresholds and node values stored as dtype, e.g. float32 to halve them"""
+        return FlatForest(self.feature, self.threshold.astype(dtype), self.children, self.value.astype(dtype),
+                          self.roots, self.n_features, self.float32_inputs, is_leaf=self.is_leaf,
+                          missing_left=self.missing_left)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in FLAT_ARRAYS if getattr(self, name) is not None)
+
+    def _predict_chunk(self, X, has_missing=False):
+        """Evaluate every tree on one chunk of rows"""
+        n_rows, n_columns = X.shape
+        flat_X = X.ravel()
+
+        # One traversal state per (tree, row) pair, tree-major
+        nodes = np.repeat(self.roots, n_rows)
+        active = np.flatnonzero(~self.is_leaf.take(nodes)).astype(np.int32)
+        current = nodes.take(active)
+        row_offsets = (active % n_rows) * n_columns
+
+        # Advance one level at a time, dropping pairs that reached a leaf
+        while active.size:
+            x = flat_X.take(row_offsets + self.feature.take(current))
+            go_right = x > self.threshold.take(current)
+            if has_missing:
+                missing = np.isnan(x)
+                go_right[missing] = ~self.missing_left.take(current[missing])
+            following = self.children.take(2 * current + go_right)
+            nodes[active] = following
+            internal = ~self.is_leaf.take(following)
+            active = active[internal]
+            current = following[internal]
+            row_offsets = row_offsets[internal]
+
+        # Accumulate tree by tree, in the same order as scikit-learn
+        leaf_values = self.value.take(nodes).reshape(self.n_trees, n_rows)
+        predictions = np.zeros(n_rows, dtype=np.float64)
+        for tree_values in leaf_values:
+            predictions += tree_values
+        predictions /= self.n_trees
+        return predictions
+
+    def predict(self, X, chunk_size=1024):
+        """Predict a 2-D array of rows, in chunks to bound the traversal state"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a 2-D array with {self.n_features} feature columns!")
+        if self.float32_inputs:
+            X = X.astype(np.float32).astype(np.float64)
+        X = np.ascontiguousarray(X)
+        if np.isinf(X).any():
+            raise ValueError("Input contains infinity!")
+        has_missing = bool(np.isnan(X).any())
+        if has_missing and self.missing_left is None:
+            raise ValueError("Input contains NaN and this flat forest has no missing-value routing, export it again!")
+
+        predictions = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            predictions[start:start + chunk_size] = self._predict_chunk(X[start:start + chunk_size], has_missing)
+        return predictions
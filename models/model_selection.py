@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+from sklearn.preprocessing import StandardScaler
+
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [None, 20, 12],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': [1.0, 0.5]
+}
+
+# Fold matrices of the current worker process, memory-mapped once by _init_worker
+_worker_folds = None
+
+
+def _init_worker(fold_dir, n_folds):
+    global _worker_folds
+    _worker_folds = [
+        tuple(np.load(os.path.join(fold_dir, f"fold{i}_{name}.npy"), mmap_mode='r')
+              for name in ('X_train', 'y_train', 'X_val', 'y_val'))
+        for i in range(n_folds)
+    ]
+
+
+def _evaluate(params, fold):
+    """Fit one configuration on one fold, returning its validation R² and wall time"""
+    start = time.perf_counter()
+    X_train, y_train, X_val, y_val = _worker_folds[fold]
+    model = RandomForestRegressor(**params).fit(X_train, y_train)
+    return model.score(X_val, y_val), time.perf_counter() - start
+
+
+class HyperparameterSearch:
+    """K-fold cross-validated search over RandomForestRegressor hyperparameters
+
+    Fold indices and the scaled fold matrices are computed once and written
+    as .npy files that every worker process memory-maps. Folds are run in
+    rounds across all surviving configurations. After min_folds rounds, a
+    configuration whose mean R² trails the best by more than prune_margin
+    is dropped.
+    """
+
+    def __init__(self, param_grid=None, n_iter=None, n_folds=5, n_workers=None,
+                 min_folds=2, prune_margin=0.01, random_state=42):
+        self.param_grid = param_grid or DEFAULT_PARAM_GRID
+        self.n_iter = n_iter
+        self.n_folds = n_folds
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.min_folds = min_folds
+        self.prune_margin = prune_margin
+        self.random_state = random_state
+
+    def candidates(self):
+        """Get the configurations to evaluate: the full grid, or n_iter random draws from it"""
+        if self.n_iter is None:
+            candidates = list(ParameterGrid(self.param_grid))
+        else:
+            candidates = list(ParameterSampler(self.param_grid, self.n_iter, random_state=self.random_state))
+        return [dict(params, random_state=self.random_state, n_jobs=1) for params in candidates]
+
+    def _write_folds(self, X, y, fold_dir):
+        """Scale each fold once and store its matrices for the workers"""
+        folds = KFold(self.n_folds, shuffle=True, random_state=self.random_state)
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        for i, (train_index, val_index) in enumerate(folds.split(X)):
+            scaler = StandardScaler().fit(X[train_index])
+            arrays = {
+                'X_train': scaler.transform(X[train_index]),
+                'y_train': y[train_index],
+                'X_val': scaler.transform(X[val_index]),
+                'y_val': y[val_index]
+            }
+            for name, values in arrays.items():
+                np.save(os.path.join(fold_dir, f"fold{i}_{name}.npy"), values)
+
+    def run(self, X, y):
+        """Evaluate the candidates, returning the best parameters and per-configuration results"""
+        candidates = self.candidates()
+        results = [{'params': params, 'scores': [], 'wall_time': 0.0, 'pruned_after': None}
+                   for params in candidates]
+        alive = list(range(len(candidates)))
+        start = time.perf_counter()
+
+        fold_dir = tempfile.mkdtemp(prefix='emission_folds-')
+        try:
+            self._write_folds(X, y, fold_dir)
+            with ProcessPoolExecutor(self.n_workers, initializer=_init_worker,
+                                     initargs=(fold_dir, self.n_folds)) as pool:
+                for fold in range(self.n_folds):
+                    futures = {i: pool.submit(_evaluate, candidates[i], fold) for i in alive}
+                    for i, future in futures.items():
+                        score, wall_time = future.result()
+                        results[i]['scores'].append(score)
+                        results[i]['wall_time'] += wall_time
+
+                    if fold + 1 >= self.min_folds and fold + 1 < self.n_folds:
+                        alive = self._prune(results, alive, fold + 1)
+        finally:
+            shutil.rmtree(fold_dir, ignore_errors=True)
+
+        for result in results:
+            scores = np.array(result['scores'])
+            result['mean_score'] = float(scores.mean())
+            result['std_score'] = float(scores.std())
+            result['params'] = {k: v for k, v in result['params'].items() if k != 'n_jobs'}
+
+        best = max((results[i] for i in alive), key=lambda result: result['mean_score'])
+        return {
+            'best_params': best['params'],
+            'best_score': best['mean_score'],
+            'n_folds': self.n_folds,
+            'total_time': time.perf_counter() - start,
+            'results': results
+        }
+
+    def _prune(self, results, alive, n_done):
+        """Drop configurations that clearly trail the best one over the folds done so far"""
+        means = {i: np.mean(results[i]['scores']) for i in alive}
+        best_mean = max(means.values())
+        survivors = []
+        for i in alive:
+            if means[i] < best_mean - self.prune_margin:
+                results[i]['pruned_after'] = n_done
+            else:
+                survivors.append(i)
+        return survivors
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import joblib
+import sklearn
+
+from models.explanations import TreeShap
+from models.flat_forest import FlatForest
+
+# Bump whenever the layout of the artifact payload changes
+ARTIFACT_FORMAT_VERSION = 1
+DEFAULT_ARTIFACT_DIR = '.model_cache'
+
+
+def file_digest(path, length=None, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's content, or of its first length bytes"""
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """Versioned on-disk store for trained EmissionModel artifacts"""
+
+    def __init__(self, artifact_dir=DEFAULT_ARTIFACT_DIR):
+        self.artifact_dir = artifact_dir
+
+    def artifact_key(self, data_path, params, features):
+        """Build the artifact key from the data content and the model configuration"""
+        key_source = json.dumps({
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'sklearn_version': sklearn.__version__,
+            'data_digest': file_digest(data_path),
+            'params': params,
+            'features': list(features)
+        }, sort_keys=True)
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def compact_key(self, key, compaction):
+        """Build the key of a compacted variant of the artifact stored under key"""
+        key_source = json.dumps({'base_key': key, 'compaction': compaction}, sort_keys=True)
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def artifact_path(self, key):
+        """Get the file path of the artifact stored under a key"""
+        return os.path.join(self.artifact_dir, f"emission_model-{key[:16]}.joblib")
+
+    def exists(self, key):
+        """Check whether an artifact is stored under a key"""
+        return os.path.exists(self.artifact_path(key))
+
+    def load(self, key, mmap_mode='r'):
+        """Load an artifact, returning None when it is missing or unusable"""
+        path = self.artifact_path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            artifact = joblib.load(path, mmap_mode=mmap_mode)
+        except Exception:
+            # A corrupt or incompatible artifact is treated as a cache miss
+            return None
+
+        if artifact.get('format_version') != ARTIFACT_FORMAT_VERSION or artifact.get('key') != key:
+            return None
+        return artifact
+
+    def save(self, key, artifact):
+        """Atomically write an artifact under a key"""
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        artifact = dict(artifact, key=key, format_version=ARTIFACT_FORMAT_VERSION,
+                        created_at=time.time())
+
+        # Write to a temporary file first so readers never see a partial artifact
+        fd, tmp_path = tempfile.mkstemp(dir=self.artifact_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(artifact, tmp_path)
+            os.replace(tmp_path, self.artifact_path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return self.artifact_path(key)
+
+    def _latest_index_path(self):
+        return os.path.join(self.artifact_dir, 'latest.json')
+
+    def _latest_entry(self, data_path, params):
+        return json.dumps([os.path.abspath(data_path), params], sort_keys=True)
+
+    def _read_latest_index(self):
+        try:
+            with open(self._latest_index_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record_latest(self, data_path, params, key):
+        """Remember the most recent artifact trained from a data file with given hyperparameters"""
+        index = self._read_latest_index()
+        entry = self._latest_entry(data_path, params)
+        if index.get(entry) == key:
+            return
+        index[entry] = key
+
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.artifact_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._latest_index_path())
+
+    def latest_key(self, data_path, params):
+        """Get the key of the most recent artifact for a data file, whatever its content was"""
+        return self._read_latest_index().get(self._latest_entry(data_path, params))
+
+    def _tuned_index_path(self):
+        return os.path.join(self.artifact_dir, 'tuned.json')
+
+    def record_tuned_params(self, data_path, params):
+        """Remember the hyperparameters tune_model found best for a data file"""
+        try:
+            with open(self._tuned_index_path()) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index[os.path.abspath(data_path)] = params
+
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.artifact_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._tuned_index_path())
+
+    def tuned_params(self, data_path):
+        """Get the hyperparameters last recorded by tune_model for a data file, or None"""
+        try:
+            with open(self._tuned_index_path()) as f:
+                return json.load(f).get(os.path.abspath(data_path))
+        except (OSError, ValueError):
+            return None
+
+    def flat_forest_path(self, key):
+        """Get the directory of the flat forest stored under a key"""
+        return os.path.join(self.artifact_dir, f"emission_model-{key[:16]}.flat")
+
+    def save_flat_forest(self, key, flat_forest, **metadata):
+        """Atomically write a flat forest under a key, keeping an existing copy"""
+        return self._publish(self.flat_forest_path(key), lambda path: flat_forest.save(path, key=key, **metadata))
+
+    def _publish(self, path, write):
+        """Atomically create a directory with write(tmp_path), keeping an existing copy"""
+        if os.path.exists(path):
+            return path
+
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=self.artifact_dir, suffix='.tmp')
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Another process published the same directory first
+            if not os.path.exists(path):
+                raise
+        finally:
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path)
+        return path
+
+    def load_flat_forest(self, key, mmap_mode='r'):
+        """Load a flat forest and its metadata, returning (None, None) when it is missing"""
+        path = self.flat_forest_path(key)
+        if not os.path.exists(path):
+            return None, None
+
+        flat_forest, metadata = FlatForest.load(path, mmap_mode=mmap_mode)
+        if metadata.get('key') != key:
+            return None, None
+        return flat_forest, metadata
+
+    def tree_shap_path(self, key):
+        """Get the directory of the TreeSHAP paths stored under a key"""
+        return os.path.join(self.artifact_dir, f"emission_model-{key[:16]}.treeshap")
+
+    def save_tree_shap(self, key, tree_shap, **metadata):
+        """Atomically write TreeSHAP paths under a key, keeping an existing copy"""
+        return self._publish(self.tree_shap_path(key), lambda path: tree_shap.save(path, key=key, **metadata))
+
+    def load_tree_shap(self, key, mmap_mode='r'):
+        """Load TreeSHAP paths and their metadata, returning (None, None) when they are missing"""
+        path = self.tree_shap_path(key)
+        if not os.path.exists(path):
+            return None, None
+
+        tree_shap, metadata = TreeShap.load(path, mmap_mode=mmap_mode)
+        if metadata.get('key') != key:
+            return None, None
+        return tree_shap, metadata
+
+    def permutation_importance_path(self, key, n_repeats):
+        """Get the file of the permutation importance stored under a key"""
+        return os.path.join(self.artifact_dir, f"emission_model-{key[:16]}-{n_repeats}.permutation.json")
+
+    def save_permutation_importance(self, key, result):
+        """Atomically write a permutation importance result under a key"""
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        path = self.permutation_importance_path(key, result['n_repeats'])
+        fd, tmp_path = tempfile.mkstemp(dir=self.artifact_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(result, key=key), f)
+        os.replace(tmp_path, path)
+        return path
+
+    def load_permutation_importance(self, key, n_repeats):
+        """Load a stored permutation importance result, returning None when it is missing"""
+        try:
+            with open(self.permutation_importance_path(key, n_repeats)) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if result.pop('key', None) != key:
+            return None
+        return result
@@ -0,0 +1,32 @@
+import argparse
+import sys
+
+from controllers.emission_controller import EmissionController
+from models.emission_model import INFERENCE_ENGINES
+from utils.fleet_scorer import FleetScorer
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score a fleet CSV/Parquet file in fixed-size chunks without loading it whole")
+    parser.add_argument('input', help="Fleet file (.csv or .parquet) with the model feature columns")
+    parser.add_argument('output', help="Scored output file (.csv or .parquet), written incrementally")
+    parser.add_argument('--data', default='co2 Emissions.csv', help="Training dataset for the model")
+    parser.add_argument('--chunk-size', type=int, default=100000, help="Rows per chunk")
+    parser.add_argument('--keep-columns', nargs='*', default=[],
+                        help="Input columns to copy into the output, e.g. a vehicle id")
+    parser.add_argument('--engine', choices=INFERENCE_ENGINES, default='sklearn')
+    parser.add_argument('--quiet', action='store_true', help="Don't print progress")
+    args = parser.parse_args()
+
+    controller = EmissionController(engine=args.engine)
+    controller.use_tuned_params(args.data)
+    controller.initialize_model(args.data)
+
+    scorer = FleetScorer(controller, chunk_size=args.chunk_size, keep_columns=args.keep_columns,
+                         progress_stream=None if args.quiet else sys.stderr)
+    scorer.score_file(args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
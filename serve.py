@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+
+from controllers.emission_controller import EmissionController
+from controllers.micro_batcher import MicroBatcher
+from models.emission_model import INFERENCE_ENGINES
+from utils import instrumentation
+from utils.prediction_server import DEFAULT_HOST, DEFAULT_PORT, PredictionServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve emission predictions over HTTP/JSON")
+    parser.add_argument('--data', default='co2 Emissions.csv', help="Training dataset for the model")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--engine', choices=INFERENCE_ENGINES, default='sklearn')
+    parser.add_argument('--micro-batch', action='store_true',
+                        help="Coalesce concurrent single predictions into batches")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help="Longest a request waits for its batch")
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--compact-trees', type=int, default=None,
+                        help="Serve the N trees chosen greedily on validation error")
+    parser.add_argument('--compact-depth', type=int, default=None, help="Serve trees cut at this depth")
+    parser.add_argument('--distill-trees', type=int, default=None,
+                        help="Serve a forest of N trees distilled from the trained one")
+    parser.add_argument('--float32', action='store_true',
+                        help="Store the flat forest's thresholds and leaf values as float32 (--engine flat)")
+    parser.add_argument('--instrument', action='store_true',
+                        help="Time the model's stages and export them at GET /metrics/prometheus")
+    args = parser.parse_args()
+
+    if args.instrument:
+        instrumentation.enable()
+
+    compaction = {'n_trees': args.compact_trees, 'max_depth': args.compact_depth,
+                  'distill_trees': args.distill_trees, 'float32': args.float32}
+    if not any(compaction.values()):
+        compaction = None
+
+    controller = EmissionController(engine=args.engine, compaction=compaction)
+    controller.use_tuned_params(args.data)
+    controller.initialize_model(args.data)
+
+    batcher = None
+    if args.micro_batch:
+        batcher = MicroBatcher(controller, max_wait_ms=args.max_wait_ms, max_batch_size=args.max_batch_size)
+
+    server = PredictionServer(controller, host=args.host, port=args.port, batcher=batcher)
+    print(f"Serving predictions on {server.url} (POST /predict, POST /predict/batch, GET /health, GET /metrics)")
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if batcher is not None:
+            batcher.close()
+
+
+if __name__ == "__main__":
+    main()
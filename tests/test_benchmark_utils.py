@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from utils.benchmark_utils import PERCENTILES, BenchmarkUtils
+from utils.load_generator import LoadGenerator
+
+
+def record(benchmark_utils, total_time, **timing_data):
+    benchmark_utils.record_prediction(dict({'status': 'success', 'total_time': total_time,
+                                            'processing_time': total_time}, **timing_data))
+
+
+def test_statistics_before_end_benchmark():
+    benchmark_utils = BenchmarkUtils()
+    assert benchmark_utils.get_statistics()['total_time'] == 0
+
+    benchmark_utils.start_benchmark()
+    record(benchmark_utils, 1.0)
+    stats = benchmark_utils.get_statistics()
+    assert stats['total_time'] > 0
+    assert stats['requests_per_second'] > 0
+
+    benchmark_utils.end_benchmark()
+    total_time = benchmark_utils.get_statistics()['total_time']
+    assert benchmark_utils.get_statistics()['total_time'] == total_time
+
+    # A new run doesn't reuse the previous end time
+    benchmark_utils.start_benchmark()
+    record(benchmark_utils, 1.0)
+    assert benchmark_utils.get_statistics()['total_time'] > 0
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_percentiles_match_numpy(seed):
+    latencies = np.random.default_rng(seed).lognormal(mean=0.0, sigma=1.0, size=20000)
+    benchmark_utils = BenchmarkUtils()
+    benchmark_utils.start_benchmark()
+    for latency in latencies:
+        record(benchmark_utils, latency)
+    benchmark_utils.end_benchmark()
+
+    stats = benchmark_utils.get_statistics()
+    for q in PERCENTILES:
+        # The histogram reports the nearest-rank percentile, within its 1 % bucket precision
+        expected = np.percentile(latencies, q, method='inverted_cdf')
+        assert stats[f'p{q:g}_response_time'] == pytest.approx(expected, rel=0.01)
+    assert stats['avg_total_time'] == pytest.approx(latencies.mean(), rel=1e-12)
+    assert stats['std_response_time'] == pytest.approx(latencies.std(ddof=1), rel=1e-9)
+    assert stats['min_response_time'] == latencies.min()
+    assert stats['max_response_time'] == latencies.max()
+
+
+def test_ring_buffer_wraps_past_max_rows():
+    benchmark_utils = BenchmarkUtils(max_rows=100, initial_capacity=16)
+    benchmark_utils.start_benchmark()
+    for i in range(250):
+        if i in (10, 200):
+            benchmark_utils.record_prediction({'status': 'error', 'error': f"failed {i}"})
+        else:
+            record(benchmark_utils, float(i))
+    benchmark_utils.end_benchmark()
+
+    # Only the latest max_rows requests are kept, oldest first
+    total_times = benchmark_utils.get_column('total_time')
+    assert len(total_times) == 100
+    np.testing.assert_array_equal(total_times, [0.0 if i == 200 else float(i) for i in range(150, 250)])
+    assert len(benchmark_utils.get_column('total_time', successful_only=True)) == 99
+
+    df = benchmark_utils.get_results_df()
+    assert df['request_number'].tolist() == list(range(151, 251))
+    assert df.loc[df['status'] == 'error', 'error'].tolist() == ["failed 200"]
+
+    # Statistics still cover every request
+    stats = benchmark_utils.get_statistics()
+    assert stats['total_requests'] == 250
+    assert stats['successful_requests'] == 248
+    assert stats['min_response_time'] == 0.0
+    assert stats['max_response_time'] == 249.0
+
+
+@pytest.mark.parametrize('mode', ['closed', 'open'])
+def test_corrected_percentiles_only_for_open_loop(mode):
+    benchmark_utils = BenchmarkUtils()
+    generator = LoadGenerator(lambda features: 0.0, lambda i: {}, benchmark_utils, concurrency=2, mode=mode,
+                              target_rps=2000 if mode == 'open' else None)
+    stats = generator.run(200)
+    assert stats['successful_requests'] == 200
+    corrected = [name for name in stats if 'corrected' in name]
+    if mode == 'open':
+        assert len(corrected) == len(PERCENTILES) + 1
+        assert stats['p99_corrected_response_time'] >= stats['p50_corrected_response_time'] > 0
+    else:
+        assert corrected == []
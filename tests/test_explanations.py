@@ -0,0 +1,97 @@
+import itertools
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from models.emission_model import EmissionModel
+from models.explanations import TreeShap
+
+MEANS = [2.0, 6.0, 9.0, 200.0, 1500.0, 2019.0]
+SCALES = [1.0, 2.0, 3.0, 80.0, 400.0, 3.0]
+
+
+def make_rows(n_rows, seed):
+    rows = np.random.default_rng(seed).normal(MEANS, SCALES, (n_rows, len(MEANS)))
+    return pd.DataFrame(rows, columns=EmissionModel().features)
+
+
+def conditional_expectation(tree, x, known):
+    """Path-dependent expected output of a tree when only the features in known are set"""
+    def visit(node):
+        left, right = tree.children_left[node], tree.children_right[node]
+        if left == -1:
+            return tree.value[node, 0, 0]
+        feature = tree.feature[node]
+        if feature in known:
+            return visit(left if x[feature] <= tree.threshold[node] else right)
+        cover = tree.weighted_n_node_samples
+        return (cover[left] * visit(left) + cover[right] * visit(right)) / cover[node]
+    return visit(0)
+
+
+def brute_force_shap(forest, x):
+    """Shapley values of the forest's path-dependent value function, over every feature subset"""
+    n = len(x)
+
+    def value(known):
+        return np.mean([conditional_expectation(estimator.tree_, x, known) for estimator in forest.estimators_])
+
+    phi = np.zeros(n)
+    for i in range(n):
+        others = [j for j in range(n) if j != i]
+        for size in range(n):
+            weight = math.factorial(size) * math.factorial(n - size - 1) / math.factorial(n)
+            for subset in itertools.combinations(others, size):
+                phi[i] += weight * (value(set(subset) | {i}) - value(set(subset)))
+    return phi
+
+
+@pytest.fixture(scope='module')
+def model():
+    X = make_rows(1500, seed=0)
+    values = X.to_numpy()
+    y = (values @ [20.0, 3.0, 15.0, 0.1, 0.01, 0.0] + 0.002 * values[:, 0] * values[:, 3]
+         + np.random.default_rng(1).normal(0, 5, len(X)))
+    model = EmissionModel()
+    model.scaler = StandardScaler().fit(X)
+    model.model = RandomForestRegressor(n_estimators=5, max_depth=6, random_state=0).fit(model.scaler.transform(X), y)
+    model.trained = True
+    return model
+
+
+def test_matches_brute_force_shapley(model):
+    tree_shap = TreeShap.from_forest(model.model)
+    X = model.scaler.transform(make_rows(5, seed=2)).astype(np.float32).astype(np.float64)
+    phi = tree_shap.shap_values(X)
+    for row, row_phi in zip(X, phi):
+        np.testing.assert_allclose(row_phi, brute_force_shap(model.model, row), rtol=0, atol=1e-9)
+
+
+def test_base_value_plus_shap_is_the_prediction(model):
+    rows = make_rows(2000, seed=3)
+    base_value, shap_values = model.explain_batch(rows)
+    np.testing.assert_allclose(base_value + shap_values.sum(axis=1), model.predict_batch(rows), rtol=0, atol=1e-9)
+
+
+def test_paths_cover_every_leaf(model):
+    tree_shap = TreeShap.from_forest(model.model)
+    n_leaves = sum(int((estimator.tree_.children_left == -1).sum()) for estimator in model.model.estimators_)
+    assert tree_shap.n_paths == n_leaves
+    for length, group in tree_shap.groups.items():
+        assert group['feature'].shape == (len(group['value']), length)
+        # Every path lists distinct features in increasing order
+        assert (np.diff(group['feature'], axis=1) > 0).all()
+
+
+def test_saved_paths_explain_the_same(model, tmp_path):
+    rows = model.scaler.transform(make_rows(200, seed=4))
+    tree_shap = TreeShap.from_forest(model.model)
+    tree_shap.save(str(tmp_path / 'shap'), key='test')
+    loaded, metadata = TreeShap.load(str(tmp_path / 'shap'))
+    assert metadata == {'key': 'test'}
+    assert loaded.base_value == tree_shap.base_value
+    np.testing.assert_allclose(loaded.shap_values(rows), tree_shap.shap_values(rows), rtol=0, atol=1e-9)
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from models.emission_model import EmissionModel
+from models.flat_forest import FlatForest
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal([2.0, 6.0, 9.0, 200.0, 1500.0, 2019.0], [1.0, 2.0, 3.0, 80.0, 400.0, 3.0], (2000, 6))
+    y = X @ [20.0, 3.0, 15.0, 0.1, 0.01, 0.0] + rng.normal(0, 5, len(X))
+    scaler = StandardScaler().fit(X)
+    forest = RandomForestRegressor(n_estimators=20, random_state=0).fit(scaler.transform(X), y)
+    return forest, scaler
+
+
+def query_rows(n_rows, seed=1, missing=0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal([2.0, 6.0, 9.0, 200.0, 1500.0, 2019.0], [1.5, 3.0, 4.0, 120.0, 600.0, 4.0], (n_rows, 6))
+    X[rng.random(X.shape) < missing] = np.nan
+    return X
+
+
+def test_unfolded_matches_sklearn_exactly(fitted):
+    forest, scaler = fitted
+    X_scaled = scaler.transform(query_rows(3000))
+    np.testing.assert_array_equal(FlatForest.from_estimator(forest).predict(X_scaled), forest.predict(X_scaled))
+
+
+def test_folded_matches_sklearn(fitted):
+    forest, scaler = fitted
+    X = query_rows(3000)
+    np.testing.assert_allclose(FlatForest.from_estimator(forest, scaler).predict(X),
+                               forest.predict(scaler.transform(X)), rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('folded', [False, True])
+def test_missing_values_follow_sklearn(fitted, folded):
+    forest, scaler = fitted
+    X = query_rows(3000, missing=0.2)
+    expected = forest.predict(scaler.transform(X))
+    if folded:
+        predictions = FlatForest.from_estimator(forest, scaler).predict(X)
+    else:
+        predictions = FlatForest.from_estimator(forest).predict(scaler.transform(X))
+    np.testing.assert_allclose(predictions, expected, rtol=0, atol=1e-9)
+
+
+def test_infinite_input_is_rejected(fitted):
+    forest, scaler = fitted
+    X = query_rows(10)
+    X[3, 2] = np.inf
+    with pytest.raises(ValueError):
+        FlatForest.from_estimator(forest, scaler).predict(X)
+
+
+def test_saved_forest_keeps_missing_value_routing(fitted, tmp_path):
+    forest, scaler = fitted
+    X = query_rows(500, missing=0.2)
+    FlatForest.from_estimator(forest, scaler).save(str(tmp_path / 'flat'))
+    loaded, _ = FlatForest.load(str(tmp_path / 'flat'))
+    np.testing.assert_allclose(loaded.predict(X), forest.predict(scaler.transform(X)), rtol=0, atol=1e-9)
+
+
+def test_missing_feature_matches_sklearn_engine(fitted):
+    forest, scaler = fitted
+    engines = {}
+    for engine in ('sklearn', 'flat'):
+        model = EmissionModel(engine=engine)
+        model.model, model.scaler, model.trained = forest, scaler, True
+        engines[engine] = model
+
+    rows = [dict(zip(engines['flat'].features, row)) for row in query_rows(50)]
+    for row in rows[::2]:
+        del row['Weight (kg)']
+    np.testing.assert_allclose(engines['flat'].predict_batch(rows), engines['sklearn'].predict_batch(rows),
+                               rtol=0, atol=1e-9)
@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pytest
+
+from models.emission_model import EmissionModel
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'co2 Emissions.csv')
+
+
+def read_lines():
+    with open(DATA_PATH) as f:
+        return f.readlines()
+
+
+def write_rows(path, lines, start, stop):
+    with open(path, 'w') as f:
+        f.writelines([lines[0]] + lines[1 + start:1 + stop])
+
+
+def append_rows(path, lines, start, stop):
+    with open(path, 'a') as f:
+        f.writelines(lines[1 + start:1 + stop])
+
+
+@pytest.fixture
+def trained(tmp_path):
+    """A small forest trained on the first 1500 rows of a copy of the dataset"""
+    lines = read_lines()
+    path = str(tmp_path / 'data.csv')
+    write_rows(path, lines, 0, 1500)
+    model = EmissionModel(n_estimators=10)
+    model.train(path)
+    return model, path, lines
+
+
+def test_grown_file_is_detected(trained):
+    model, path, lines = trained
+    assert len(model.find_appended_rows(path)) == 0
+
+    append_rows(path, lines, 1500, 1700)
+    appended = model.find_appended_rows(path)
+    assert len(appended) == 200
+    assert appended.index[0] == 1500
+
+
+def test_modified_prefix_is_rejected(trained):
+    model, path, lines = trained
+    modified = list(lines)
+    modified[5] = modified[5].replace(modified[5][0], '#', 1)
+    write_rows(path, modified, 0, 1700)
+    assert model.find_appended_rows(path) is None
+    with pytest.raises(ValueError):
+        model.train_incremental(path)
+
+
+def test_shrunk_file_is_rejected(trained):
+    model, path, lines = trained
+    write_rows(path, lines, 0, 1000)
+    assert model.find_appended_rows(path) is None
+
+
+def test_rebased_trees_keep_their_predictions(trained):
+    model, path, lines = trained
+    append_rows(path, lines, 1500, 2500)
+    X = model.prepare_features(model.load_and_preprocess_data(path))[0]
+    old_scaler_mean = model.scaler.mean_.copy()
+    before = [estimator.predict(model.scaler.transform(X)) for estimator in model.model.estimators_]
+
+    model.train_incremental(path, new_trees=5)
+    assert not np.allclose(model.scaler.mean_, old_scaler_mean)
+
+    after = [estimator.predict(model.scaler.transform(X)) for estimator in model.model.estimators_[:len(before)]]
+    np.testing.assert_allclose(after, before, rtol=0, atol=1e-9)
+
+
+def test_running_mean_covers_every_row(trained):
+    model, path, lines = trained
+    append_rows(path, lines, 1500, 1800)
+    model.train_incremental(path, new_trees=5)
+    append_rows(path, lines, 1800, 1850)
+    model.train_incremental(path, new_trees=5)
+
+    target = model.load_and_preprocess_data(path)[model.target]
+    assert model.avg_emission == pytest.approx(target.mean(), rel=1e-12)
+    assert model.source['rows'] == len(target)
+
+
+def test_max_trees_keeps_the_newest(trained):
+    model, path, lines = trained
+    kept = model.model.estimators_[3:]
+    append_rows(path, lines, 1500, 1800)
+    model.train_incremental(path, new_trees=5, max_trees=12)
+
+    assert len(model.model.estimators_) == 12
+    assert model.model.n_estimators == 12
+    assert model.model.estimators_[:len(kept)] == kept
+
+
+def test_large_append_keeps_the_full_split_score(trained):
+    model, path, lines = trained
+    test_score = model.test_score
+    # More held-out new rows than the recent window holds
+    append_rows(path, lines, 1500, 3000)
+    assert model.train_incremental(path, new_trees=5, recent_rows=100) == test_score
+    assert model.test_score == test_score
+    assert model.incremental_score is not None
+    assert len(model.model.estimators_) == 15
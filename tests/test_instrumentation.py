@@ -0,0 +1,61 @@
+import pytest
+
+from utils import instrumentation
+
+
+@pytest.fixture(autouse=True)
+def disabled():
+    instrumentation.disable()
+    instrumentation.reset()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def run_span(name):
+    with instrumentation.span(name):
+        pass
+
+
+def test_spans_are_noops_while_disabled():
+    assert instrumentation.span('stage') is instrumentation.span('other')
+    run_span('stage')
+    assert instrumentation.stage_stats() == {}
+
+
+def test_recording_leaves_process_wide_timings_alone():
+    instrumentation.enable()
+    run_span('before')
+    with instrumentation.Recording() as recording:
+        run_span('during')
+    run_span('after')
+
+    assert list(recording.stage_stats()) == ['during']
+    assert {name: stats['count'] for name, stats in instrumentation.stage_stats().items()} == {
+        'before': 1, 'during': 1, 'after': 1}
+    assert 'stage="during"' in recording.export_prometheus()
+    assert 'stage="before"' not in recording.export_prometheus()
+    assert instrumentation.is_enabled()
+
+
+def test_recording_times_spans_while_disabled():
+    with instrumentation.Recording() as recording:
+        run_span('stage')
+        run_span('stage')
+    run_span('stage')
+
+    assert recording.stage_stats()['stage']['count'] == 2
+    assert instrumentation.stage_stats() == {}
+    assert instrumentation.span('stage') is instrumentation.span('other')
+
+
+def test_overlapping_recordings():
+    first = instrumentation.Recording().start()
+    run_span('stage')
+    with instrumentation.Recording() as second:
+        run_span('stage')
+    run_span('stage')
+    first.stop()
+
+    assert first.stage_stats()['stage']['count'] == 3
+    assert second.stage_stats()['stage']['count'] == 1
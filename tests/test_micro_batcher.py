@@ -0,0 +1,85 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from controllers.emission_controller import EmissionController
+from controllers.micro_batcher import MicroBatcher
+from utils.benchmark_utils import BenchmarkUtils
+from utils.load_generator import LoadGenerator, random_request
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'co2 Emissions.csv')
+FEATURES = {
+    'Engine Size(L)': 2.0,
+    'Cylinders': 4,
+    'Fuel Consumption Comb (L/100 km)': 8.0,
+    'Horsepower': 200,
+    'Weight (kg)': 1500,
+    'Year': 2023
+}
+
+
+@pytest.fixture(scope='module')
+def controller(tmp_path_factory):
+    """A controller serving a small forest trained on the first 1500 rows of the dataset"""
+    with open(DATA_PATH) as f:
+        lines = f.readlines()[:1501]
+    path = tmp_path_factory.mktemp('data') / 'data.csv'
+    path.write_text(''.join(lines))
+    controller = EmissionController(artifact_dir=None, n_estimators=10)
+    controller.initialize_model(str(path))
+    return controller
+
+
+def make_requests():
+    """Off-grid random vehicles, repeated on-grid ones and one with a missing value"""
+    make_request = random_request(EmissionController(artifact_dir=None).model.features, seed=0)
+    requests = [make_request(i) for i in range(200)]
+    requests += [dict(FEATURES, Horsepower=hp) for hp in (150, 200, 250)] * 20
+    requests.append(dict(FEATURES, Horsepower=math.nan))
+    return requests
+
+
+@pytest.mark.parametrize('use_cache', [False, True])
+def test_batched_predictions_match_predict_emission(controller, use_cache):
+    requests = make_requests()
+    controller.prediction_cache.clear()
+    with MicroBatcher(controller, max_wait_ms=5, max_batch_size=16, use_cache=use_cache) as batcher:
+        with ThreadPoolExecutor(8) as executor:
+            batched = list(executor.map(batcher.predict, requests))
+        metrics = batcher.metrics()
+
+    assert metrics['requests'] + metrics['cached_requests'] == len(requests)
+    if use_cache:
+        # Repeats of the 3 on-grid vehicles are answered without queueing once one was scored
+        assert 0 < metrics['cached_requests'] <= 57
+    else:
+        assert metrics['cached_requests'] == 0
+    assert metrics['mean_batch_size'] > 1
+
+    controller.prediction_cache.clear()
+    expected = [controller.predict_emission(features, use_cache=use_cache) for features in requests]
+    np.testing.assert_array_equal(batched, expected)
+
+
+def test_missing_feature_is_rejected(controller):
+    features = dict(FEATURES)
+    del features['Year']
+    with MicroBatcher(controller, use_cache=False) as batcher:
+        with pytest.raises(ValueError):
+            batcher.submit(features)
+
+
+def test_warmup_is_not_counted(controller):
+    make_request = random_request(controller.model.features, seed=1)
+    with MicroBatcher(controller, use_cache=False) as batcher:
+        generator = LoadGenerator(batcher.predict, make_request, BenchmarkUtils(), concurrency=4, warmup=100,
+                                  after_warmup=batcher.reset_metrics)
+        stats = generator.run(500)
+        metrics = batcher.metrics()
+
+    assert stats['total_requests'] == 500
+    assert metrics['requests'] == 500
+    assert sum(size * count for size, count in metrics['batch_size_distribution'].items()) == 500
@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pytest
+import sklearn
+
+from models.model_store import ARTIFACT_FORMAT_VERSION, ModelStore
+
+PARAMS = {'n_estimators': 100, 'random_state': 42}
+FEATURES = ['Engine Size(L)', 'Cylinders', 'Fuel Consumption Comb (L/100 km)']
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ModelStore(str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text("a,b\n1,2\n3,4\n")
+    return str(path)
+
+
+def test_save_load_round_trip(store, data_path):
+    key = store.artifact_key(data_path, PARAMS, FEATURES)
+    assert store.load(key) is None
+
+    store.save(key, {'test_score': 0.97, 'values': np.arange(5.0)})
+    assert store.exists(key)
+    artifact = store.load(key)
+    assert artifact['test_score'] == 0.97
+    np.testing.assert_array_equal(artifact['values'], np.arange(5.0))
+    assert artifact['key'] == key
+    assert artifact['format_version'] == ARTIFACT_FORMAT_VERSION
+    # No temporary files are left behind
+    assert os.listdir(store.artifact_dir) == [os.path.basename(store.artifact_path(key))]
+
+
+def test_corrupt_or_foreign_artifact_is_a_miss(store, data_path):
+    key = store.artifact_key(data_path, PARAMS, FEATURES)
+    store.save(key, {'test_score': 0.97})
+    with open(store.artifact_path(key), 'wb') as f:
+        f.write(b'not a joblib file')
+    assert store.load(key) is None
+
+    # An artifact stored under a key sharing the file name prefix isn't returned for another key
+    store.save(key, {'test_score': 0.97})
+    other = key[:16] + '0' * (len(key) - 16)
+    assert store.load(other) is None
+
+
+def test_key_is_stable(store, data_path):
+    assert store.artifact_key(data_path, PARAMS, FEATURES) == store.artifact_key(data_path, dict(PARAMS),
+                                                                                  list(FEATURES))
+
+
+def test_key_changes_with_data_content(store, data_path):
+    key = store.artifact_key(data_path, PARAMS, FEATURES)
+    with open(data_path, 'a') as f:
+        f.write("5,6\n")
+    assert store.artifact_key(data_path, PARAMS, FEATURES) != key
+
+
+def test_key_changes_with_params(store, data_path):
+    key = store.artifact_key(data_path, PARAMS, FEATURES)
+    assert store.artifact_key(data_path, dict(PARAMS, n_estimators=50), FEATURES) != key
+    assert store.artifact_key(data_path, dict(PARAMS, max_depth=12), FEATURES) != key
+
+
+def test_key_changes_with_features(store, data_path):
+    key = store.artifact_key(data_path, PARAMS, FEATURES)
+    assert store.artifact_key(data_path, PARAMS, FEATURES[:2]) != key
+    assert store.artifact_key(data_path, PARAMS, FEATURES[::-1]) != key
+
+
+def test_key_changes_with_sklearn_version(store, data_path, monkeypatch):
+    key = store.artifact_key(data_path, PARAMS, FEATURES)
+    monkeypatch.setattr(sklearn, '__version__', '0.0.1')
+    assert store.artifact_key(data_path, PARAMS, FEATURES) != key
+
+
+def test_latest_key_per_data_file_and_params(store, data_path, tmp_path):
+    other_path = str(tmp_path / 'other.csv')
+    assert store.latest_key(data_path, PARAMS) is None
+
+    store.record_latest(data_path, PARAMS, 'a' * 64)
+    store.record_latest(other_path, PARAMS, 'b' * 64)
+    store.record_latest(data_path, dict(PARAMS, n_estimators=50), 'c' * 64)
+    assert store.latest_key(data_path, PARAMS) == 'a' * 64
+    assert store.latest_key(other_path, PARAMS) == 'b' * 64
+    assert store.latest_key(data_path, dict(PARAMS, n_estimators=50)) == 'c' * 64
+
+    store.record_latest(data_path, PARAMS, 'd' * 64)
+    assert store.latest_key(data_path, PARAMS) == 'd' * 64
+    # Relative and absolute paths name the same file
+    assert store.latest_key(os.path.relpath(data_path), PARAMS) == 'd' * 64
+
+
+def test_tuned_params_per_data_file(store, data_path, tmp_path):
+    other_path = str(tmp_path / 'other.csv')
+    assert store.tuned_params(data_path) is None
+
+    store.record_tuned_params(data_path, {'max_depth': 12})
+    store.record_tuned_params(other_path, {'max_depth': 8})
+    assert store.tuned_params(data_path) == {'max_depth': 12}
+    assert store.tuned_params(other_path) == {'max_depth': 8}
+
+    store.record_tuned_params(data_path, {'max_depth': None, 'min_samples_leaf': 2})
+    assert store.tuned_params(data_path) == {'max_depth': None, 'min_samples_leaf': 2}
+
+
+def test_unreadable_indexes_are_empty(store, data_path):
+    os.makedirs(store.artifact_dir)
+    for name in ('latest.json', 'tuned.json'):
+        with open(os.path.join(store.artifact_dir, name), 'w') as f:
+            f.write('{not json')
+    assert store.latest_key(data_path, PARAMS) is None
+    assert store.tuned_params(data_path) is None
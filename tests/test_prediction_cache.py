@@ -0,0 +1,129 @@
+import math
+
+import pytest
+
+from controllers import prediction_cache
+from controllers.prediction_cache import PredictionCache
+
+FEATURES = {
+    'Engine Size(L)': 2.0,
+    'Cylinders': 4,
+    'Fuel Consumption Comb (L/100 km)': 8.0,
+    'Horsepower': 200,
+    'Weight (kg)': 1500,
+    'Year': 2023
+}
+
+
+class CountingModel:
+    """Stands in for EmissionModel.predict, remembering what it was asked"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, features):
+        self.calls.append(dict(features))
+        return sum(features.values())
+
+
+def test_on_grid_inputs_are_cached():
+    cache, model = PredictionCache(), CountingModel()
+    first = cache.get_or_predict(FEATURES, 'v1', model.predict)
+    # Float noise from a 0.1-step UI input lands on the same entry
+    noisy = dict(FEATURES, **{'Engine Size(L)': 0.1 * 20})
+    assert cache.get_or_predict(noisy, 'v1', model.predict) == first
+    assert len(model.calls) == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_off_grid_inputs_bypass_the_cache():
+    cache, model = PredictionCache(), CountingModel()
+    off_grid = dict(FEATURES, Horsepower=203.7)
+    assert cache.key(off_grid) is None
+    cache.get_or_predict(off_grid, 'v1', model.predict)
+    cache.get_or_predict(off_grid, 'v1', model.predict)
+    assert len(model.calls) == 2
+    assert model.calls[0] == off_grid
+    assert cache.stats()['bypassed'] == 2 and cache.stats()['size'] == 0
+
+
+def test_snap_mode_caches_the_nearest_grid_point():
+    cache, model = PredictionCache(snap=True), CountingModel()
+    cache.get_or_predict(dict(FEATURES, Horsepower=203.7), 'v1', model.predict)
+    cache.get_or_predict(dict(FEATURES, Horsepower=196.2), 'v1', model.predict)
+    assert len(model.calls) == 1
+    assert model.calls[0]['Horsepower'] == pytest.approx(200)
+    assert cache.stats()['hits'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, model = PredictionCache(max_size=2), CountingModel()
+    a, b, c = (dict(FEATURES, Year=year) for year in (2020, 2021, 2022))
+    cache.get_or_predict(a, 'v1', model.predict)
+    cache.get_or_predict(b, 'v1', model.predict)
+    cache.get_or_predict(a, 'v1', model.predict)
+    cache.get_or_predict(c, 'v1', model.predict)
+    assert cache.stats()['evictions'] == 1 and cache.stats()['size'] == 2
+
+    # b was the least recently used, a is still cached
+    cache.get_or_predict(a, 'v1', model.predict)
+    assert len(model.calls) == 3
+    cache.get_or_predict(b, 'v1', model.predict)
+    assert len(model.calls) == 4
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', lambda: now[0])
+    cache, model = PredictionCache(ttl=10.0), CountingModel()
+    cache.get_or_predict(FEATURES, 'v1', model.predict)
+    now[0] += 9.0
+    cache.get_or_predict(FEATURES, 'v1', model.predict)
+    assert len(model.calls) == 1
+
+    now[0] += 2.0
+    cache.get_or_predict(FEATURES, 'v1', model.predict)
+    assert len(model.calls) == 2
+    assert cache.stats()['expirations'] == 1
+
+
+def test_new_model_version_clears_the_cache():
+    cache, model = PredictionCache(), CountingModel()
+    cache.get_or_predict(FEATURES, 'v1', model.predict)
+    cache.get_or_predict(dict(FEATURES, Year=2020), 'v1', model.predict)
+    cache.get_or_predict(FEATURES, 'v2', model.predict)
+    assert len(model.calls) == 3
+    assert cache.stats()['invalidations'] == 1 and cache.stats()['size'] == 1
+    assert cache.get(cache.key(dict(FEATURES, Year=2020)), 'v2') is None
+
+
+@pytest.mark.parametrize('value', [math.nan, math.inf, -math.inf])
+@pytest.mark.parametrize('snap', [False, True])
+def test_non_finite_inputs_bypass_instead_of_raising(value, snap):
+    cache, model = PredictionCache(snap=snap), CountingModel()
+    features = dict(FEATURES, Horsepower=value)
+    assert cache.key(features) is None
+    cache.get_or_predict(features, 'v1', model.predict)
+    assert len(model.calls) == 1
+    assert cache.stats()['bypassed'] == 1 and cache.stats()['size'] == 0
+
+
+def test_missing_feature_is_a_value_error():
+    features = dict(FEATURES)
+    del features['Year']
+    with pytest.raises(ValueError, match="Year"):
+        PredictionCache().key(features)
+
+
+def test_stats_since_a_snapshot():
+    cache, model = PredictionCache(), CountingModel()
+    cache.get_or_predict(FEATURES, 'v1', model.predict)
+    cache.get_or_predict(FEATURES, 'v1', model.predict)
+    before = cache.stats()
+    cache.get_or_predict(FEATURES, 'v1', model.predict)
+    cache.get_or_predict(dict(FEATURES, Year=2020), 'v1', model.predict)
+
+    stats = cache.stats(since=before)
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 2)
+    assert stats['hit_rate'] == 0.5
+    assert cache.stats()['hits'] == 2
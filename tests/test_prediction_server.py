@@ -0,0 +1,120 @@
+import http.client
+import json
+import os
+
+import pytest
+
+from controllers.emission_controller import EmissionController
+from utils.prediction_server import MAX_BODY_BYTES, PredictionServer
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'co2 Emissions.csv')
+FEATURES = {
+    'Engine Size(L)': 2.0,
+    'Cylinders': 4,
+    'Fuel Consumption Comb (L/100 km)': 8.0,
+    'Horsepower': 200,
+    'Weight (kg)': 1500,
+    'Year': 2023
+}
+
+
+@pytest.fixture(scope='module')
+def controller(tmp_path_factory):
+    """A controller serving a small forest trained on the first 1500 rows of the dataset"""
+    with open(DATA_PATH) as f:
+        lines = f.readlines()[:1501]
+    path = tmp_path_factory.mktemp('data') / 'data.csv'
+    path.write_text(''.join(lines))
+    controller = EmissionController(artifact_dir=None, prediction_cache=False, n_estimators=10)
+    controller.initialize_model(str(path))
+    return controller
+
+
+@pytest.fixture(scope='module')
+def server(controller):
+    with PredictionServer(controller, port=0) as server:
+        yield server
+
+
+@pytest.fixture
+def connection(server):
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=10)
+    yield connection
+    connection.close()
+
+
+def request(connection, method, path, payload=None, body=None):
+    """Send one request, returning the status, headers and decoded JSON body"""
+    if payload is not None:
+        body = json.dumps(payload)
+    connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response.status, response, json.loads(response.read())
+
+
+def test_health(connection, controller):
+    status, _, result = request(connection, 'GET', '/health')
+    assert status == 200
+    assert result == {'status': 'ok', 'model_version': controller.model_version}
+
+
+def test_predict_matches_the_controller(connection, controller):
+    status, _, result = request(connection, 'POST', '/predict', FEATURES)
+    assert status == 200
+    assert result['prediction'] == controller.predict_emission(FEATURES)
+    assert result['rating'] == controller.get_emission_rating(result['prediction'])
+
+
+def test_predict_batch_matches_the_controller(connection, controller):
+    instances = [dict(FEATURES, Horsepower=hp) for hp in (120, 200, 350)]
+    status, _, result = request(connection, 'POST', '/predict/batch', {'instances': instances})
+    assert status == 200
+    assert result['predictions'] == controller.predict_batch(instances).tolist()
+
+
+@pytest.mark.parametrize('path, payload, body', [
+    ('/predict', None, '{not json'),
+    ('/predict', [1, 2, 3], None),
+    ('/predict', {'Engine Size(L)': 2.0}, None),
+    ('/predict/batch', {'rows': []}, None),
+    ('/predict/batch', {'instances': [{'Engine Size(L)': 2.0}]}, None)
+])
+def test_bad_requests(connection, path, payload, body):
+    status, _, result = request(connection, 'POST', path, payload, body)
+    assert status == 400
+    assert result['error']
+
+
+def test_unknown_path_and_wrong_method(connection):
+    assert request(connection, 'GET', '/nowhere')[0] == 404
+    assert request(connection, 'GET', '/predict')[0] == 405
+    assert request(connection, 'POST', '/health', {})[0] == 405
+    # The connection stays usable after errors
+    assert request(connection, 'GET', '/health')[0] == 200
+
+
+def test_oversized_body_is_rejected(connection):
+    connection.putrequest('POST', '/predict')
+    connection.putheader('Content-Length', str(MAX_BODY_BYTES + 1))
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == 413
+    assert response.getheader('Connection') == 'close'
+    assert json.loads(response.read())['error']
+
+
+def test_keep_alive_reuses_the_connection(connection):
+    request(connection, 'GET', '/health')
+    sock = connection.sock
+    for _ in range(5):
+        status, response, _ = request(connection, 'POST', '/predict', FEATURES)
+        assert status == 200
+        assert response.getheader('Connection') == 'keep-alive'
+    assert connection.sock is sock
+
+
+def test_server_timing_header(connection):
+    _, response, _ = request(connection, 'POST', '/predict', FEATURES)
+    entries = dict(entry.split(';dur=') for entry in response.getheader('Server-Timing').split(', '))
+    assert list(entries) == ['decode', 'predict', 'encode']
+    assert all(float(duration) >= 0 for duration in entries.values())
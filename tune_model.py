@@ -0,0 +1,39 @@
+import argparse
+import json
+
+from controllers.emission_controller import EmissionController
+from models.model_selection import HyperparameterSearch, DEFAULT_PARAM_GRID
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cross-validated hyperparameter search for the emission model")
+    parser.add_argument('--data', default='co2 Emissions.csv')
+    parser.add_argument('--grid', type=json.loads, default=DEFAULT_PARAM_GRID,
+                        help="Parameter grid as JSON, e.g. '{\"max_depth\": [null, 12]}'")
+    parser.add_argument('--n-iter', type=int, default=None,
+                        help="Evaluate this many random configurations instead of the full grid")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--min-folds', type=int, default=2, help="Folds to run before pruning")
+    parser.add_argument('--prune-margin', type=float, default=0.01,
+                        help="Drop configurations whose mean R² trails the best by more than this")
+    args = parser.parse_args()
+
+    search = HyperparameterSearch(args.grid, n_iter=args.n_iter, n_folds=args.folds, n_workers=args.workers,
+                                  min_folds=args.min_folds, prune_margin=args.prune_margin)
+    controller = EmissionController()
+    test_score, result = controller.tune_model(args.data, search)
+
+    print(f"{'mean R²':>8}{'std':>8}{'folds':>7}{'seconds':>9}  parameters")
+    for entry in sorted(result['results'], key=lambda entry: -entry['mean_score']):
+        pruned = " (pruned)" if entry['pruned_after'] else ""
+        print(f"{entry['mean_score']:>8.4f}{entry['std_score']:>8.4f}{len(entry['scores']):>7}"
+              f"{entry['wall_time']:>9.2f}  {entry['params']}{pruned}")
+
+    print(f"\nBest: {result['best_params']} (CV R² {result['best_score']:.4f}, test R² {test_score:.4f})")
+    print(f"Search took {result['total_time']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
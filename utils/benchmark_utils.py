@@ -1,175 +1,419 @@
+import collections
+import json
 import time
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import matplotlib.pyplot as plt
+from utils.latency_histogram import LatencyHistogram
+
+# Per-request timings in ms, kept as columns and aggregated online; overhead_time is the
+# part of the total no other column covers, e.g. time queued for a worker
+TIMING_COLUMNS = ('total_time', 'network_time', 'serialization_time', 'processing_time', 'overhead_time')
+# Other per-request values kept as columns; intended_start is a perf_counter() time in seconds
+VALUE_COLUMNS = ('timestamp', 'intended_start', 'prediction')
+COLUMNS = TIMING_COLUMNS + VALUE_COLUMNS
+COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+# Per-second windows keep a coarser histogram each
+WINDOW_RELATIVE_ERROR = 0.05
 
 class BenchmarkUtils:
-    def __init__(self):
-        self.results = []
+    """Columnar store of benchmark requests with streaming statistics
+
+    Requests are written into a preallocated NumPy table that grows
+    geometrically up to max_rows and then act as a ring buffer holding the
+    latest max_rows requests for plots and export. Counts, sums, min/max
+    and a latency histogram are updated as each request is recorded and
+    cover every request, so get_statistics reads them in constant time and
+    a long soak run uses fixed memory.
+
+    Requests are also counted per second of the run, with a small histogram
+    each, for throughput and p99 over time; the latest max_windows seconds
+    are kept. When requests carry the time they were meant to start, as in
+    open-loop runs, latency is also measured from that time. This corrects
+    for coordinated omission: a request held back by a stalled system is
+    charged for the time it should already have been running.
+    """
+
+    def __init__(self, max_rows=100000, initial_capacity=1024, max_windows=3600):
+        self.max_rows = max_rows
+        self.initial_capacity = min(initial_capacity, max_rows)
+        self.max_windows = max_windows
         self.start_time = None
         self.end_time = None
-        
+        self._reset()
+
+    def _reset(self):
+        # One row per request, one column per entry of COLUMNS
+        self._rows = np.empty((self.initial_capacity, len(COLUMNS)), dtype=np.float64)
+        self._success = np.empty(self.initial_capacity, dtype=bool)
+        self._errors = {}
+        self._next = 0
+        self._n_rows = 0
+
+        self.total_requests = 0
+        self.successful_requests = 0
+        self._sums = [0.0] * len(TIMING_COLUMNS)
+        self._sum_squares = [0.0] * len(TIMING_COLUMNS)
+        self._min = [np.inf] * len(TIMING_COLUMNS)
+        self._max = [-np.inf] * len(TIMING_COLUMNS)
+        self.histogram = LatencyHistogram()
+        self.corrected_histogram = LatencyHistogram()
+        self._corrected_max = 0.0
+        # [second of the run, requests, errors, histogram of successful total times]
+        self._windows = collections.deque(maxlen=self.max_windows)
+        self._window_origin = None
+
     def start_benchmark(self):
         """Start the benchmark session"""
         self.start_time = time.perf_counter()
-        self.results = []
-        
+        self.end_time = None
+        self._reset()
+
+    def _grow(self):
+        """Double the column capacity, up to max_rows"""
+        capacity = min(len(self._success) * 2, self.max_rows)
+        rows = np.empty((capacity, len(COLUMNS)), dtype=np.float64)
+        rows[:len(self._rows)] = self._rows
+        self._rows = rows
+        success = np.empty(capacity, dtype=bool)
+        success[:len(self._success)] = self._success
+        self._success = success
+
     def record_prediction(self, timing_data):
         """Record a prediction result with network metrics"""
-        # Ensure all required fields exist with defaults
-        timing_data = {
-            'timestamp': datetime.now(),
-            'total_time': timing_data.get('total_time', 0),
-            'network_time': timing_data.get('network_time', 0),
-            'processing_time': timing_data.get('processing_time', 0),
-            'prediction': timing_data.get('prediction'),
-            'status': timing_data.get('status', 'error'),
-            'error': timing_data.get('error')
-        }
-        
-        self.results.append(timing_data)
-        
+        if self._next == len(self._success):
+            if len(self._success) < self.max_rows:
+                self._grow()
+            else:
+                # Full: overwrite the oldest row
+                self._next = 0
+
+        i = self._next
+        success = timing_data.get('status', 'error') == 'success'
+        prediction = timing_data.get('prediction')
+        timings = [timing_data.get(name, 0) for name in TIMING_COLUMNS]
+        self._rows[i] = (*timings, time.time(), timing_data.get('intended_start', np.nan),
+                         np.nan if prediction is None else prediction)
+        self._success[i] = success
+        if self._errors:
+            self._errors.pop(i, None)
+        if timing_data.get('error') is not None:
+            self._errors[i] = timing_data['error']
+
+        self.total_requests += 1
+        if success:
+            self.successful_requests += 1
+            for j, value in enumerate(timings):
+                self._sums[j] += value
+                self._sum_squares[j] += value * value
+                if value < self._min[j]:
+                    self._min[j] = value
+                if value > self._max[j]:
+                    self._max[j] = value
+            self.histogram.record(timings[0])
+
+        now = time.perf_counter()
+        if self._window_origin is None:
+            self._window_origin = self.start_time if self.start_time is not None else now
+        second = int(now - self._window_origin)
+        if not self._windows or self._windows[-1][0] != second:
+            self._windows.append([second, 0, 0, LatencyHistogram(relative_error=WINDOW_RELATIVE_ERROR)])
+        window = self._windows[-1]
+        window[1] += 1
+        if success:
+            window[3].record(timings[0])
+
+            intended_start = timing_data.get('intended_start')
+            if intended_start is not None:
+                # Latency from when the request should have started, never less than measured
+                corrected = max((now - intended_start) * 1000, timings[0])
+                self.corrected_histogram.record(corrected)
+                if corrected > self._corrected_max:
+                    self._corrected_max = corrected
+        else:
+            window[2] += 1
+
+        self._next = i + 1
+        self._n_rows = min(self._n_rows + 1, len(self._success))
+
     def end_benchmark(self):
         """End the benchmark session"""
         self.end_time = time.perf_counter()
-        
+
+    def _mean(self, name):
+        return self._sums[COLUMN_INDEX[name]] / self.successful_requests if self.successful_requests else 0
+
+    def _std(self, name):
+        if self.successful_requests < 2:
+            return 0
+        j = COLUMN_INDEX[name]
+        n = self.successful_requests
+        variance = (self._sum_squares[j] - self._sums[j] * self._sums[j] / n) / (n - 1)
+        return max(variance, 0) ** 0.5
+
+    def _percentiles(self, histogram, low, high):
+        # Histogram buckets are approximate; keep percentiles within the exact min and max
+        percentiles = histogram.percentiles(PERCENTILES)
+        if histogram.total:
+            percentiles = {q: min(max(value, low), high) for q, value in percentiles.items()}
+        return percentiles
+
     def get_statistics(self):
         """Calculate benchmark statistics including network metrics"""
-        if not self.results:
-            return {
-                'total_time': 0,
-                'total_requests': 0,
-                'successful_requests': 0,
-                'requests_per_second': 0,
-                'success_rate': 0,
-                'avg_total_time': 0,
-                'avg_network_time': 0,
-                'avg_processing_time': 0,
-                'min_response_time': 0,
-                'max_response_time': 0
-            }
-            
-        df = pd.DataFrame(self.results)
-        successful_df = df[df['status'] == 'success']
-        
-        total_time = self.end_time - self.start_time
-        total_requests = len(df)
-        successful_requests = len(successful_df)
-        
-        # Calculate statistics only if there are successful requests
-        if successful_requests > 0:
-            avg_total_time = successful_df['total_time'].mean()
-            avg_network_time = successful_df['network_time'].mean()
-            avg_processing_time = successful_df['processing_time'].mean()
-            min_response_time = successful_df['total_time'].min()
-            max_response_time = successful_df['total_time'].max()
-        else:
-            avg_total_time = avg_network_time = avg_processing_time = min_response_time = max_response_time = 0
-        
+        total_time = 0
+        if self.total_requests and self.start_time is not None:
+            # Read before end_benchmark, e.g. from a progress callback, the run so far counts
+            end_time = self.end_time if self.end_time is not None else time.perf_counter()
+            total_time = end_time - self.start_time
+        total_requests = self.total_requests
+        successful_requests = self.successful_requests
+        percentiles = self._percentiles(self.histogram, self._min[0], self._max[0])
+
         stats = {
             'total_time': total_time,
             'total_requests': total_requests,
             'successful_requests': successful_requests,
             'requests_per_second': total_requests / total_time if total_time > 0 else 0,
             'success_rate': (successful_requests / total_requests * 100) if total_requests > 0 else 0,
-            'avg_total_time': avg_total_time,
-            'avg_network_time': avg_network_time,
-            'avg_processing_time': avg_processing_time,
-            'min_response_time': min_response_time,
-            'max_response_time': max_response_time
+            'avg_total_time': self._mean('total_time'),
+            'avg_network_time': self._mean('network_time'),
+            'avg_serialization_time': self._mean('serialization_time'),
+            'avg_processing_time': self._mean('processing_time'),
+            'avg_overhead_time': self._mean('overhead_time'),
+            'min_response_time': self._min[0] if successful_requests else 0,
+            'max_response_time': self._max[0] if successful_requests else 0,
+            'std_response_time': self._std('total_time')
         }
-        
+        for q in PERCENTILES:
+            stats[f'p{q:g}_response_time'] = percentiles[q]
+        if self.corrected_histogram.total:
+            # Only requests with an intended start, i.e. open-loop runs, have a corrected latency
+            corrected = self._percentiles(self.corrected_histogram, self._min[0], self._corrected_max)
+            for q in PERCENTILES:
+                stats[f'p{q:g}_corrected_response_time'] = corrected[q]
+            stats['max_corrected_response_time'] = self._corrected_max
+
         return stats
-    
-    def plot_response_times(self):
+
+    def get_windows(self):
+        """Get requests, throughput, errors and p99 for each second of the run"""
+        windows = []
+        for second, requests, errors, histogram in self._windows:
+            windows.append({
+                'second': second,
+                'requests': requests,
+                'errors': errors,
+                'throughput': requests,
+                'p50_response_time': histogram.percentile(50),
+                'p99_response_time': histogram.percentile(99)
+            })
+        if windows and self.end_time is not None and self._window_origin is not None:
+            # The last second is usually cut short by the end of the run
+            last_width = (self.end_time - self._window_origin) - windows[-1]['second']
+            if 0 < last_width < 1:
+                windows[-1]['throughput'] = windows[-1]['requests'] / last_width
+        return windows
+
+    def get_report(self, **metadata):
+        """Get a machine-readable report of the run: statistics, windows and the latency histogram
+
+        Keyword arguments, e.g. the load generator settings, are stored as metadata.
+        """
+        histogram = self.histogram
+        counts = histogram.counts
+        return {
+            'generated_at': datetime.now().astimezone().isoformat(),
+            'metadata': metadata,
+            'statistics': self.get_statistics(),
+            'windows': self.get_windows(),
+            'histogram': {
+                'lowest_ms': histogram.lowest_ms,
+                'highest_ms': histogram.highest_ms,
+                'relative_error': histogram.relative_error,
+                # Bucket index -> count, only non-empty buckets
+                'counts': {int(i): int(counts[i]) for i in np.flatnonzero(counts)}
+            }
+        }
+
+    def get_report_json(self, **metadata):
+        return json.dumps(self.get_report(**metadata), indent=2)
+
+    def _order(self):
+        """Indices of the retained rows, oldest first"""
+        if self._n_rows < len(self._success) or self._next == len(self._success):
+            return np.arange(self._n_rows)
+        return np.concatenate([np.arange(self._next, self._n_rows), np.arange(self._next)])
+
+    def get_column(self, name, successful_only=False):
+        """Get one column of the retained rows, oldest first"""
+        order = self._order()
+        if successful_only:
+            order = order[self._success[order]]
+        return self._rows[order, COLUMN_INDEX[name]]
+
+    def plot_response_times(self, show_breakdown=True):
         """Create response time trend plot with network breakdown"""
-        df = pd.DataFrame(self.results)
-        successful_df = df[df['status'] == 'success']
-        
-        if successful_df.empty:
-            fig, ax = plt.subplots(figsize=(10, 4))
-            ax.text(0.5, 0.5, 'No successful requests to plot', 
+        from matplotlib.figure import Figure
+
+        total_times = self.get_column('total_time', successful_only=True)
+
+        if len(total_times) == 0:
+            fig = Figure(figsize=(10, 4))
+            ax = fig.subplots()
+            ax.text(0.5, 0.5, 'No successful requests to plot',
                    ha='center', va='center')
             ax.set_xlabel('Request Number')
             ax.set_ylabel('Time (ms)')
             ax.set_title('Response Time Breakdown')
             return fig
-            
-        fig, ax = plt.subplots(figsize=(10, 4))
-        
+
+        fig = Figure(figsize=(10, 4))
+        ax = fig.subplots()
+        request_numbers = np.arange(len(total_times))
+
         # Plot total time
-        ax.plot(range(len(successful_df)), successful_df['total_time'], 
+        ax.plot(request_numbers, total_times,
                 label='Total Time', color='blue')
-        
-        # Plot network time
-        ax.plot(range(len(successful_df)), successful_df['network_time'],
-                label='Network Time', color='red', alpha=0.7)
-        
-        # Plot processing time
-        ax.plot(range(len(successful_df)), successful_df['processing_time'],
-                label='Processing Time', color='green', alpha=0.7)
-        
+
+        if show_breakdown:
+            # Plot network time, only measured when going through the HTTP service
+            network_times = self.get_column('network_time', successful_only=True)
+            if network_times.any():
+                ax.plot(request_numbers, network_times,
+                        label='Network Time', color='red', alpha=0.7)
+
+            # Plot serialization time, only measured when going through the HTTP service
+            serialization_times = self.get_column('serialization_time', successful_only=True)
+            if serialization_times.any():
+                ax.plot(request_numbers, serialization_times,
+                        label='Serialization Time', color='orange', alpha=0.7)
+
+            # Plot processing time
+            ax.plot(request_numbers, self.get_column('processing_time', successful_only=True),
+                    label='Processing Time', color='green', alpha=0.7)
+
+            # Plot queueing and other overhead
+            overhead_times = self.get_column('overhead_time', successful_only=True)
+            if overhead_times.any():
+                ax.plot(request_numbers, overhead_times,
+                        label='Queue/Overhead Time', color='purple', alpha=0.7)
+
         ax.set_xlabel('Request Number')
         ax.set_ylabel('Time (ms)')
         ax.set_title('Response Time Breakdown')
         ax.legend()
-        plt.grid(True, alpha=0.3)
+        ax.grid(True, alpha=0.3)
         return fig
-    
-    def plot_response_distribution(self):
+
+    def plot_response_distribution(self, show_breakdown=True):
         """Create response time distribution plot with network breakdown"""
-        df = pd.DataFrame(self.results)
-        successful_df = df[df['status'] == 'success']
-        
-        if successful_df.empty:
-            fig, ax = plt.subplots(figsize=(10, 4))
-            ax.text(0.5, 0.5, 'No successful requests to plot', 
+        from matplotlib.figure import Figure
+
+        total_times = self.get_column('total_time', successful_only=True)
+
+        if len(total_times) == 0:
+            fig = Figure(figsize=(10, 4))
+            ax = fig.subplots()
+            ax.text(0.5, 0.5, 'No successful requests to plot',
                    ha='center', va='center')
             ax.set_xlabel('Time (ms)')
             ax.set_ylabel('Frequency')
             ax.set_title('Response Time Distribution')
             return fig
-            
-        fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(15, 4))
-        
+
+        if not show_breakdown:
+            fig = Figure(figsize=(10, 4))
+            ax = fig.subplots()
+            ax.hist(total_times, bins=30, color='blue', alpha=0.7)
+            ax.set_xlabel('Total Time (ms)')
+            ax.set_ylabel('Frequency')
+            ax.set_title('Total Response Time')
+            ax.grid(True, alpha=0.3)
+            return fig
+
+        fig = Figure(figsize=(15, 4))
+        ax1, ax2, ax3 = fig.subplots(1, 3)
+
         # Total time distribution
-        ax1.hist(successful_df['total_time'], bins=30, color='blue', alpha=0.7)
+        ax1.hist(total_times, bins=30, color='blue', alpha=0.7)
         ax1.set_xlabel('Total Time (ms)')
         ax1.set_ylabel('Frequency')
         ax1.set_title('Total Response Time')
         ax1.grid(True, alpha=0.3)
-        
+
         # Network time distribution
-        ax2.hist(successful_df['network_time'], bins=30, color='red', alpha=0.7)
+        ax2.hist(self.get_column('network_time', successful_only=True), bins=30, color='red', alpha=0.7)
         ax2.set_xlabel('Network Time (ms)')
         ax2.set_title('Network Time')
         ax2.grid(True, alpha=0.3)
-        
+
         # Processing time distribution
-        ax3.hist(successful_df['processing_time'], bins=30, color='green', alpha=0.7)
+        ax3.hist(self.get_column('processing_time', successful_only=True), bins=30, color='green', alpha=0.7)
         ax3.set_xlabel('Processing Time (ms)')
         ax3.set_title('Processing Time')
         ax3.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
+
+        fig.tight_layout()
         return fig
-    
+
+    def plot_latency_windows(self):
+        """Create throughput and p99 latency per second plot"""
+        from matplotlib.figure import Figure
+
+        windows = self.get_windows()
+        fig = Figure(figsize=(10, 4))
+        ax1 = fig.subplots()
+        if not windows:
+            ax1.text(0.5, 0.5, 'No requests to plot',
+                    ha='center', va='center')
+            ax1.set_xlabel('Second')
+            ax1.set_title('Latency Over Time')
+            return fig
+
+        seconds = [window['second'] for window in windows]
+        ax1.bar(seconds, [window['throughput'] for window in windows],
+                color='lightsteelblue', label='Requests/Second')
+        ax1.set_xlabel('Second')
+        ax1.set_ylabel('Requests/Second')
+
+        ax2 = ax1.twinx()
+        ax2.plot(seconds, [window['p99_response_time'] for window in windows],
+                 color='red', marker='o', label='p99 Response Time')
+        ax2.set_ylabel('p99 Response Time (ms)')
+
+        ax1.set_title('Latency Over Time')
+        lines = ax1.get_legend_handles_labels()
+        more_lines = ax2.get_legend_handles_labels()
+        ax1.legend(lines[0] + more_lines[0], lines[1] + more_lines[1], loc='upper right')
+        ax1.grid(True, alpha=0.3)
+        return fig
+
     def get_results_df(self):
         """Get results as DataFrame with network metrics"""
-        df = pd.DataFrame(self.results)
-        if not df.empty:
-            # Calculate percentages
-            total_time = df['total_time']
-            df['network_percentage'] = (df['network_time'] / total_time * 100).round(2)
-            df['processing_percentage'] = (df['processing_time'] / total_time * 100).round(2)
-            
-            # Add request number
-            df['request_number'] = range(1, len(df) + 1)
-            
-            # Reorder columns
-            columns = ['request_number', 'timestamp', 'total_time', 'network_time', 
-                      'processing_time', 'network_percentage', 'processing_percentage',
-                      'prediction', 'status', 'error']
-            df = df[columns]
-        return df 
\ No newline at end of file
+        order = self._order()
+        if len(order) == 0:
+            return pd.DataFrame()
+
+        local_timezone = datetime.now().astimezone().tzinfo
+        rows = self._rows[order]
+        timestamps = pd.to_datetime(rows[:, COLUMN_INDEX['timestamp']], unit='s', utc=True)
+        df = pd.DataFrame({
+            # Oldest retained request first; earlier ones were dropped by the ring buffer
+            'request_number': np.arange(self.total_requests - len(order) + 1, self.total_requests + 1),
+            'timestamp': timestamps.tz_convert(local_timezone).tz_localize(None),
+            **{name: rows[:, COLUMN_INDEX[name]] for name in TIMING_COLUMNS}
+        })
+
+        # Calculate percentages
+        total_time = df['total_time']
+        df['network_percentage'] = (df['network_time'] / total_time * 100).round(2)
+        df['serialization_percentage'] = (df['serialization_time'] / total_time * 100).round(2)
+        df['processing_percentage'] = (df['processing_time'] / total_time * 100).round(2)
+        df['overhead_percentage'] = (df['overhead_time'] / total_time * 100).round(2)
+
+        df['prediction'] = rows[:, COLUMN_INDEX['prediction']]
+        df['status'] = np.where(self._success[order], 'success', 'error')
+        df['error'] = [self._errors.get(i) for i in order]
+        return df
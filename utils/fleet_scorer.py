@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+PREDICTION_COLUMN = 'Predicted CO2 Emissions(g/km)'
+RATING_COLUMN = 'Emission Rating'
+DELTA_COLUMN = 'Delta vs Average (g/km)'
+DELTA_PCT_COLUMN = 'Delta vs Average (%)'
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def _import_parquet():
+    try:
+        import pyarrow
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet files need pyarrow: pip install pyarrow")
+    return pyarrow, pq
+
+
+class FleetScorer:
+    """Score fleet files chunk by chunk so memory stays bounded by the chunk size"""
+
+    def __init__(self, controller, chunk_size=100000, keep_columns=None, progress_stream=sys.stderr):
+        self.controller = controller
+        self.chunk_size = chunk_size
+        self.keep_columns = list(keep_columns or [])
+        self.progress_stream = progress_stream
+
+    def iter_chunks(self, input_path):
+        """Yield DataFrame chunks holding the model features and the kept columns"""
+        columns = self.keep_columns + [f for f in self.controller.model.features if f not in self.keep_columns]
+        feature_dtypes = {feature: np.float64 for feature in self.controller.model.features}
+
+        if _is_parquet(input_path):
+            _, pq = _import_parquet()
+            parquet_file = pq.ParquetFile(input_path)
+            for batch in parquet_file.iter_batches(batch_size=self.chunk_size, columns=columns):
+                yield batch.to_pandas().astype(feature_dtypes)
+        else:
+            yield from pd.read_csv(input_path, usecols=columns, dtype=feature_dtypes,
+                                   chunksize=self.chunk_size)
+
+    def score_chunk(self, chunk):
+        """Add predictions, ratings and deltas against the average emission to a chunk"""
+        predictions = self.controller.predict_batch(chunk)
+        avg_emission = self.controller.get_average_emission()
+
+        scored = chunk[self.keep_columns].copy()
+        scored[PREDICTION_COLUMN] = predictions
+        scored[RATING_COLUMN] = self.controller.get_emission_ratings(predictions)
+        scored[DELTA_COLUMN] = predictions - avg_emission
+        scored[DELTA_PCT_COLUMN] = (predictions - avg_emission) / avg_emission * 100
+        return scored
+
+    def _report(self, rows, elapsed, final=False):
+        if self.progress_stream is None:
+            return
+        rate = rows / elapsed if elapsed > 0 else 0
+        label = "Done" if final else "Scored"
+        print(f"{label}: {rows:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)", file=self.progress_stream)
+
+    def score_file(self, input_path, output_path):
+        """Stream an input CSV/Parquet file into a scored output CSV/Parquet file"""
+        start = time.perf_counter()
+        rows = 0
+        parquet_writer = None
+        write_parquet = _is_parquet(output_path)
+
+        with nullcontext() if write_parquet else open(output_path, 'w', newline='') as csv_file:
+            try:
+                for chunk in self.iter_chunks(input_path):
+                    scored = self.score_chunk(chunk)
+
+                    if write_parquet:
+                        pyarrow, pq = _import_parquet()
+                        table = pyarrow.Table.from_pandas(scored, preserve_index=False)
+                        if parquet_writer is None:
+                            parquet_writer = pq.ParquetWriter(output_path, table.schema)
+                        parquet_writer.write_table(table)
+                    else:
+                        scored.to_csv(csv_file, header=rows == 0, index=False)
+
+                    rows += len(scored)
+                    self._report(rows, time.perf_counter() - start)
+            finally:
+                if parquet_writer is not None:
+                    parquet_writer.close()
+
+        elapsed = time.perf_counter() - start
+        self._report(rows, elapsed, final=True)
+        return {'rows': rows, 'elapsed': elapsed, 'rows_per_second': rows / elapsed if elapsed > 0 else 0}
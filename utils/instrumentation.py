@@ -0,0 +1,200 @@
+"""Per-stage timing of the model's hot paths
+
+Code marks stages with span():
+
+    with span('predict.forest'):
+        ...
+
+While instrumentation is disabled, the default, span() returns a shared
+no-op context manager, so marking stages costs a function call. Once
+enable() is called, each span's duration is measured with perf_counter_ns
+and added to a per-stage LatencyHistogram. Histograms are kept in-process
+and can be read with stage_stats() or exported with export_prometheus().
+
+A Recording collects its own histograms while it is open, whether or not
+instrumentation is enabled, so one benchmark run can read its stage
+timings without resetting or toggling the process-wide ones:
+
+    with instrumentation.Recording() as recording:
+        ...
+    recording.stage_stats()
+"""
+import threading
+import time
+
+from utils.latency_histogram import LatencyHistogram
+
+# Upper bounds of the Prometheus histogram buckets, in seconds
+PROMETHEUS_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                      1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = False
+_lock = threading.Lock()
+_stages = {}
+# Open Recordings, each with its own stages
+_recordings = []
+# Whether spans are timed at all: enabled or recording
+_active = False
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _StageStats:
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.count = 0
+        self.total_ms = 0.0
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, (time.perf_counter_ns() - self.start) / 1e6)
+        return False
+
+
+def span(name):
+    """Time the enclosed block as stage `name` while instrumentation is enabled or recording"""
+    if not _active:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+def _add(stages, name, duration_ms):
+    stats = stages.get(name)
+    if stats is None:
+        stats = stages[name] = _StageStats()
+    stats.histogram.record(duration_ms)
+    stats.count += 1
+    stats.total_ms += duration_ms
+
+
+def record(name, duration_ms):
+    """Add one duration of a stage"""
+    with _lock:
+        if _enabled:
+            _add(_stages, name, duration_ms)
+        for recording in _recordings:
+            _add(recording._stages, name, duration_ms)
+
+
+def _update_active():
+    global _active
+    _active = _enabled or bool(_recordings)
+
+
+def enable():
+    global _enabled
+    with _lock:
+        _enabled = True
+        _update_active()
+
+
+def disable():
+    global _enabled
+    with _lock:
+        _enabled = False
+        _update_active()
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Drop every recorded duration"""
+    with _lock:
+        _stages.clear()
+
+
+def _snapshot(stages):
+    with _lock:
+        return [(name, stats.count, stats.total_ms, stats.histogram.copy()) for name, stats in stages.items()]
+
+
+def stage_stats(stages=None):
+    """Get count, total, mean and percentiles in ms for every stage, in the order stages were first seen"""
+    snapshot = _snapshot(_stages if stages is None else stages)
+
+    result = {}
+    for name, count, total_ms, histogram in snapshot:
+        percentiles = histogram.percentiles((50, 90, 99))
+        result[name] = {
+            'count': count,
+            'total_ms': total_ms,
+            'mean_ms': total_ms / count if count else 0,
+            'p50_ms': percentiles[50],
+            'p90_ms': percentiles[90],
+            'p99_ms': percentiles[99]
+        }
+    return result
+
+
+def export_prometheus(metric='emission_stage_duration_seconds', stages=None):
+    """Export the stage histograms in the Prometheus text exposition format"""
+    snapshot = _snapshot(_stages if stages is None else stages)
+
+    lines = [f"# HELP {metric} Time spent in each instrumented stage.",
+             f"# TYPE {metric} histogram"]
+    for name, count, total_ms, histogram in snapshot:
+        cumulative = histogram.cumulative_counts([bound * 1000 for bound in PROMETHEUS_BUCKETS])
+        for bound, bucket_count in zip(PROMETHEUS_BUCKETS, cumulative):
+            lines.append(f'{metric}_bucket{{stage="{name}",le="{bound:g}"}} {bucket_count}')
+        lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {count}')
+        lines.append(f'{metric}_sum{{stage="{name}"}} {total_ms / 1000:.9f}')
+        lines.append(f'{metric}_count{{stage="{name}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+class Recording:
+    """Stage timings of the spans run while it is open, kept apart from the process-wide ones
+
+    Spans from every thread of the process are recorded, including
+    requests served to others at the same time.
+    """
+
+    def __init__(self):
+        self._stages = {}
+
+    def start(self):
+        with _lock:
+            if self not in _recordings:
+                _recordings.append(self)
+            _update_active()
+        return self
+
+    def stop(self):
+        with _lock:
+            if self in _recordings:
+                _recordings.remove(self)
+            _update_active()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def stage_stats(self):
+        return stage_stats(self._stages)
+
+    def export_prometheus(self, metric='emission_stage_duration_seconds'):
+        return export_prometheus(metric, stages=self._stages)
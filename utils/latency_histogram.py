@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+
+
+class LatencyHistogram:
+    """Fixed-size log-bucketed histogram of latencies for streaming percentiles
+
+    Bucket edges grow by a factor of (1 + 2 * relative_error) from
+    lowest_ms, so any percentile read back is within relative_error of the
+    true value. Values below lowest_ms count in the first bucket and values
+    above highest_ms in the last. Memory is fixed by the range and precision,
+    e.g. about 1100 buckets for 1 µs to 1 hour at 1 %. Histograms with the
+    same configuration merge by adding their counts.
+    """
+
+    def __init__(self, lowest_ms=1e-3, highest_ms=3.6e6, relative_error=0.01):
+        if not 0 < lowest_ms < highest_ms:
+            raise ValueError("Expected 0 < lowest_ms < highest_ms!")
+        if not 0 < relative_error < 1:
+            raise ValueError("relative_error must be between 0 and 1!")
+
+        self.lowest_ms = lowest_ms
+        self.highest_ms = highest_ms
+        self.relative_error = relative_error
+        self._log_growth = math.log1p(2 * relative_error)
+        n_buckets = int(math.ceil(math.log(highest_ms / lowest_ms) / self._log_growth)) + 1
+        # A plain list: incrementing one bucket is several times cheaper than on an array
+        self._counts = [0] * n_buckets
+        self._last = n_buckets - 1
+        self.total = 0
+
+    @property
+    def counts(self):
+        return np.array(self._counts, dtype=np.int64)
+
+    def record(self, value_ms, count=1):
+        if value_ms <= self.lowest_ms:
+            index = 0
+        else:
+            index = min(int(math.log(value_ms / self.lowest_ms) / self._log_growth) + 1, self._last)
+        self._counts[index] += count
+        self.total += count
+
+    def record_many(self, values_ms):
+        """Record an array of latencies at once"""
+        values = np.asarray(values_ms, dtype=np.float64)
+        if values.size == 0:
+            return
+        with np.errstate(divide='ignore'):
+            indices = np.floor(np.log(np.maximum(values, self.lowest_ms) / self.lowest_ms) / self._log_growth) + 1
+        indices[values <= self.lowest_ms] = 0
+        indices = np.minimum(indices, self._last).astype(np.int64)
+        self._add(np.bincount(indices, minlength=len(self._counts)))
+        self.total += values.size
+
+    def _add(self, counts):
+        for index in np.flatnonzero(counts):
+            self._counts[index] += int(counts[index])
+
+    def _value(self, index):
+        """Representative value of a bucket, within relative_error of everything in it"""
+        if index == 0:
+            return self.lowest_ms
+        lower = self.lowest_ms * math.exp((index - 1) * self._log_growth)
+        return lower * (1 + self.relative_error)
+
+    def percentile(self, q):
+        """Get the q-th percentile (0-100) in ms, or 0 if nothing was recorded"""
+        if self.total == 0:
+            return 0.0
+        rank = max(int(math.ceil(q / 100 * self.total)), 1)
+        return self._value(int(np.searchsorted(np.cumsum(self.counts), rank)))
+
+    def percentiles(self, qs):
+        """Get several percentiles with one pass over the buckets"""
+        if self.total == 0:
+            return {q: 0.0 for q in qs}
+        cumulative = np.cumsum(self.counts)
+        return {q: self._value(int(np.searchsorted(cumulative, max(int(math.ceil(q / 100 * self.total)), 1))))
+                for q in qs}
+
+    def cumulative_counts(self, bounds_ms):
+        """Get how many values were at most each bound, judged by their bucket's value"""
+        values = np.array([self._value(i) for i in range(len(self._counts))])
+        cumulative = np.cumsum(self.counts)
+        positions = np.searchsorted(values, bounds_ms, side='right')
+        return [int(cumulative[position - 1]) if position else 0 for position in positions]
+
+    def merge(self, other):
+        """Add the counts of a histogram with the same configuration"""
+        if (other.lowest_ms, other.highest_ms, other.relative_error) != \
+                (self.lowest_ms, self.highest_ms, self.relative_error):
+            raise ValueError("Only histograms with the same range and precision can be merged!")
+        self._add(other.counts)
+        self.total += other.total
+        return self
+
+    def reset(self):
+        self._counts = [0] * len(self._counts)
+        self.total = 0
+
+    def copy(self):
+        histogram = LatencyHistogram(self.lowest_ms, self.highest_ms, self.relative_error)
+        return histogram.merge(self)
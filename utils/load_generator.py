@@ -0,0 +1,267 @@
+import asyncio
+import inspect
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+
+BACKENDS = ('thread', 'process', 'asyncio')
+MODES = ('closed', 'open')
+
+
+def fixed_request(features):
+    """Request factory that always sends the same features"""
+    return lambda i: features
+
+
+def random_request(feature_names, seed=None):
+    """Request factory drawing features from the Benchmark page's random ranges"""
+    rng = np.random.default_rng(seed)
+
+    def make_request(i):
+        return dict(zip(feature_names, (
+            rng.uniform(1.0, 8.0),
+            int(rng.integers(3, 12)),
+            rng.uniform(4.0, 20.0),
+            rng.uniform(100, 800),
+            rng.uniform(1000, 4000),
+            int(rng.integers(2015, 2024))
+        )))
+    return make_request
+
+
+def _timed_call(predict_fn, features):
+    """Run one prediction, returning it with its processing time in ms"""
+    start = time.perf_counter()
+    prediction = predict_fn(features)
+    return prediction, {'processing_time': (time.perf_counter() - start) * 1000}
+
+
+class LoadGenerator:
+    """Drive a prediction function with configurable concurrency and record timings
+
+    Backends:
+        thread   client threads call predict_fn directly
+        process  client threads hand each request to a process pool; predict_fn
+                 and the initializer must be picklable top-level functions
+        asyncio  coroutines on an event loop; a blocking predict_fn runs in a
+                 thread pool, a coroutine function is awaited directly
+    Modes:
+        closed   `concurrency` clients each send their next request as soon as
+                 the previous one completes
+        open     requests are sent on a fixed schedule of target_rps per second,
+                 whether or not earlier ones have completed
+
+    Total time runs from when a request was sent to when it completed, so in
+    open-loop mode it includes time spent queued behind busy workers. With
+    timed=True, predict_fn measures itself and returns (prediction, timings)
+    where timings may hold processing_time, serialization_time and
+    network_time in ms, as PredictionClient.predict does. Otherwise the call
+    is timed as processing and no network time is recorded. Whatever part
+    of the total none of these cover, like time queued for a worker thread
+    or process, is recorded as overhead time. The optional progress callback runs on the calling thread at most
+    once per progress_interval, so UI updates don't slow down the measurement.
+    The optional after_warmup callback runs once warmup is done, so metrics
+    kept outside benchmark_utils, like a MicroBatcher's or stage timings,
+    can start with the measured requests.
+    """
+
+    def __init__(self, predict_fn, request_factory, benchmark_utils, backend='thread', concurrency=4,
+                 mode='closed', target_rps=None, warmup=0, progress_callback=None, progress_interval=0.25,
+                 initializer=None, initargs=(), timed=False, after_warmup=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        if mode == 'open' and not target_rps:
+            raise ValueError("Open-loop mode needs a target_rps!")
+
+        self.predict_fn = predict_fn
+        self.request_factory = request_factory
+        self.benchmark_utils = benchmark_utils
+        self.backend = backend
+        self.concurrency = max(1, concurrency)
+        self.mode = mode
+        self.target_rps = target_rps
+        self.warmup = warmup
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.initializer = initializer
+        self.initargs = initargs
+        self.timed = timed
+        self.after_warmup = after_warmup
+
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._process_pool = None
+
+    def _call(self, features):
+        """Run one prediction on the configured backend, returning (prediction, timings in ms)"""
+        if self._process_pool is not None:
+            if self.timed:
+                return self._process_pool.submit(self.predict_fn, features).result()
+            return self._process_pool.submit(_timed_call, self.predict_fn, features).result()
+        if self.timed:
+            return self.predict_fn(features)
+        return _timed_call(self.predict_fn, features)
+
+    def _record(self, sent_at, intended_at, outcome, error=None):
+        """Record one completed request"""
+        total_time = (time.perf_counter() - sent_at) * 1000
+        if error is None:
+            prediction, timings = outcome
+            processing_time = timings.get('processing_time', 0)
+            serialization_time = timings.get('serialization_time', 0)
+            # Only a timed client measures network time; in-process calls have none
+            network_time = timings.get('network_time', 0)
+            timing_data = {
+                'total_time': total_time,
+                'network_time': network_time,
+                'serialization_time': serialization_time,
+                'processing_time': processing_time,
+                'overhead_time': max(total_time - processing_time - serialization_time - network_time, 0),
+                'prediction': prediction,
+                'status': 'success'
+            }
+        else:
+            timing_data = {'total_time': total_time, 'status': 'error', 'error': str(error)}
+        if intended_at is not None:
+            # Only open-loop requests have a schedule to fall behind
+            timing_data['intended_start'] = intended_at
+
+        with self._lock:
+            self.benchmark_utils.record_prediction(timing_data)
+            self._completed += 1
+
+    def _send(self, i, intended_at=None, sent_at=None):
+        """Send request i and record its outcome"""
+        features = self.request_factory(i)
+        sent_at = time.perf_counter() if sent_at is None else sent_at
+        try:
+            outcome = self._call(features)
+        except Exception as e:
+            self._record(sent_at, intended_at, None, error=e)
+        else:
+            self._record(sent_at, intended_at, outcome)
+
+    def _run_threads(self, n_requests):
+        """Closed or open loop with client threads"""
+        if self.mode == 'closed':
+            counter = iter(range(n_requests))
+            counter_lock = threading.Lock()
+
+            def client():
+                while True:
+                    with counter_lock:
+                        i = next(counter, None)
+                    if i is None:
+                        return
+                    self._send(i)
+
+            threads = [threading.Thread(target=client, daemon=True) for _ in range(self.concurrency)]
+            for thread in threads:
+                thread.start()
+            return threads
+
+        def scheduler():
+            start = time.perf_counter()
+            with ThreadPoolExecutor(self.concurrency) as clients:
+                for i in range(n_requests):
+                    intended_at = start + i / self.target_rps
+                    delay = intended_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    # Queueing behind busy clients counts towards the request's time
+                    clients.submit(self._send, i, intended_at, time.perf_counter())
+
+        thread = threading.Thread(target=scheduler, daemon=True)
+        thread.start()
+        return [thread]
+
+    async def _async_send(self, i, executor, intended_at=None):
+        features = self.request_factory(i)
+        sent_at = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(self.predict_fn):
+                start = time.perf_counter()
+                outcome = await self.predict_fn(features)
+                if not self.timed:
+                    outcome = (outcome, {'processing_time': (time.perf_counter() - start) * 1000})
+            else:
+                loop = asyncio.get_running_loop()
+                outcome = await loop.run_in_executor(executor, self._call, features)
+        except Exception as e:
+            self._record(sent_at, intended_at, None, error=e)
+        else:
+            self._record(sent_at, intended_at, outcome)
+
+    async def _async_main(self, n_requests):
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            if self.mode == 'closed':
+                counter = iter(range(n_requests))
+
+                async def client():
+                    for i in counter:
+                        await self._async_send(i, executor)
+
+                await asyncio.gather(*(client() for _ in range(self.concurrency)))
+            else:
+                start = time.perf_counter()
+                tasks = []
+                for i in range(n_requests):
+                    intended_at = start + i / self.target_rps
+                    delay = intended_at - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    tasks.append(asyncio.create_task(self._async_send(i, executor, intended_at)))
+                await asyncio.gather(*tasks)
+
+    def _run_asyncio(self, n_requests):
+        thread = threading.Thread(target=lambda: asyncio.run(self._async_main(n_requests)), daemon=True)
+        thread.start()
+        return [thread]
+
+    def _drive(self, n_requests):
+        """Run n_requests on the backend, reporting progress from the calling thread"""
+        self._completed = 0
+        if self.backend == 'asyncio':
+            threads = self._run_asyncio(n_requests)
+        else:
+            threads = self._run_threads(n_requests)
+
+        while True:
+            alive = [thread for thread in threads if thread.is_alive()]
+            if alive:
+                alive[0].join(self.progress_interval)
+            if self.progress_callback is not None:
+                self.progress_callback(self._completed, n_requests)
+            if not alive:
+                return
+
+    def run(self, n_requests):
+        """Warm up, then run n_requests and return the benchmark statistics"""
+        if self.backend == 'process':
+            self._process_pool = ProcessPoolExecutor(self.concurrency, initializer=self.initializer,
+                                                     initargs=self.initargs)
+        try:
+            if self.warmup:
+                # Warmup results are discarded when the benchmark starts
+                callback, self.progress_callback = self.progress_callback, None
+                try:
+                    self._drive(self.warmup)
+                finally:
+                    self.progress_callback = callback
+
+            if self.after_warmup is not None:
+                self.after_warmup()
+            self.benchmark_utils.start_benchmark()
+            self._drive(n_requests)
+            self.benchmark_utils.end_benchmark()
+        finally:
+            if self._process_pool is not None:
+                self._process_pool.shutdown()
+                self._process_pool = None
+
+        return self.benchmark_utils.get_statistics()
@@ -0,0 +1,123 @@
+import http.client
+import json
+import queue
+import time
+from urllib.parse import urlsplit
+
+
+def parse_server_timing(header):
+    """Parse a Server-Timing header into {name: milliseconds}"""
+    timings = {}
+    for entry in (header or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur' and name:
+                timings[name] = float(value)
+    return timings
+
+
+class PredictionClient:
+    """Client for the HTTP prediction service over pooled keep-alive connections
+
+    Connections are taken from a pool, so concurrent callers each reuse
+    their own socket instead of reconnecting for every request. predict()
+    splits every request's time into:
+        serialization_time  encoding the request and decoding the response
+                            on the client, plus the server's JSON decode
+                            and encode (from its Server-Timing header)
+        processing_time     the server's prediction, including any time
+                            queued for a micro-batch
+        network_time        what's left: transport and HTTP handling
+    """
+
+    def __init__(self, url, pool_size=8, timeout=10.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(None)
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _request(self, method, path, payload=None):
+        """Send one request, returning the decoded response and its timing split in ms"""
+        connection = self._pool.get() or self._connect()
+        try:
+            start = time.perf_counter()
+            body = json.dumps(payload).encode() if payload is not None else None
+            encoded = time.perf_counter()
+
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+            except (ConnectionError, http.client.HTTPException):
+                # The server dropped an idle keep-alive connection; retry once on a fresh one
+                connection.close()
+                connection = self._connect()
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+            raw = response.read()
+            received = time.perf_counter()
+
+            result = json.loads(raw)
+            decoded = time.perf_counter()
+        except Exception:
+            connection.close()
+            connection = None
+            raise
+        finally:
+            self._pool.put(connection)
+
+        if response.status != 200:
+            raise ValueError(result.get('error', f"HTTP {response.status}"))
+
+        server = parse_server_timing(response.getheader('Server-Timing'))
+        total_time = (decoded - start) * 1000
+        processing_time = server.get('predict', 0.0) + server.get('queue', 0.0)
+        serialization_time = ((encoded - start) + (decoded - received)) * 1000 \
+            + server.get('decode', 0.0) + server.get('encode', 0.0)
+        return result, {
+            'total_time': total_time,
+            'serialization_time': serialization_time,
+            'processing_time': processing_time,
+            'queue_time': server.get('queue', 0.0),
+            'network_time': max(total_time - serialization_time - processing_time, 0)
+        }
+
+    def health(self):
+        return self._request('GET', '/health')[0]
+
+    def metrics(self):
+        return self._request('GET', '/metrics')[0]
+
+    def predict(self, features):
+        """Predict one vehicle, returning the prediction and its timing split"""
+        result, timings = self._request('POST', '/predict', features)
+        return result['prediction'], timings
+
+    def predict_batch(self, instances):
+        """Predict a list of feature dicts, returning the predictions and the timing split"""
+        result, timings = self._request('POST', '/predict/batch', {'instances': list(instances)})
+        return result['predictions'], timings
+
+    def close(self):
+        """Close the pooled connections; later requests open new ones"""
+        for _ in range(self.pool_size):
+            connection = self._pool.get()
+            if connection is not None:
+                connection.close()
+        for _ in range(self.pool_size):
+            self._pool.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import threading
+import time
+
+from utils import instrumentation
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8500
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class PredictionServer:
+    """HTTP/JSON prediction service around an EmissionController
+
+    Endpoints:
+        GET  /health         model status and version
+        POST /predict        one feature dict -> {"prediction", "rating"}
+        POST /predict/batch  {"instances": [feature dicts]} -> {"predictions"}
+        GET  /metrics        micro-batching metrics, when a batcher is used
+        GET  /metrics/prometheus  per-stage timings in the Prometheus text format
+
+    Connections are HTTP/1.1 keep-alive unless the client asks to close.
+    Each response carries a Server-Timing header with the time spent
+    decoding the request, predicting and encoding the response, so clients
+    can separate server processing from serialization and transport.
+    Single predictions and batches run in the default executor so they
+    don't stall other connections. With a MicroBatcher,
+    concurrent single predictions are coalesced into batches, and the time a
+    request waited for its batch is reported as a separate "queue" entry.
+    """
+
+    def __init__(self, controller, host=DEFAULT_HOST, port=DEFAULT_PORT, batcher=None):
+        self.controller = controller
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self._server = None
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._writers = set()
+        self._routes = {
+            ('GET', '/health'): self._health,
+            ('POST', '/predict'): self._predict,
+            ('POST', '/predict/batch'): self._predict_batch,
+            ('GET', '/metrics'): self._metrics,
+            ('GET', '/metrics/prometheus'): self._prometheus
+        }
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    # Handlers return the JSON result and Server-Timing entries in seconds
+    async def _health(self, payload):
+        return {'status': 'ok' if self.controller.trained else 'untrained',
+                'model_version': self.controller.model_version}, {}
+
+    async def _metrics(self, payload):
+        return (self.batcher.metrics() if self.batcher is not None else {}), {}
+
+    async def _prometheus(self, payload):
+        return instrumentation.export_prometheus(), {}
+
+    async def _predict(self, payload):
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object of features!")
+        if self.batcher is None:
+            # Off the event loop, so other connections are served while the forest runs
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            prediction = float(await loop.run_in_executor(None, self.controller.predict_emission, payload))
+            timings = {'predict': time.perf_counter() - start}
+        else:
+            prediction, queue_time, batch_time = await asyncio.wrap_future(self.batcher.submit(payload))
+            prediction = float(prediction)
+            timings = {'queue': queue_time / 1000, 'predict': batch_time / 1000}
+        return {'prediction': prediction, 'rating': self.controller.get_emission_rating(prediction)}, timings
+
+    async def _predict_batch(self, payload):
+        instances = payload.get('instances') if isinstance(payload, dict) else None
+        if not isinstance(instances, list):
+            raise ValueError("Expected a JSON object with an 'instances' list!")
+        missing = [name for name in self.controller.model.features
+                   if any(name not in instance for instance in instances)]
+        if missing:
+            raise ValueError(f"Missing feature: {missing[0]}")
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        predictions = await loop.run_in_executor(None, self.controller.predict_batch, instances)
+        return {'predictions': predictions.tolist()}, {'predict': time.perf_counter() - start}
+
+    async def _respond(self, method, path, body):
+        """Route one request, returning the status, the JSON body and the Server-Timing entries"""
+        handler = self._routes.get((method, path))
+        if handler is None:
+            known_path = any(route_path == path for _, route_path in self._routes)
+            return (405 if known_path else 404), {'error': f"No route for {method} {path}"}, {}
+
+        start = time.perf_counter()
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            return 400, {'error': "Request body is not valid JSON!"}, {}
+        timings = {'decode': time.perf_counter() - start}
+
+        try:
+            result, handler_timings = await handler(payload)
+            timings.update(handler_timings)
+            status = 200
+        except (ValueError, KeyError, TypeError) as e:
+            result, status = {'error': str(e)}, 400
+        except Exception as e:
+            result, status = {'error': str(e)}, 500
+        return status, result, timings
+
+    async def _handle_connection(self, reader, writer):
+        """Serve requests on one connection until the client closes it"""
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    return
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    await self._write(writer, 413, {'error': "Request body too large!"}, {}, keep_alive=False)
+                    return
+                body = await reader.readexactly(length) if length else b''
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                status, result, timings = await self._respond(method, path.split('?', 1)[0], body)
+                await self._write(writer, status, result, timings, keep_alive)
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _write(self, writer, status, result, timings, keep_alive):
+        start = time.perf_counter()
+        if isinstance(result, str):
+            body, content_type = result.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(result).encode(), 'application/json'
+        timings = dict(timings, encode=time.perf_counter() - start)
+        server_timing = ', '.join(f"{name};dur={seconds * 1000:.4f}" for name, seconds in timings.items())
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Server-Timing: {server_timing}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    async def serve(self):
+        """Serve until the task is cancelled"""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Port 0 picks a free port; report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        await self._server.serve_forever()
+
+    def _shutdown(self):
+        """Stop accepting connections and drop idle keep-alive ones"""
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+
+    def start(self):
+        """Serve from a background thread, returning once the server is listening"""
+        def run():
+            try:
+                asyncio.run(self.serve())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._ready.set()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._server is None:
+            raise RuntimeError(f"Could not start the prediction server on {self.host}:{self.port}!")
+        return self
+
+    def stop(self):
+        """Stop a server started with start()"""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._shutdown)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
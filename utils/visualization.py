@@ -1,41 +1,65 @@
-import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
+import collections
+import io
+import threading
 import pandas as pd
 import numpy as np
 
+# Rendered charts are kept as PNG bytes; figures built here are plain Figure
+# objects, not registered with pyplot, so they are freed once unreferenced.
+# matplotlib and seaborn are imported on first use, importing this module
+# doesn't load them.
+PNG_DPI = 100
+MAX_CACHED_PNGS = 128
+# Room above the tallest bar of the comparison chart for its value label
+COMPARISON_HEADROOM = 1.15
+
+_render_lock = threading.Lock()
+_png_cache = collections.OrderedDict()
+_reusable_charts = {}
+
+def _new_figure(**kwargs):
+    from matplotlib.figure import Figure
+
+    return Figure(**kwargs)
+
 def plot_feature_importance(importance_dict):
     """Plot feature importance scores"""
-    fig, ax = plt.subplots(figsize=(10, 6))
+    import seaborn as sns
+
+    fig = _new_figure(figsize=(10, 6))
+    ax = fig.subplots()
     importance_df = pd.DataFrame({
         'Feature': importance_dict.keys(),
         'Importance': importance_dict.values()
     }).sort_values('Importance', ascending=True)
     
     sns.barplot(data=importance_df, x='Importance', y='Feature', ax=ax)
-    plt.title('Feature Importance in CO2 Emission Prediction')
+    ax.set_title('Feature Importance in CO2 Emission Prediction')
     return fig
 
 def plot_emission_comparison(prediction, avg_emission):
     """Plot prediction vs average emission"""
-    fig, ax = plt.subplots(figsize=(8, 6))
+    fig = _new_figure(figsize=(8, 6))
+    ax = fig.subplots()
     emissions = [avg_emission, prediction]
     labels = ['Average Emission', 'Predicted Emission']
     colors = ['lightgray', 'lightgreen' if prediction < avg_emission else 'lightcoral']
     
     ax.bar(labels, emissions, color=colors)
-    plt.title('CO2 Emission Comparison')
-    plt.ylabel('CO2 Emissions (g/km)')
+    ax.set_title('CO2 Emission Comparison')
+    ax.set_ylabel('CO2 Emissions (g/km)')
     
     # Add value labels on top of bars
     for i, v in enumerate(emissions):
         ax.text(i, v, f'{v:.1f}', ha='center', va='bottom')
+    ax.set_ylim(0, max(emissions) * COMPARISON_HEADROOM)
     
     return fig
 
 def create_gauge_chart(value, min_val, max_val, title):
     """Create a gauge chart for emissions"""
-    fig, ax = plt.subplots(figsize=(6, 4), subplot_kw={'projection': 'polar'})
+    fig = _new_figure(figsize=(6, 4))
+    ax = fig.add_subplot(projection='polar')
     
     # Convert value to angle
     angle = (value - min_val) / (max_val - min_val) * np.pi
@@ -52,9 +76,162 @@ def create_gauge_chart(value, min_val, max_val, title):
     ax.set_xticks(np.linspace(0, np.pi, 5))
     ax.set_xticklabels([f'{v:.0f}' for v in np.linspace(min_val, max_val, 5)])
     
-    plt.title(title)
+    ax.set_title(title)
+    return fig
+
+def plot_partial_dependence(curves):
+    """Plot a feature's partial dependence over its ICE curves"""
+    fig = _new_figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.plot(curves['grid'], curves['ice'].T, color='lightsteelblue', alpha=0.4, linewidth=0.8)
+    ax.plot(curves['grid'], curves['partial_dependence'], color='darkblue', linewidth=3,
+            label='Average (partial dependence)')
+    ax.set_title(f"Effect of {curves['feature']}")
+    ax.set_xlabel(curves['feature'])
+    ax.set_ylabel('CO2 Emissions (g/km)')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    return fig
+
+def plot_interaction(result):
+    """Plot the joint partial dependence of two features as a heatmap"""
+    fig = _new_figure(figsize=(8, 6))
+    ax = fig.subplots()
+    feature_a, feature_b = result['features']
+    mesh = ax.pcolormesh(result['grid_b'], result['grid_a'], result['values'], shading='nearest', cmap='RdYlGn_r')
+    fig.colorbar(mesh, ax=ax, label='CO2 Emissions (g/km)')
+    ax.set_title(f"{feature_a} x {feature_b}")
+    ax.set_xlabel(feature_b)
+    ax.set_ylabel(feature_a)
+    return fig
+
+def plot_permutation_importance(result):
+    """Plot the mean drop in R² per shuffled feature with its confidence interval"""
+    fig = _new_figure(figsize=(10, 6))
+    ax = fig.subplots()
+    importances = sorted(result['importances'].items(), key=lambda item: item[1]['mean'])
+    means = [importance['mean'] for _, importance in importances]
+    errors = [[importance['mean'] - importance['ci_low'] for _, importance in importances],
+              [importance['ci_high'] - importance['mean'] for _, importance in importances]]
+    ax.barh([feature for feature, _ in importances], means, xerr=errors, color='steelblue', capsize=4)
+    ax.set_title(f"Permutation Importance ({result['confidence']:.0%} CI over {result['n_repeats']} shuffles)")
+    ax.set_xlabel('Drop in test R²')
+    ax.grid(True, axis='x', alpha=0.3)
+    return fig
+
+def plot_contributions(explanation):
+    """Plot how much each feature pushes one prediction above or below the average"""
+    fig = _new_figure(figsize=(10, 5))
+    ax = fig.subplots()
+    contributions = sorted(explanation['contributions'].items(), key=lambda item: abs(item[1]))
+    values = [value for _, value in contributions]
+    ax.barh([feature for feature, _ in contributions], values,
+            color=['lightcoral' if value > 0 else 'lightgreen' for value in values])
+    for i, value in enumerate(values):
+        ax.text(value, i, f' {value:+.1f} ', ha='left' if value > 0 else 'right', va='center')
+    ax.axvline(0, color='gray', linewidth=1)
+    ax.set_title(f"From the average {explanation['base_value']:.1f} to {explanation['prediction']:.1f} g/km")
+    ax.set_xlabel('Contribution to CO2 Emissions (g/km)')
+    ax.margins(x=0.2)
+    return fig
+
+def figure_to_png(fig, dpi=PNG_DPI):
+    """Render a figure to PNG bytes"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+def _cached_png(key, render, use_cache=True):
+    """Get PNG bytes from the bounded cache, rendering them on a miss"""
+    with _render_lock:
+        if not use_cache:
+            return render()
+        png = _png_cache.get(key)
+        if png is not None:
+            _png_cache.move_to_end(key)
+            return png
+
+        png = render()
+        _png_cache[key] = png
+        while len(_png_cache) > MAX_CACHED_PNGS:
+            _png_cache.popitem(last=False)
+        return png
+
+def render_feature_importance(importance_dict, model_version=None):
+    """Feature importance chart as PNG bytes, drawn once per model version"""
+    key = ('feature_importance', model_version, tuple(importance_dict.items()))
+    return _cached_png(key, lambda: figure_to_png(plot_feature_importance(importance_dict)))
+
+def _update_comparison(chart, prediction, avg_emission):
+    """Move the comparison chart's bars and labels to new values"""
+    fig, bars, labels = chart
+    emissions = [avg_emission, prediction]
+    bars[1].set_facecolor('lightgreen' if prediction < avg_emission else 'lightcoral')
+    for bar, label, v in zip(bars, labels, emissions):
+        bar.set_height(v)
+        label.set_y(v)
+        label.set_text(f'{v:.1f}')
+    fig.axes[0].set_ylim(0, max(emissions) * COMPARISON_HEADROOM)
     return fig
 
+def render_emission_comparison(prediction, avg_emission, use_cache=True):
+    """Prediction vs average chart as PNG bytes
+
+    One figure is kept and only its bars and labels are updated, so reruns
+    don't build a new figure. Values are rounded to the 0.1 g/km shown on
+    the chart for the PNG cache.
+    """
+    def render():
+        chart = _reusable_charts.get('comparison')
+        if chart is None:
+            fig = plot_emission_comparison(prediction, avg_emission)
+            ax = fig.axes[0]
+            chart = _reusable_charts['comparison'] = (fig, ax.patches, ax.texts)
+        return figure_to_png(_update_comparison(chart, prediction, avg_emission))
+
+    return _cached_png(('comparison', round(prediction, 1), round(avg_emission, 1)), render, use_cache)
+
+def render_gauge_chart(value, min_val, max_val, title, use_cache=True):
+    """Gauge chart as PNG bytes, reusing one figure per scale and title"""
+    def render():
+        chart_key = ('gauge', min_val, max_val, title)
+        chart = _reusable_charts.get(chart_key)
+        if chart is None:
+            fig = create_gauge_chart(value, min_val, max_val, title)
+            chart = _reusable_charts[chart_key] = (fig, fig.axes[0].lines[0])
+        fig, needle = chart
+        needle.set_xdata([0, (value - min_val) / (max_val - min_val) * np.pi])
+        return figure_to_png(fig)
+
+    return _cached_png(('gauge', round(value, 1), min_val, max_val, title), render, use_cache)
+
+def render_partial_dependence(curves, model_version=None):
+    """Partial dependence chart as PNG bytes, drawn once per model version and feature"""
+    key = ('partial_dependence', model_version, curves['feature'])
+    return _cached_png(key, lambda: figure_to_png(plot_partial_dependence(curves)))
+
+def render_interaction(result, model_version=None):
+    """Interaction heatmap as PNG bytes, drawn once per model version and feature pair"""
+    key = ('interaction', model_version, result['features'])
+    return _cached_png(key, lambda: figure_to_png(plot_interaction(result)))
+
+def render_permutation_importance(result, model_version=None):
+    """Permutation importance chart as PNG bytes, drawn once per model version"""
+    key = ('permutation_importance', model_version, result['n_repeats'])
+    return _cached_png(key, lambda: figure_to_png(plot_permutation_importance(result)))
+
+def render_contributions(explanation, use_cache=True):
+    """Prediction breakdown chart as PNG bytes, cached by the contributions shown"""
+    key = ('contributions', round(explanation['base_value'], 1),
+           tuple((feature, round(value, 1)) for feature, value in explanation['contributions'].items()))
+    return _cached_png(key, lambda: figure_to_png(plot_contributions(explanation)), use_cache)
+
+def clear_render_cache():
+    """Drop cached PNGs and reusable figures"""
+    with _render_lock:
+        _png_cache.clear()
+        _reusable_charts.clear()
+
 def style_metric_cards():
     """Return CSS styling for metric cards"""
     return """
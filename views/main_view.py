@@ -1,19 +1,63 @@
 import streamlit as st
 from utils.visualization import (
-    plot_feature_importance,
-    plot_emission_comparison,
-    create_gauge_chart,
+    render_feature_importance,
+    render_emission_comparison,
+    render_gauge_chart,
+    render_contributions,
+    render_permutation_importance,
+    render_interaction,
+    render_partial_dependence,
     style_metric_cards
 )
 import pandas as pd
-import time
-import numpy as np
 from utils.benchmark_utils import BenchmarkUtils
+from utils.load_generator import BACKENDS, LoadGenerator, fixed_request, random_request
+from utils.prediction_client import PredictionClient
+from utils.prediction_server import PredictionServer
+from controllers.scoring_pool import predict_one, worker_setup
+from controllers.micro_batcher import MicroBatcher
+from utils import instrumentation
+from datetime import datetime
+
+@st.cache_data(show_spinner=False)
+def cached_feature_importance(_controller, model_version):
+    """Feature importance, computed once per model version for all sessions"""
+    return _controller.get_feature_importance()
+
+@st.cache_data(show_spinner=False)
+def cached_dataset_summary(_controller, data_path, model_version):
+    """Dataset aggregates, computed once per data file and model version for all sessions"""
+    return _controller.get_dataset_summary(data_path)
+
+@st.cache_data(show_spinner=False)
+def cached_partial_dependence(_controller, data_path, model_version):
+    """Partial dependence and ICE curves of every feature, computed once per model version"""
+    return _controller.get_partial_dependence(data_path)
+
+@st.cache_data(show_spinner=False)
+def cached_interaction(_controller, data_path, model_version, feature_a, feature_b):
+    """Joint partial dependence of two features, computed once per model version"""
+    return _controller.get_interaction(data_path, feature_a, feature_b)
+
+@st.cache_data(show_spinner=False)
+def cached_permutation_importance(_controller, data_path, model_version):
+    """Permutation importance on the test split, computed once per model version"""
+    return _controller.get_permutation_importance(data_path)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_explanation(_controller, model_version, feature_items):
+    """Per-feature contributions to one prediction, shared by all sessions"""
+    return _controller.explain_prediction(dict(feature_items))
 
 class MainView:
-    def __init__(self, controller):
+    def __init__(self, controller, data_path):
         self.controller = controller
-        self.benchmark_utils = BenchmarkUtils()
+        self.data_path = data_path
+        # Benchmark results belong to the browser session, so they survive reruns and page switches
+        if 'benchmark_utils' not in st.session_state:
+            st.session_state.benchmark_utils = BenchmarkUtils()
+            st.session_state.benchmark_history = []
+        self.benchmark_utils = st.session_state.benchmark_utils
         st.set_page_config(
             page_title="CO2 Emission Predictor",
             page_icon="🌍",
@@ -87,85 +131,116 @@ class MainView:
                                  value=2023,
                                  step=1)
 
-        if st.button("🔍 Predict Emissions", type="primary"):
-            features = {
-                'Engine Size(L)': engine_size,
-                'Cylinders': cylinders,
-                'Fuel Consumption Comb (L/100 km)': fuel_consumption,
-                'Horsepower': horsepower,
-                'Weight (kg)': weight,
-                'Year': year
-            }
+        features = {
+            'Engine Size(L)': engine_size,
+            'Cylinders': cylinders,
+            'Fuel Consumption Comb (L/100 km)': fuel_consumption,
+            'Horsepower': horsepower,
+            'Weight (kg)': weight,
+            'Year': year
+        }
 
+        if st.button("🔍 Predict Emissions", type="primary"):
             try:
-                prediction = self.controller.predict_emission(features)
-                avg_emission = self.controller.get_average_emission()
-                rating = self.controller.get_emission_rating(prediction)
-                tips = self.controller.get_eco_tips(prediction)
-
-                # Display results
-                st.markdown("### 📊 Results")
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.markdown(
-                        f"""
-                        <div class="metric-card">
-                            <h3>🎯 Predicted CO2 Emission</h3>
-                            <div class="metric-value">{prediction:.1f} g/km</div>
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
-
-                with col2:
-                    rating_colors = {
-                        'A': '🟢', 'B': '🟡', 'C': '🟠',
-                        'D': '🔴', 'E': '🟣', 'F': '⚫'
-                    }
-                    st.markdown(
-                        f"""
-                        <div class="metric-card">
-                            <h3>📈 Emission Rating</h3>
-                            <div class="metric-value">{rating_colors.get(rating, '⚪')} {rating}</div>
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
-
-                with col3:
-                    comparison = ((prediction - avg_emission) / avg_emission * 100)
-                    icon = "🔽" if comparison < 0 else "🔼"
-                    st.markdown(
-                        f"""
-                        <div class="metric-card">
-                            <h3>📊 Compared to Average</h3>
-                            <div class="metric-value">
-                                {icon} {'+' if comparison > 0 else ''}{comparison:.1f}%
-                            </div>
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
-
-                # Visualization
-                st.markdown("### 📈 Visualization")
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.pyplot(plot_emission_comparison(prediction, avg_emission))
-                
-                with col2:
-                    st.pyplot(create_gauge_chart(prediction, 0, 300, "Emission Meter"))
-
-                # Eco Tips
-                st.markdown("### 🌱 Eco-friendly Tips")
-                for tip in tips:
-                    st.markdown(f"- {tip}")
-
+                # Keep the prediction in the session so it survives the rerun of the explain button
+                st.session_state.last_prediction = {
+                    'features': features,
+                    'prediction': self.controller.predict_emission(features)
+                }
             except Exception as e:
+                st.session_state.pop('last_prediction', None)
                 st.error(f"Error making prediction: {str(e)}")
 
+        # Results stay on screen until an input changes
+        last = st.session_state.get('last_prediction')
+        if last is not None and last['features'] == features:
+            self._show_prediction_results(features, last['prediction'])
+
+    def _show_prediction_results(self, features, prediction):
+        """Display a prediction, with its explanation computed on request"""
+        try:
+            avg_emission = self.controller.get_average_emission()
+            rating = self.controller.get_emission_rating(prediction)
+            tips = self.controller.get_eco_tips(prediction)
+
+            # Display results
+            st.markdown("### 📊 Results")
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.markdown(
+                    f"""
+                    <div class="metric-card">
+                        <h3>🎯 Predicted CO2 Emission</h3>
+                        <div class="metric-value">{prediction:.1f} g/km</div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            with col2:
+                rating_colors = {
+                    'A': '🟢', 'B': '🟡', 'C': '🟠',
+                    'D': '🔴', 'E': '🟣', 'F': '⚫'
+                }
+                st.markdown(
+                    f"""
+                    <div class="metric-card">
+                        <h3>📈 Emission Rating</h3>
+                        <div class="metric-value">{rating_colors.get(rating, '⚪')} {rating}</div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            with col3:
+                comparison = ((prediction - avg_emission) / avg_emission * 100)
+                icon = "🔽" if comparison < 0 else "🔼"
+                st.markdown(
+                    f"""
+                    <div class="metric-card">
+                        <h3>📊 Compared to Average</h3>
+                        <div class="metric-value">
+                            {icon} {'+' if comparison > 0 else ''}{comparison:.1f}%
+                        </div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            # Visualization
+            st.markdown("### 📈 Visualization")
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.image(render_emission_comparison(prediction, avg_emission))
+            
+            with col2:
+                st.image(render_gauge_chart(prediction, 0, 300, "Emission Meter"))
+
+            # Explanation, only on request as it costs a TreeSHAP pass over every path of the forest
+            st.markdown("### 🧭 What Drives This Prediction")
+            if st.button("Explain this prediction"):
+                with st.spinner("Explaining the prediction..."):
+                    explanation = cached_explanation(self.controller, self.controller.model_version,
+                                                     tuple(features.items()))
+                st.image(render_contributions(explanation))
+                st.caption("Red bars raise the emission above the average prediction, green bars lower it. "
+                           "Together they add up to the forest's prediction.")
+                if abs(explanation['prediction'] - prediction) >= 0.05:
+                    # A snapping prediction cache served the value of the nearest grid point
+                    st.info(f"The {prediction:.1f} g/km shown above was served from the prediction cache "
+                            f"for the nearest grid point. The forest itself predicts {explanation['prediction']:.1f} g/km, "
+                            f"which is the value broken down here.")
+
+            # Eco Tips
+            st.markdown("### 🌱 Eco-friendly Tips")
+            for tip in tips:
+                st.markdown(f"- {tip}")
+
+        except Exception as e:
+            st.error(f"Error making prediction: {str(e)}")
+
     def _show_analysis_page(self):
         """Display the analysis interface"""
         st.title("📊 CO2 Emission Analysis")
@@ -173,8 +248,8 @@ class MainView:
         # Feature Importance
         st.subheader("🎯 Feature Importance Analysis")
         try:
-            importance_dict = self.controller.get_feature_importance()
-            st.pyplot(plot_feature_importance(importance_dict))
+            importance_dict = cached_feature_importance(self.controller, self.controller.model_version)
+            st.image(render_feature_importance(importance_dict, self.controller.model_version))
             
             # Add explanation
             st.markdown("""
@@ -190,6 +265,54 @@ class MainView:
         except Exception as e:
             st.error(f"Error getting feature importance: {str(e)}")
 
+        # Permutation Importance
+        st.subheader("🔀 Permutation Importance")
+        try:
+            with st.spinner("Shuffling features on the test set..."):
+                result = cached_permutation_importance(self.controller, self.data_path,
+                                                       self.controller.model_version)
+            st.image(render_permutation_importance(result, self.controller.model_version))
+            st.caption(f"How much the test R² ({result['baseline_score']:.3f}) drops when a feature's values "
+                       "are shuffled. Unlike the chart above, this isn't biased towards features with many "
+                       "distinct values.")
+        except Exception as e:
+            st.error(f"Error computing permutation importance: {str(e)}")
+
+        # Dataset Overview
+        st.subheader("📋 Dataset Overview")
+        try:
+            summary = cached_dataset_summary(self.controller, self.data_path, self.controller.model_version)
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Vehicles", f"{summary['rows']:,}")
+            col2.metric("Average Emission", f"{summary['avg_emission']:.1f} g/km")
+            col3.metric("Fuel Types", len(summary['by_fuel_type']))
+            st.bar_chart(summary['by_fuel_type']['mean'].rename("Average Emission (g/km)"))
+        except Exception as e:
+            st.error(f"Error summarizing dataset: {str(e)}")
+
+        # What-if analysis
+        st.subheader("🔍 What-If Analysis")
+        try:
+            features = self.controller.model.features
+            model_version = self.controller.model_version
+            with st.spinner("Computing sensitivity curves..."):
+                curves = cached_partial_dependence(self.controller, self.data_path, model_version)
+            feature = st.selectbox("Feature", features, index=2)
+            st.image(render_partial_dependence(curves[feature], model_version))
+            st.caption("Each thin line is one vehicle from the dataset with only this feature changed, "
+                       "the thick line is their average.")
+
+            col1, col2 = st.columns(2)
+            feature_a = col1.selectbox("Interaction of", features, index=0)
+            feature_b = col2.selectbox("with", [f for f in features if f != feature_a], index=1)
+            with st.spinner("Computing interaction grid..."):
+                result = cached_interaction(self.controller, self.data_path, model_version, feature_a, feature_b)
+            st.image(render_interaction(result, model_version))
+            st.caption(f"Interaction strength: {result['interaction_strength']:.2f} g/km, the average "
+                       "deviation from the two features' separate effects.")
+        except Exception as e:
+            st.error(f"Error computing what-if analysis: {str(e)}")
+
         # Additional analysis sections can be added here 
 
     def _show_benchmark_page(self):
@@ -209,123 +332,282 @@ class MainView:
             horsepower = st.number_input("Horsepower", min_value=50, max_value=1000, value=200)
             weight = st.number_input("Weight (kg)", min_value=500, max_value=5000, value=1500)
             year = st.number_input("Year", min_value=2015, max_value=2024, value=2023)
+            compare_cache = st.checkbox("Compare cached vs uncached", value=True,
+                                        help="Also run the in-process benchmark with the prediction cache off")
         
+        st.subheader("Load Generator")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            backend = st.selectbox("Concurrency Backend", list(BACKENDS))
+            concurrency = st.number_input("Concurrency", min_value=1, max_value=64, value=4)
+        with col2:
+            load_mode = st.selectbox("Load Mode", ["Closed Loop (fixed concurrency)", "Open Loop (target RPS)"])
+            target_rps = None
+            if load_mode.startswith("Open"):
+                target_rps = st.number_input("Target Requests/Second", min_value=1, max_value=100000, value=500)
+        with col3:
+            warmup = st.number_input("Warmup Requests", min_value=0, max_value=10000, value=100)
+            request_path = st.selectbox("Request Path", ["In-process call", "HTTP service (localhost)"])
+            micro_batch = st.checkbox("Micro-batching", help="Coalesce concurrent single predictions into batches")
+            if micro_batch:
+                max_wait_ms = st.number_input("Max Batch Wait (ms)", min_value=0.1, max_value=50.0, value=2.0)
+                max_batch_size = st.number_input("Max Batch Size", min_value=1, max_value=1024, value=64)
+            instrument = st.checkbox("Per-stage timings", value=True,
+                                     help="Time each stage of the prediction path during the run")
+
         if st.button("Run Benchmark"):
-            self.benchmark_utils.start_benchmark()
-            
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            # Container for detailed timing logs
-            timing_log = st.empty()
-            
-            for i in range(n_requests):
-                if test_mode == "Random Parameters":
-                    engine_size = np.random.uniform(1.0, 8.0)
-                    cylinders = np.random.randint(3, 12)
-                    fuel_consumption = np.random.uniform(4.0, 20.0)
-                    horsepower = np.random.uniform(100, 800)
-                    weight = np.random.uniform(1000, 4000)
-                    year = np.random.randint(2015, 2024)
-                
-                features = {
+            if test_mode == "Random Parameters":
+                request_factory = random_request(self.controller.model.features)
+            else:
+                request_factory = fixed_request({
                     'Engine Size(L)': engine_size,
                     'Cylinders': cylinders,
                     'Fuel Consumption Comb (L/100 km)': fuel_consumption,
                     'Horsepower': horsepower,
                     'Weight (kg)': weight,
                     'Year': year
-                }
-                
-                # Start measuring total time (includes network overhead)
-                total_start = time.perf_counter()
-                
-                try:
-                    # Start measuring processing time
-                    process_start = time.perf_counter()
-                    
-                    # Actual prediction
-                    prediction = self.controller.predict_emission(features)
-                    
-                    # End processing time
-                    process_end = time.perf_counter()
-                    
-                    # End total time
-                    total_end = time.perf_counter()
-                    
-                    # Calculate times in milliseconds
-                    total_time = (total_end - total_start) * 1000
-                    processing_time = (process_end - process_start) * 1000
-                    
-                    # Network time includes both request and response overhead
-                    network_time = total_time - processing_time
-                    
-                    timing_data = {
-                        'total_time': total_time,
-                        'network_time': network_time,
-                        'processing_time': processing_time,
-                        'prediction': prediction,
-                        'status': 'success'
-                    }
-                    
-                    # Update timing log every 100 requests
-                    if i % 100 == 0:
-                        timing_log.text(f"""
-                        Request {i+1} timing:
-                        - Total: {total_time:.2f}ms
-                        - Network: {network_time:.2f}ms ({network_time/total_time*100:.1f}%)
-                        - Processing: {processing_time:.2f}ms ({processing_time/total_time*100:.1f}%)
-                        """)
-                    
-                except Exception as e:
-                    total_end = time.perf_counter()
-                    timing_data = {
-                        'total_time': (total_end - total_start) * 1000,
-                        'network_time': 0,
-                        'processing_time': 0,
-                        'status': 'error',
-                        'error': str(e)
-                    }
-                
-                self.benchmark_utils.record_prediction(timing_data)
-                
-                progress = (i + 1) / n_requests
-                progress_bar.progress(progress)
-                status_text.text(f"Processing request {i+1}/{n_requests}")
-            
-            self.benchmark_utils.end_benchmark()
-            stats = self.benchmark_utils.get_statistics()
+                })
+
+            if backend == 'process' and (micro_batch or request_path.startswith("HTTP")):
+                st.error("The HTTP service and micro-batching are driven from the thread or asyncio backend.")
+                return
+
+            # The cache comparison calls the controller directly, so it needs the plain in-process path
+            compare_cache = (test_mode == "Fixed Parameters" and compare_cache and backend != 'process'
+                             and not micro_batch and request_path.startswith("In-process")
+                             and self.controller.prediction_cache is not None)
+
+            server = client = batcher = None
+            predict_fn, initializer, initargs = self.controller.predict_emission, None, ()
+            if micro_batch:
+                batcher = MicroBatcher(self.controller, max_wait_ms=max_wait_ms, max_batch_size=max_batch_size)
+                predict_fn = batcher.predict
+            if request_path.startswith("HTTP"):
+                # Real serialization and transport through a local service on a free port
+                server = PredictionServer(self.controller, port=0, batcher=batcher).start()
+                client = PredictionClient(server.url, pool_size=concurrency)
+                predict_fn = client.predict
+            elif backend == 'process':
+                predict_fn = predict_one
+                initializer, initargs = worker_setup(self.controller, engine=self.controller.model.engine)
+
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+
+            def show_progress(completed, total):
+                # Called at most a few times per second, outside the measured requests
+                progress_bar.progress(completed / total)
+                status_text.text(f"Completed {completed}/{total} requests")
+
+            def make_generator(predict_fn, benchmark_utils, after_warmup=None):
+                return LoadGenerator(
+                    predict_fn, request_factory, benchmark_utils,
+                    backend=backend,
+                    concurrency=concurrency,
+                    mode='open' if target_rps else 'closed',
+                    target_rps=target_rps,
+                    warmup=warmup,
+                    progress_callback=show_progress,
+                    initializer=initializer,
+                    initargs=initargs,
+                    timed=client is not None,
+                    after_warmup=after_warmup
+                )
+
+            # The controller is shared by every session: measure this run with its own stage recording
+            # and a snapshot of the cache statistics rather than resetting them
+            recording = instrumentation.Recording() if instrument else None
+            cache_before = {}
+
+            def start_measuring():
+                if batcher is not None:
+                    batcher.reset_metrics()
+                if compare_cache:
+                    cache_before.update(self.controller.prediction_cache.stats())
+                if recording is not None:
+                    recording.start()
+
+            try:
+                if compare_cache:
+                    uncached_stats = make_generator(
+                        lambda features: self.controller.predict_emission(features, use_cache=False),
+                        BenchmarkUtils()
+                    ).run(n_requests)
+                stats = make_generator(predict_fn, self.benchmark_utils, start_measuring).run(n_requests)
+            finally:
+                if recording is not None:
+                    recording.stop()
+                if client is not None:
+                    client.close()
+                    server.stop()
+                if batcher is not None:
+                    batcher.close()
             
+            # Keep the run in the session so its results survive reruns, e.g. from the download buttons
+            metadata = dict(
+                test_mode=test_mode, backend=backend, concurrency=int(concurrency),
+                mode='open' if target_rps else 'closed', target_rps=target_rps,
+                request_path=request_path, micro_batch=micro_batch, warmup=int(warmup)
+            )
+            run = {
+                'stats': stats,
+                'http': client is not None,
+                'target_rps': target_rps,
+                'uncached_stats': uncached_stats if compare_cache else None,
+                'cache_stats': self.controller.prediction_cache.stats(since=cache_before) if compare_cache else None,
+                'batch_metrics': batcher.metrics() if batcher is not None else None,
+                'stages': recording.stage_stats() if recording is not None else None,
+                'prometheus': recording.export_prometheus() if recording is not None else None,
+                'metadata': metadata
+            }
+            st.session_state.last_benchmark = run
+            st.session_state.benchmark_history.append({
+                'Time': datetime.now().strftime('%H:%M:%S'),
+                **{key.replace('_', ' ').title(): value for key, value in metadata.items()},
+                'Requests': stats['total_requests'],
+                'Requests/Second': stats['requests_per_second'],
+                'p50 (ms)': stats['p50_response_time'],
+                'p99 (ms)': stats['p99_response_time'],
+                'Success Rate': stats['success_rate']
+            })
             st.success("Benchmark completed!")
-            
-            # Display statistics with network metrics
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Total Time", f"{stats['total_time']:.2f}s")
-                st.metric("Success Rate", f"{stats['success_rate']:.1f}%")
-                st.metric("Requests/Second", f"{stats['requests_per_second']:.1f}")
+
+        run = st.session_state.get('last_benchmark')
+        if run is None:
+            return
+        if st.button("Clear Results"):
+            st.session_state.benchmark_history = []
+            del st.session_state['last_benchmark']
+            return
+        self._show_benchmark_results(run)
+        self._show_benchmark_history()
+
+    def _show_benchmark_results(self, run):
+        """Show the statistics and plots of the session's last benchmark run"""
+        
+        stats = run['stats']
+        # Display statistics with network metrics
+        breakdown_time = (stats['avg_network_time'] + stats['avg_serialization_time']
+                          + stats['avg_processing_time'] + stats['avg_overhead_time']) or 1
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total Time", f"{stats['total_time']:.2f}s")
+            st.metric("Success Rate", f"{stats['success_rate']:.1f}%")
+            st.metric("Requests/Second", f"{stats['requests_per_second']:.1f}")
+        if run['http']:
+            # Only requests through the HTTP service have a real network and serialization split
             with col2:
                 st.metric("Avg Network Time", f"{stats['avg_network_time']:.1f}ms")
-                st.metric("Network %", f"{(stats['avg_network_time']/(stats['avg_network_time'] + stats['avg_processing_time'])*100):.1f}%")
+                st.metric("Network %", f"{(stats['avg_network_time']/breakdown_time*100):.1f}%")
                 st.metric("Avg Processing Time", f"{stats['avg_processing_time']:.1f}ms")
             with col3:
-                st.metric("Min Response Time", f"{stats['min_response_time']:.1f}ms")
-                st.metric("Max Response Time", f"{stats['max_response_time']:.1f}ms")
-                st.metric("Processing %", f"{(stats['avg_processing_time']/(stats['avg_network_time'] + stats['avg_processing_time'])*100):.1f}%")
-            
-            # Display plots with network breakdown
-            st.subheader("Response Time Breakdown")
-            st.pyplot(self.benchmark_utils.plot_response_times())
-            
-            st.subheader("Response Time Distributions")
-            st.pyplot(self.benchmark_utils.plot_response_distribution())
-            
-            # Download results with network metrics
-            results_df = self.benchmark_utils.get_results_df()
-            st.download_button(
-                "Download Results CSV",
-                results_df.to_csv().encode('utf-8'),
-                "benchmark_results.csv",
-                "text/csv",
-                key='download-csv'
-            ) 
\ No newline at end of file
+                st.metric("Avg Serialization Time", f"{stats['avg_serialization_time']:.2f}ms")
+                st.metric("Serialization %", f"{(stats['avg_serialization_time']/breakdown_time*100):.1f}%")
+                st.metric("Processing %", f"{(stats['avg_processing_time']/breakdown_time*100):.1f}%")
+        else:
+            with col2:
+                st.metric("Avg Response Time", f"{stats['avg_total_time']:.2f}ms")
+                # No network in-process: the rest of the response time is queueing for a worker
+                st.metric("Avg Queue/Overhead Time", f"{stats['avg_overhead_time']:.2f}ms")
+            with col3:
+                st.metric("Avg Processing Time", f"{stats['avg_processing_time']:.2f}ms")
+        with col4:
+            st.metric("Min Response Time", f"{stats['min_response_time']:.1f}ms")
+            st.metric("Max Response Time", f"{stats['max_response_time']:.1f}ms")
+            st.metric("Std Dev", f"{stats['std_response_time']:.2f}ms")
+
+        # Tail latency
+        st.subheader("Response Time Percentiles")
+        percentiles = ['p50', 'p90', 'p95', 'p99', 'p99.9']
+        for col, name in zip(st.columns(len(percentiles)), percentiles):
+            col.metric(name, f"{stats[f'{name}_response_time']:.2f}ms")
+        if 'p50_corrected_response_time' in stats:
+            st.caption("Corrected for coordinated omission: measured from each request's scheduled start")
+            for col, name in zip(st.columns(len(percentiles)), percentiles):
+                col.metric(f"{name} corrected", f"{stats[f'{name}_corrected_response_time']:.2f}ms")
+
+        if run['cache_stats'] is not None:
+            cache_stats, uncached_stats = run['cache_stats'], run['uncached_stats']
+            st.subheader("Prediction Cache")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Cached Requests/Second", f"{stats['requests_per_second']:.1f}")
+            col2.metric("Uncached Requests/Second", f"{uncached_stats['requests_per_second']:.1f}")
+            col3.metric("Speedup", f"{stats['requests_per_second'] / max(uncached_stats['requests_per_second'], 1e-9):.1f}x")
+            col4.metric("Cache Hit Rate", f"{cache_stats['hit_rate'] * 100:.1f}%")
+            st.caption(f"Hits {cache_stats['hits']}, misses {cache_stats['misses']}, "
+                       f"evictions {cache_stats['evictions']}, bypassed {cache_stats['bypassed']}")
+
+        if run['batch_metrics'] is not None:
+            batch_metrics = run['batch_metrics']
+            st.subheader("Micro-batching")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Mean Batch Size", f"{batch_metrics['mean_batch_size']:.1f}")
+            col2.metric("Queue Time p50", f"{batch_metrics['queue_time_p50']:.2f}ms")
+            col3.metric("Queue Time p99", f"{batch_metrics['queue_time_p99']:.2f}ms")
+            st.bar_chart(pd.Series(batch_metrics['batch_size_distribution'], name="Batches"))
+            if batch_metrics['cached_requests']:
+                st.caption(f"{batch_metrics['cached_requests']} requests were answered from the prediction "
+                           f"cache without being batched.")
+
+        st.subheader("Latency Over Time")
+        st.pyplot(self.benchmark_utils.plot_latency_windows())
+
+        if run['stages'] is not None:
+            self._show_stage_breakdown(run['stages'], run['prometheus'], run['metadata']['backend'])
+
+        # Display plots with network breakdown
+        st.subheader("Response Time Breakdown")
+        st.pyplot(self.benchmark_utils.plot_response_times(show_breakdown=run['http']))
+        
+        st.subheader("Response Time Distributions")
+        st.pyplot(self.benchmark_utils.plot_response_distribution(show_breakdown=run['http']))
+        
+        # Download results with network metrics
+        results_df = self.benchmark_utils.get_results_df()
+        st.download_button(
+            "Download Results CSV",
+            results_df.to_csv().encode('utf-8'),
+            "benchmark_results.csv",
+            "text/csv",
+            key='download-csv'
+        )
+        st.download_button(
+            "Download JSON Report",
+            self.benchmark_utils.get_report_json(**run['metadata']).encode('utf-8'),
+            "benchmark_report.json",
+            "application/json",
+            key='download-json'
+        ) 
+
+    def _show_benchmark_history(self):
+        """Show a summary of every benchmark run in this session"""
+        history = st.session_state.benchmark_history
+        if len(history) < 2:
+            return
+        st.subheader("Benchmark History")
+        st.dataframe(pd.DataFrame(history))
+
+    def _show_stage_breakdown(self, stages, prometheus, backend):
+        """Show where time went inside the prediction path during the last run"""
+        st.subheader("Per-Stage Breakdown")
+        if backend == 'process':
+            st.info("Stages run in the worker processes, so they aren't timed here.")
+            return
+        if not stages:
+            st.info("No instrumented stages ran.")
+            return
+
+        stage_df = pd.DataFrame.from_dict(stages, orient='index')
+        stage_df.index.name = 'Stage'
+        st.bar_chart(stage_df['mean_ms'].rename("Mean (ms)"))
+        st.dataframe(stage_df.rename(columns={
+            'count': 'Calls', 'total_ms': 'Total (ms)', 'mean_ms': 'Mean (ms)',
+            'p50_ms': 'p50 (ms)', 'p90_ms': 'p90 (ms)', 'p99_ms': 'p99 (ms)'
+        }).style.format(precision=4))
+        st.download_button(
+            "Download Prometheus Metrics",
+            prometheus.encode('utf-8'),
+            "stage_metrics.prom",
+            "text/plain",
+            key='download-prometheus'
+        )